@@ -0,0 +1,155 @@
+"""
+Persistent row-hash index used by etl.py to drop rows that were already written.
+
+Each stored row costs 8 bytes: a 64-bit hash of the normalized row, kept in a
+sorted numpy array on disk. New chunks are hashed and checked against it with a
+vectorized binary search, so re-runs and appends only hash the new rows instead
+of re-deduplicating everything that was loaded before.
+
+Hash collisions are possible but negligible at this scale (~1e-4 chance of a
+single false duplicate at 50M rows).
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _normalize_for_hash(df: pd.DataFrame) -> pd.DataFrame:
+    """Make equal rows hash equally regardless of column order or numeric/date dtype."""
+    df = df[sorted(df.columns)]
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_float_dtype(s):
+            # 5.0 read from one file and 5 from another must match
+            whole = s.dropna()
+            if (whole % 1 == 0).all():
+                s = s.astype("Int64")
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            s = s.astype("datetime64[ns]")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def hash_rows(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash per row of the normalized frame."""
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(_normalize_for_hash(df), index=False).to_numpy(dtype=np.uint64)
+
+
+class RowHashIndex:
+    """Sorted array of row hashes persisted as a .npy file.
+
+    Hashes added since the last ``save`` are kept as a few sorted runs that
+    are merged in a logarithmic cascade, so adding a chunk costs about the
+    chunk's size rather than the whole index. ``checkpoint`` appends them to
+    a ``<path>.log`` journal, which is also O(chunk), and ``save`` folds
+    everything into the .npy file once, e.g. per source file. Journaled hashes
+    are picked up again on load, so rows committed before a crash are never
+    forgotten.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self._runs = []         # sorted runs added since the last save, largest first
+        self._unjournaled = []  # runs added since the last checkpoint
+        if path and os.path.exists(path):
+            self.hashes = np.load(path)
+            logging.info(f"Loaded dedup index with {len(self.hashes):,} rows from {path}")
+        if path and os.path.exists(self.log_path):
+            logged = np.fromfile(self.log_path, dtype=np.uint64)
+            # A crash between save's rename and the journal removal leaves
+            # hashes in both files; union1d drops the repeats
+            self.hashes = np.union1d(self.hashes, logged)
+            logging.info(f"Recovered {len(logged):,} journaled hashes from {self.log_path}")
+
+    @property
+    def log_path(self) -> str:
+        return f"{self.path}.log"
+
+    def __len__(self) -> int:
+        return len(self.hashes) + sum(len(run) for run in self._runs)
+
+    @staticmethod
+    def _contains_sorted(sorted_hashes: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+        if len(sorted_hashes) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.searchsorted(sorted_hashes, hashes)
+        pos[pos == len(sorted_hashes)] = 0
+        return sorted_hashes[pos] == hashes
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask of hashes already present in the index."""
+        # Searching in sorted order walks each run front to back, which is
+        # several times faster than random probes into a large array
+        order = np.argsort(hashes)
+        query = hashes[order]
+        found_sorted = self._contains_sorted(self.hashes, query)
+        for run in self._runs:
+            found_sorted |= self._contains_sorted(run, query)
+        found = np.empty(len(hashes), dtype=bool)
+        found[order] = found_sorted
+        return found
+
+    def filter_new(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Drop rows that are already indexed or repeated within ``df``.
+
+        Returns the remaining rows and their hashes; call ``add`` with the
+        hashes once those rows have been written.
+        """
+        hashes = hash_rows(df)
+        keep = ~self.contains(hashes) & ~pd.Index(hashes).duplicated(keep="first")
+        dropped = len(df) - int(keep.sum())
+        if dropped:
+            logging.info(f"Dedup index dropped {dropped:,} of {len(df):,} rows")
+        return df[keep], hashes[keep]
+
+    def add(self, hashes: np.ndarray) -> None:
+        """Insert new (already unique) hashes as a sorted run."""
+        if len(hashes) == 0:
+            return
+        run = np.sort(hashes)
+        self._unjournaled.append(run)
+        # Merge while the newest run is at least as large as the one before
+        # it: O(log n) runs, each hash re-merged O(log n) times
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = np.concatenate([self._runs.pop(), run])
+            run.sort(kind="stable")  # two sorted runs: timsort merges them in linear time
+        self._runs.append(run)
+
+    def checkpoint(self) -> None:
+        """Append hashes added since the last checkpoint to the journal (O(new hashes))."""
+        if not self.path or not self._unjournaled:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.log_path, "ab") as fh:
+            for run in self._unjournaled:
+                fh.write(run.astype(np.uint64).tobytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._unjournaled = []
+
+    def save(self) -> None:
+        """Merge pending runs and atomically rewrite the index, then drop the journal."""
+        if self._runs:
+            merged = np.concatenate([self.hashes] + self._runs)
+            merged.sort(kind="stable")
+            self.hashes = merged
+            self._runs = []
+        self._unjournaled = []
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npy"
+        np.save(tmp_path, self.hashes)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
@@ -0,0 +1,196 @@
+"""
+Import-time and CLI startup budget for the METLN package
+Runs each check in a fresh interpreter with ``python -X importtime`` and fails
+when an import exceeds its budget, pulls in a dependency it should defer, or
+touches the filesystem
+
+Usage:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --factor 2      # slower machine / CI runner
+    python benchmarks/import_budget.py --verbose       # top 10 imports per check
+
+Exits with status 1 when any check is over budget.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+SRC_DIR = PROJECT_ROOT / 'src'
+
+# Heavy modules only some code paths need
+HEAVY_MODULES = ('pandas', 'numpy', 'sqlalchemy', 'matplotlib', 'seaborn', 'openpyxl', 'tqdm', 'scipy', 'pyarrow')
+
+# (label, module, budget in ms, heavy modules it may import)
+IMPORT_CHECKS = [
+    ('db utilities', 'METLN.utils.db', 150, ()),
+    ('instrumentation', 'METLN.utils.instrument', 100, ()),
+    ('ingest', 'METLN.etl_pipeline', 900, ('pandas', 'numpy')),
+    ('cleaner', 'METLN.data_cleaner', 900, ('pandas', 'numpy')),
+    ('analyzer', 'METLN.timeseries', 1100, ('pandas', 'numpy')),
+    ('watch mode', 'METLN.watcher', 1100, ('pandas', 'numpy')),
+    ('analytics service', 'METLN.service', 1100, ('pandas', 'numpy')),
+]
+
+# Dependencies pandas loads by itself when installed (pandas >= 3 imports pyarrow)
+PANDAS_IMPORTS = ('pyarrow',)
+
+# Wall-clock budget for `python main.py info` against a small database
+INFO_BUDGET_MS = 600
+
+DEFAULT_RUNS = 3
+
+# Paths that importing must never create
+SIDE_EFFECT_PATHS = [PROJECT_ROOT / 'data', PROJECT_ROOT / 'outputs' / 'timeseries', PROJECT_ROOT / 'outputs' / 'traces']
+
+
+def _snapshot():
+    return {str(path): sorted(os.listdir(path)) if path.is_dir() else None for path in SIDE_EFFECT_PATHS}
+
+
+def _parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output
+
+    Returns:
+        (total_ms, [(cumulative_ms, module)]) where total sums top-level imports
+    """
+    total_us = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        if depth == 0:
+            total_us += int(cumulative)
+        modules.append((int(cumulative) / 1000, name.strip()))
+    return total_us / 1000, modules
+
+
+def measure_import(module, runs=DEFAULT_RUNS):
+    """
+    Import a module in fresh interpreters
+
+    Returns:
+        Dictionary with the best total ms, heavy modules loaded and slowest imports
+    """
+    probe = (
+        f"import {module}, sys, json; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR), METLN_TRACE='')
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', probe],
+            capture_output=True, text=True, env=env, cwd=tempfile.gettempdir(),
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+        total_ms, modules = _parse_importtime(proc.stderr)
+        if best is None or total_ms < best['total_ms']:
+            best = {
+                'total_ms': total_ms,
+                'heavy': json.loads(proc.stdout.strip().splitlines()[-1]),
+                'slowest': sorted(modules, reverse=True)[:10],
+            }
+    return best
+
+
+def measure_info_command(runs=DEFAULT_RUNS):
+    """Best wall time in ms of `python main.py info` against a throwaway SQLite table"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'budget.db'
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('CREATE TABLE subscriptions (date_of_extract TEXT, Publication TEXT, AccoutID INTEGER)')
+            conn.executemany('INSERT INTO subscriptions VALUES (?, ?, ?)',
+                             [('2024-01-01', 'PPH', i) for i in range(1000)])
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, 'main.py', 'info', '--db-uri', f'sqlite:///{db_path}'],
+                capture_output=True, text=True, cwd=PROJECT_ROOT,
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            if proc.returncode != 0:
+                raise RuntimeError(f"main.py info failed:\n{proc.stderr[-2000:]}")
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_checks(factor=1.0, runs=DEFAULT_RUNS, verbose=False):
+    """
+    Run every check
+
+    Returns:
+        List of failure messages (empty when everything is within budget)
+    """
+    failures = []
+    before = _snapshot()
+
+    print(f"  {'check':18s} {'module':26s} {'import (ms)':>12s} {'budget':>8s}  heavy deps")
+    for label, module, budget, allowed in IMPORT_CHECKS:
+        result = measure_import(module, runs)
+        limit = budget * factor
+        if 'pandas' in allowed:
+            allowed = allowed + PANDAS_IMPORTS
+        unexpected = [m for m in result['heavy'] if m not in allowed]
+        status = 'ok' if result['total_ms'] <= limit and not unexpected else 'FAIL'
+        print(f"  {label:18s} {module:26s} {result['total_ms']:12.0f} {limit:8.0f}  "
+              f"{', '.join(result['heavy']) or '-'}  {status}")
+        if verbose:
+            for ms, name in result['slowest']:
+                print(f"      {ms:8.1f} ms  {name}")
+        if result['total_ms'] > limit:
+            failures.append(f"{module}: {result['total_ms']:.0f} ms > {limit:.0f} ms budget")
+        if unexpected:
+            failures.append(f"{module}: imports {', '.join(unexpected)} at import time")
+
+    info_ms = measure_info_command(runs)
+    info_limit = INFO_BUDGET_MS * factor
+    print(f"  {'info command':18s} {'python main.py info':26s} {info_ms:12.0f} {info_limit:8.0f}  (wall clock)  "
+          f"{'ok' if info_ms <= info_limit else 'FAIL'}")
+    if info_ms > info_limit:
+        failures.append(f"main.py info: {info_ms:.0f} ms > {info_limit:.0f} ms budget")
+
+    after = _snapshot()
+    for path, listing in before.items():
+        if after[path] != listing:
+            failures.append(f"Importing changed {path} ({listing} -> {after[path]})")
+    return failures
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Check METLN import and CLI startup budgets")
+    p.add_argument("--factor", type=float, default=1.0, help="Multiply every budget (e.g. 2 on slow runners)")
+    p.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Fresh interpreters per check (best is kept)")
+    p.add_argument("--verbose", action="store_true", help="List the slowest imports of each check")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("=" * 80)
+    print("METLN IMPORT BUDGET")
+    print("=" * 80)
+    failures = run_checks(args.factor, args.runs, args.verbose)
+    print("=" * 80)
+    if failures:
+        print("\n❌ OVER BUDGET")
+        for message in failures:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("\n✅ All imports within budget")
+
+
+if __name__ == "__main__":
+    main()
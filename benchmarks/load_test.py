@@ -0,0 +1,164 @@
+"""
+Load test for the MTLN analytics service
+Runs concurrent keep-alive clients against the rollup endpoints and reports
+latency percentiles, throughput and how many requests were answered with
+304 Not Modified
+
+Usage:
+    python benchmarks/load_test.py                                # in-process service on synthetic data
+    python benchmarks/load_test.py --data-path data/processed/cleaned_data.csv
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --clients 32
+
+Clients revalidate with If-None-Match on --revalidate (default 80%) of their
+requests, as a dashboard polling for changes would.
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'src'))
+sys.path.insert(0, str(BENCH_DIR))
+
+from synthetic_data import COLUMNS, STRING_COLUMNS, Vocabulary, snapshot_frame  # noqa: E402
+from METLN import service  # noqa: E402
+
+
+def write_cleaned_data(path, rows_per_snapshot=20_000, snapshots=24):
+    """
+    Write a synthetic cleaned_data.csv (monthly snapshots, real schema)
+
+    Returns:
+        Path of the written file
+    """
+    vocab = Vocabulary()
+    strings = np.array(vocab.shared_strings, dtype=object)
+    frames = []
+    for i in range(snapshots):
+        data = snapshot_frame(vocab, rows_per_snapshot, i)
+        frame = pd.DataFrame({col: strings[data[col]] if col in STRING_COLUMNS else data[col] for col in COLUMNS})
+        frame.insert(0, 'date_of_extract', pd.Timestamp('2023-01-01') + pd.DateOffset(months=i))
+        frames.append(frame)
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False, date_format='%Y-%m-%d')
+    return path
+
+
+def client(host, port, paths, n_requests, revalidate, seed, results):
+    """One keep-alive client issuing n_requests GETs"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    etags = {}
+    latencies, statuses = [], {}
+    for _ in range(n_requests):
+        path = rng.choice(paths)
+        headers = {}
+        if path in etags and rng.random() < revalidate:
+            headers['If-None-Match'] = etags[path]
+        start = time.perf_counter()
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    conn.close()
+    results.append((latencies, statuses))
+
+
+def run_load(url, clients, requests_per_client, revalidate):
+    """
+    Run concurrent clients against a running service
+
+    Returns:
+        Dictionary of latency percentiles (ms), throughput and status counts
+    """
+    parts = urlsplit(url)
+    paths = [p for p in service.ENDPOINTS if p != '/api/version']
+    results = []
+    threads = [
+        threading.Thread(target=client, args=(parts.hostname, parts.port, paths, requests_per_client,
+                                              revalidate, seed, results))
+        for seed in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate([np.array(lat) for lat, _ in results]) * 1000
+    statuses = {}
+    for _, counts in results:
+        for status, n in counts.items():
+            statuses[status] = statuses.get(status, 0) + n
+    return {
+        'clients': clients,
+        'requests': int(len(latencies)),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'max_ms': round(float(latencies.max()), 2),
+        'status_counts': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the MTLN analytics service")
+    parser.add_argument('--url', default=None,
+                        help="Service to test (default: start one in-process)")
+    parser.add_argument('--data-path', default=None,
+                        help="Cleaned data CSV for the in-process service (default: synthetic data)")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per client")
+    parser.add_argument('--revalidate', type=float, default=0.8,
+                        help="Share of repeat requests sent with If-None-Match")
+    parser.add_argument('--output', default=None, help="Also write the results as JSON to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url is None:
+            data_path = args.data_path or write_cleaned_data(Path(tmp) / 'cleaned_data.csv')
+            server = service.make_server(port=0, data_path=data_path)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            args.url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        try:
+            summary = run_load(args.url, args.clients, args.requests, args.revalidate)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    print(f"{summary['requests']:,} requests from {summary['clients']} clients in {summary['seconds']:.2f}s "
+          f"({summary['requests_per_second']:,.0f} req/s)")
+    print(f"Latency ms: p50 {summary['p50_ms']:.2f}  p95 {summary['p95_ms']:.2f}  "
+          f"p99 {summary['p99_ms']:.2f}  max {summary['max_ms']:.2f}")
+    print(f"Status: {', '.join(f'{k}={v:,}' for k, v in summary['status_counts'].items())}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
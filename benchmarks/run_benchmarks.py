@@ -0,0 +1,311 @@
+"""
+End-to-end benchmark suite for the MTLN pipeline
+Generates synthetic workbooks at a chosen scale, times every pipeline stage
+and compares the results against a saved baseline
+
+Stages: ingest (combine_data_files), excel_repair (corrupted workbooks),
+cleaning (clean_processed_file), db_load (load_csv_to_sql), analyzer
+(TimeSeriesAnalyzer steps) and plotting.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale 0.5M
+    python benchmarks/run_benchmarks.py --scale 0.5M --save-baseline
+    python benchmarks/run_benchmarks.py --scale 5M --tolerance 0.2
+
+Exits with status 1 when a stage fails or regresses beyond the tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Plots must not try to open windows
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'src'))
+sys.path.insert(0, str(BENCH_DIR))
+
+from synthetic_data import generate_dataset  # noqa: E402
+from METLN import etl_pipeline, data_cleaner, timeseries, validation  # noqa: E402
+from METLN.excel_repair import extract_data_from_corrupted_xlsx  # noqa: E402
+from METLN.utils import db  # noqa: E402
+from METLN.utils.instrument import enable_tracing, disable_tracing  # noqa: E402
+
+SCALES = {
+    '0.5M': 500_000,
+    '5M': 5_000_000,
+    '50M': 50_000_000,
+}
+
+DEFAULT_DATA_ROOT = PROJECT_ROOT / 'bench_data'
+RESULTS_DIR = BENCH_DIR / 'results'
+BASELINE_FILE = BENCH_DIR / 'baseline.json'
+
+# A stage regresses when it is both relatively and absolutely slower
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.5
+
+
+@contextlib.contextmanager
+def pipeline_paths(raw_dir, work_dir):
+    """Point the pipeline modules at a benchmark working directory"""
+    processed_dir = work_dir / 'processed'
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    output_dir = work_dir / 'outputs'
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    overrides = [
+        (etl_pipeline, 'RAW_DATA_DIR', raw_dir),
+        (etl_pipeline, 'PROCESSED_DATA_DIR', processed_dir),
+        (etl_pipeline, 'PROCESSED_FILE', processed_dir / 'processed_data.csv'),
+        (etl_pipeline, 'STAGING_DIR', processed_dir / 'staging'),
+        (data_cleaner, 'PROCESSED_FILE', processed_dir / 'processed_data.csv'),
+        (data_cleaner, 'CLEAN_FILE', processed_dir / 'cleaned_data.csv'),
+        (validation, 'QUARANTINE_DIR', work_dir / 'quarantine'),
+        (validation, 'QUARANTINE_FILE', work_dir / 'quarantine' / 'quarantined_rows.csv'),
+        (validation, 'SUMMARY_FILE', work_dir / 'quarantine' / 'validation_summary.csv'),
+        (timeseries, 'OUTPUT_DIR', output_dir),
+    ]
+    saved = [(module, name, getattr(module, name)) for module, name, _ in overrides]
+    try:
+        for module, name, value in overrides:
+            setattr(module, name, value)
+        yield processed_dir
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def _quiet(func):
+    """Run a stage with its console report suppressed"""
+    def wrapper():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return wrapper
+
+
+def build_stages(raw_dir, processed_dir, work_dir, corrupted_files, include_plots=True):
+    """Ordered (name, callable) pairs; each stage depends on the previous ones"""
+    clean_file = processed_dir / 'cleaned_data.csv'
+    db_uri = f"sqlite:///{work_dir / 'bench.db'}"
+    state = {}
+
+    def ingest():
+        etl_pipeline.combine_data_files()
+
+    def excel_repair():
+        rows = 0
+        for path in corrupted_files:
+            rows += len(extract_data_from_corrupted_xlsx(raw_dir / path))
+        return rows
+
+    def cleaning():
+        return data_cleaner.clean_processed_file()
+
+    def db_load():
+        return db.load_csv_to_sql(clean_file, db_uri=db_uri)
+
+    def analyzer():
+        a = timeseries.TimeSeriesAnalyzer(clean_file)
+        a.load_data()
+        a.create_daily_aggregations()
+        a.calculate_growth_metrics()
+        a.analyze_trends()
+        a.detect_anomalies()
+        a.analyze_by_status()
+        a.analyze_by_publication()
+        a.analyze_by_geography()
+        a.analyze_new_vs_existing()
+        a.forecast_segments(('route_id',))
+        a.generate_summary_report()
+        state['analyzer'] = a
+        return len(a.df)
+
+    def plotting():
+        import matplotlib.pyplot as plt
+        a = state['analyzer']
+        a.plot_overall_trends()
+        a.plot_status_analysis()
+        a.plot_publication_trends()
+        a.plot_geographic_distribution()
+        plt.close('all')
+
+    stages = [
+        ('ingest', ingest),
+        ('excel_repair', excel_repair),
+        ('cleaning', _quiet(cleaning)),
+        ('db_load', db_load),
+        ('analyzer', _quiet(analyzer)),
+    ]
+    if include_plots:
+        stages.append(('plotting', plotting))
+    return stages
+
+
+def run_suite(scale, data_root=DEFAULT_DATA_ROOT, include_plots=True, keep_work=False):
+    """
+    Generate (or reuse) the dataset for a scale and time every stage
+
+    Returns:
+        Results dictionary suitable for JSON output and baseline comparison
+    """
+    total_rows = SCALES[scale] if scale in SCALES else int(scale)
+    raw_dir = Path(data_root) / f"raw_{scale}"
+    manifest = generate_dataset(raw_dir, total_rows)
+    corrupted = [f['name'] for f in manifest['details'] if f['variant'] == 'corrupted']
+
+    work_dir = Path(data_root) / f"work_{scale}"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+
+    tracer = enable_tracing(trace_dir=work_dir / 'traces')
+    stage_results = {}
+    failed = None
+    try:
+        with pipeline_paths(raw_dir, work_dir) as processed_dir:
+            for name, func in build_stages(raw_dir, processed_dir, work_dir, corrupted, include_plots):
+                logging.info(f"Benchmark stage '{name}' ({scale})...")
+                try:
+                    tracer.run_stage(name, func, (), {})
+                except Exception as e:
+                    logging.error(f"Stage '{name}' failed: {e}")
+                    failed = name
+                record = next(r for r in reversed(tracer.records) if r['stage'] == name and r['depth'] == 0)
+                rows = record['rows'] or total_rows
+                stage_results[name] = {
+                    'wall_s': record['wall_s'],
+                    'cpu_s': record['cpu_s'],
+                    'peak_rss_mb': record['peak_rss_mb'],
+                    'peak_rss_increase_mb': record['peak_rss_increase_mb'],
+                    'rows': rows,
+                    'rows_per_s': rows / record['wall_s'] if record['wall_s'] else None,
+                    'status': record['status'],
+                }
+                if failed:
+                    break
+    finally:
+        disable_tracing()
+
+    results = {
+        'scale': scale,
+        'total_rows': total_rows,
+        'files': len(manifest['details']),
+        'corrupted_files': len(corrupted),
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'stages': stage_results,
+        'failed_stage': failed,
+        'trace': tracer.records,
+    }
+    if not keep_work:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare stage wall times against a baseline run of the same scale
+
+    Returns:
+        List of human-readable regression messages (empty when clean)
+    """
+    regressions = []
+    for stage, base in baseline['stages'].items():
+        current = results['stages'].get(stage)
+        if current is None:
+            regressions.append(f"{stage}: missing from this run")
+            continue
+        if current['status'] != 'ok':
+            regressions.append(f"{stage}: {current['status']}")
+            continue
+        limit = base['wall_s'] * (1 + tolerance)
+        if current['wall_s'] > limit and current['wall_s'] - base['wall_s'] > MIN_REGRESSION_SECONDS:
+            regressions.append(
+                f"{stage}: {current['wall_s']:.2f}s vs baseline {base['wall_s']:.2f}s "
+                f"(+{(current['wall_s'] / base['wall_s'] - 1) * 100:.0f}%, tolerance {tolerance * 100:.0f}%)"
+            )
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print("\n" + "=" * 80)
+    print(f"MTLN BENCHMARK - {results['scale']} ({results['total_rows']:,} rows, {results['files']} files)")
+    print("=" * 80)
+    # The process peak only grows, so each stage also shows how much it raised it
+    print(f"  {'stage':15s} {'wall (s)':>10s} {'cpu (s)':>10s} {'peak so far (MB)':>17s} "
+          f"{'+peak (MB)':>11s} {'rows/s':>12s} {'baseline':>10s}")
+    for stage, r in results['stages'].items():
+        base = baseline['stages'].get(stage, {}).get('wall_s') if baseline else None
+        rate = f"{r['rows_per_s']:,.0f}" if r['rows_per_s'] else '-'
+        rss = f"{r['peak_rss_mb']:,.0f}" if r['peak_rss_mb'] else '-'
+        increase = r.get('peak_rss_increase_mb')
+        increase = f"{increase:,.0f}" if increase is not None else '-'
+        base_str = f"{base:.2f}" if base is not None else '-'
+        print(f"  {stage:15s} {r['wall_s']:10.2f} {r['cpu_s']:10.2f} {rss:>17s} {increase:>11s} {rate:>12s} {base_str:>10s}")
+    print("=" * 80)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Run the MTLN pipeline benchmark suite")
+    p.add_argument("--scale", default="0.5M", help=f"One of {', '.join(SCALES)} or a row count")
+    p.add_argument("--data-root", default=str(DEFAULT_DATA_ROOT), help="Where synthetic data is generated and cached")
+    p.add_argument("--baseline", default=str(BASELINE_FILE), help="Baseline JSON file")
+    p.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline for its scale")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown per stage (0.25 = 25%%)")
+    p.add_argument("--no-plots", action="store_true", help="Skip the plotting stage")
+    p.add_argument("--keep-work", action="store_true", help="Keep intermediate CSV/DB files")
+    return p.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] : %(message)s:')
+    args = parse_args()
+
+    results = run_suite(args.scale, args.data_root, include_plots=not args.no_plots, keep_work=args.keep_work)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = RESULTS_DIR / f"bench_{args.scale}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out_path.write_text(json.dumps(results, indent=2))
+    logging.info(f"Results saved to {out_path}")
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    baseline = baselines.get(args.scale)
+    print_results(results, baseline)
+
+    if results['failed_stage']:
+        print(f"\n❌ Stage '{results['failed_stage']}' failed")
+        sys.exit(1)
+
+    if args.save_baseline:
+        baselines[args.scale] = {k: v for k, v in results.items() if k != 'trace'}
+        baseline_path.write_text(json.dumps(baselines, indent=2))
+        print(f"\n✅ Baseline for {args.scale} saved to {baseline_path}")
+        return
+
+    if baseline is None:
+        print(f"\n⚠️  No baseline for {args.scale} in {baseline_path}; run with --save-baseline to create one")
+        return
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ PERFORMANCE REGRESSIONS")
+        for message in regressions:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Synthetic subscription data generator for MTLN benchmarks
+Writes realistic sublist*.xlsx monthly snapshots following the real schema
+and cardinalities, including numbered-header and corrupted variants
+
+The workbooks are written directly as SpreadsheetML (zip + XML) so that tens
+of millions of rows can be produced without openpyxl's per-cell overhead.
+
+Usage:
+    python benchmarks/synthetic_data.py --rows 500000 --out bench_data/raw
+"""
+import argparse
+import json
+import logging
+import math
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+# Excel's hard limit is 1,048,576 rows per sheet (including the header)
+MAX_ROWS_PER_FILE = 1_000_000
+
+# Real data: ~63-65K rows per monthly snapshot
+DEFAULT_ROWS_PER_FILE = 64_000
+MAX_SNAPSHOTS = 60
+
+COLUMNS = [
+    'Publication', 'AccoutID', 'Status', 'Bill Method', 'Dist ID', 'Route ID',
+    'Day pattern', 'City', 'State', 'Zip', 'Rate Code', 'LastStartDate',
+    'OriginalStartDate', 'OccupantID', 'RouteType ID'
+]
+
+# Publication mix observed in the 572K-row history
+PUBLICATIONS = {
+    'MTM_PT': 0.637, 'SMG_SJ': 0.173, 'MTM_MS': 0.115, 'MTM_KJ': 0.053, 'AMG_TR': 0.022
+}
+# Single-letter codes as in the extracts; the pipeline counts 'A' as active
+# (V = vacation hold, S = stopped, H = billing hold)
+STATUSES = {'A': 0.86, 'V': 0.06, 'S': 0.05, 'H': 0.03}
+BILL_METHODS = {'CC': 0.55, 'EZP': 0.25, 'BIL': 0.15, 'CMP': 0.05}
+DAY_PATTERNS = ['DLY', 'SUN', 'WKD', 'SAT', 'THUSUN', 'FRISUN']
+ROUTE_TYPES = ['C', 'M', 'D', 'S']
+
+US_STATES = [
+    'ME', 'MA', 'FL', 'NY', 'NH', 'CA', 'VA', 'CT', 'MD', 'PA', 'NC', 'TX', 'AZ',
+    'SC', 'GA', 'NJ', 'VT', 'RI', 'OH', 'CO', 'WA', 'IL', 'MI', 'TN', 'OR', 'MN',
+    'WI', 'DE', 'IN', 'MO', 'NM', 'NV', 'UT', 'KY', 'AL', 'LA', 'OK', 'KS', 'IA',
+    'ID', 'MT', 'NE', 'WV', 'AR', 'MS', 'HI', 'AK', 'SD', 'ND', 'WY', 'DC', 'PR'
+]
+# ~93% of subscriptions are in Maine
+ME_SHARE = 0.93
+
+N_CITIES = 2076
+N_ROUTES = 1800
+N_DISTRIBUTORS = 120
+N_RATE_CODES = 60
+N_DATE_VALUES = 4000
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+
+
+def _column_letter(idx):
+    """0-based column index -> Excel column letters"""
+    letters = ''
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+class Vocabulary:
+    """
+    Fixed value sets shared by every generated snapshot
+    """
+
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        self.publications = np.array(list(PUBLICATIONS))
+        self.publication_p = np.array(list(PUBLICATIONS.values()))
+        self.statuses = np.array(list(STATUSES))
+        self.status_p = np.array(list(STATUSES.values()))
+        self.bill_methods = np.array(list(BILL_METHODS))
+        self.bill_method_p = np.array(list(BILL_METHODS.values()))
+        self.day_patterns = np.array(DAY_PATTERNS)
+        self.route_types = np.array(ROUTE_TYPES)
+
+        # Cities: Zipf-distributed, each pinned to one state and a zip range
+        self.cities = np.array(['Portland', 'Lewiston', 'South Portland', 'Auburn', 'Brunswick', 'Scarborough']
+                               + [f"Town {i:04d}" for i in range(N_CITIES - 6)])
+        self.city_p = _zipf_weights(N_CITIES)
+        is_me = rng.random(N_CITIES) < ME_SHARE
+        is_me[:6] = True
+        other_states = rng.choice(US_STATES[1:], N_CITIES)
+        self.city_state = np.where(is_me, 'ME', other_states)
+        me_zips = rng.integers(3900, 4993, N_CITIES)
+        other_zips = rng.integers(10000, 99950, N_CITIES)
+        self.city_zip = np.where(is_me, me_zips, other_zips)
+
+        self.routes = np.array([f"R{i:05d}" for i in range(N_ROUTES)])
+        self.distributors = np.array([f"D{i:03d}" for i in range(N_DISTRIBUTORS)])
+        self.rate_codes = np.array([f"RC{i:02d}" for i in range(N_RATE_CODES)])
+        start_dates = pd.date_range('2005-01-01', periods=N_DATE_VALUES, freq='D')
+        self.dates = np.array(start_dates.strftime('%m/%d/%Y'))
+
+        # Single shared-strings table: every string value the sheets can contain
+        header = list(COLUMNS)
+        self.shared_strings = []
+        self._offsets = {}
+        for name, values in [
+            ('header', header), ('publication', self.publications), ('status', self.statuses),
+            ('bill_method', self.bill_methods), ('dist', self.distributors), ('route', self.routes),
+            ('day_pattern', self.day_patterns), ('city', self.cities), ('state', np.array(US_STATES)),
+            ('rate_code', self.rate_codes), ('date', self.dates), ('route_type', self.route_types),
+        ]:
+            self._offsets[name] = len(self.shared_strings)
+            self.shared_strings.extend(str(v) for v in values)
+        self._state_index = {s: i for i, s in enumerate(US_STATES)}
+
+    def offset(self, name):
+        return self._offsets[name]
+
+    def state_codes(self, states):
+        lookup = np.vectorize(self._state_index.get)
+        return lookup(states) + self._offsets['state']
+
+
+def snapshot_frame(vocab, n_rows, snapshot_idx, seed=0):
+    """
+    Generate one monthly snapshot as shared-string codes and numbers
+
+    Accounts overlap month to month: each snapshot holds a sliding window of
+    account IDs with ~3% churn, matching ~65.8K accounts over 572K rows.
+
+    Returns:
+        Dictionary of column name -> numpy array (string columns hold
+        shared-string indices, numeric columns hold the cell value)
+    """
+    rng = np.random.default_rng(seed * 1000 + snapshot_idx)
+    churn = max(1, int(n_rows * 0.03))
+    account_start = 100000 + snapshot_idx * churn
+    account_ids = np.arange(account_start, account_start + n_rows)
+
+    city = rng.choice(N_CITIES, n_rows, p=vocab.city_p)
+
+    return {
+        'Publication': rng.choice(len(vocab.publications), n_rows, p=vocab.publication_p) + vocab.offset('publication'),
+        'AccoutID': account_ids,
+        'Status': rng.choice(len(vocab.statuses), n_rows, p=vocab.status_p) + vocab.offset('status'),
+        'Bill Method': rng.choice(len(vocab.bill_methods), n_rows, p=vocab.bill_method_p) + vocab.offset('bill_method'),
+        'Dist ID': (account_ids % N_DISTRIBUTORS) + vocab.offset('dist'),
+        'Route ID': (city * 7 + account_ids % 3) % N_ROUTES + vocab.offset('route'),
+        'Day pattern': rng.choice(len(vocab.day_patterns), n_rows) + vocab.offset('day_pattern'),
+        'City': city + vocab.offset('city'),
+        'State': vocab.state_codes(vocab.city_state[city]),
+        'Zip': vocab.city_zip[city] + rng.integers(0, 3, n_rows),
+        'Rate Code': rng.choice(N_RATE_CODES, n_rows) + vocab.offset('rate_code'),
+        'LastStartDate': (account_ids * 31 + snapshot_idx) % N_DATE_VALUES + vocab.offset('date'),
+        'OriginalStartDate': (account_ids * 17) % N_DATE_VALUES + vocab.offset('date'),
+        'OccupantID': account_ids * 10 + 1,
+        'RouteType ID': rng.choice(len(vocab.route_types), n_rows) + vocab.offset('route_type'),
+    }
+
+
+STRING_COLUMNS = {
+    'Publication', 'Status', 'Bill Method', 'Dist ID', 'Route ID', 'Day pattern',
+    'City', 'State', 'Rate Code', 'LastStartDate', 'OriginalStartDate', 'RouteType ID'
+}
+
+
+def _sheet_rows(columns, n_rows, first_row, chunk_size=50_000):
+    """Yield <row> XML fragments in chunks"""
+    # One positional template per row: row number, then (row, value) per cell
+    cells = []
+    for i, name in enumerate(COLUMNS):
+        cell_type = ' t="s"' if name in STRING_COLUMNS else ''
+        cells.append(f'<c r="{_column_letter(i)}%d"{cell_type}><v>%d</v></c>')
+    template = '<row r="%d">' + ''.join(cells) + '</row>'
+
+    arrays = [columns[name].tolist() for name in COLUMNS]
+    for start in range(0, n_rows, chunk_size):
+        stop = min(start + chunk_size, n_rows)
+        parts = []
+        for i in range(start, stop):
+            r = first_row + i
+            args = []
+            for arr in arrays:
+                args.append(r)
+                args.append(arr[i])
+            parts.append(template % ((r,) + tuple(args)))
+        yield ''.join(parts)
+
+
+def write_workbook(path, vocab, columns, n_rows, variant='named'):
+    """
+    Write one snapshot as an .xlsx file
+
+    Args:
+        path: Output file path
+        vocab: Vocabulary providing the shared-strings table
+        columns: Column arrays from snapshot_frame()
+        n_rows: Number of data rows
+        variant: 'named' (text headers), 'numbered' (0..14 numeric headers)
+                 or 'corrupted' (workbook part missing, so openpyxl cannot
+                 open it and the pipeline must fall back to excel_repair)
+    """
+    letters = [_column_letter(i) for i in range(len(COLUMNS))]
+    if variant == 'numbered':
+        header = ''.join(f'<c r="{l}1"><v>{i}</v></c>' for i, l in enumerate(letters))
+    else:
+        header = ''.join(
+            f'<c r="{l}1" t="s"><v>{vocab.offset("header") + i}</v></c>' for i, l in enumerate(letters)
+        )
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zf.writestr('_rels/.rels', ROOT_RELS)
+        if variant != 'corrupted':
+            zf.writestr('xl/workbook.xml', WORKBOOK)
+            zf.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+
+        strings = ''.join(f'<si><t>{escape(s)}</t></si>' for s in vocab.shared_strings)
+        zf.writestr(
+            'xl/sharedStrings.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<sst xmlns="{NS_MAIN}" count="{len(vocab.shared_strings)}" '
+            f'uniqueCount="{len(vocab.shared_strings)}">{strings}</sst>'
+        )
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as f:
+            f.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+                f'<dimension ref="A1:{letters[-1]}{n_rows + 1}"/>'
+                f'<sheetData><row r="1">{header}</row>'
+            ).encode('utf-8'))
+            for chunk in _sheet_rows(columns, n_rows, first_row=2):
+                f.write(chunk.encode('utf-8'))
+            f.write(b'</sheetData></worksheet>')
+
+
+def plan_files(total_rows, rows_per_file=None):
+    """
+    Split a total row count into monthly snapshot files
+
+    The rows are spread evenly (sizes differ by at most one row), so no
+    snapshot is a short remainder that would read as a drop in subscriptions.
+
+    Returns:
+        List of (file_name, n_rows) tuples in chronological order
+    """
+    # Large scales grow rows per snapshot rather than spanning decades of months
+    rows_per_file = rows_per_file or max(DEFAULT_ROWS_PER_FILE, math.ceil(total_rows / MAX_SNAPSHOTS))
+    rows_per_file = min(rows_per_file, MAX_ROWS_PER_FILE)
+    n_files = math.ceil(total_rows / rows_per_file)
+    base, extra = divmod(total_rows, n_files) if n_files else (0, 0)
+
+    plan = []
+    for i in range(n_files):
+        # Monthly snapshots starting Feb 2024, named like sublist2.1.24.xlsx
+        month_index = 1 + i
+        year = 24 + month_index // 12
+        month = month_index % 12 + 1
+        plan.append((f"sublist{month}.1.{year:02d}.xlsx", base + (i < extra)))
+    return plan
+
+
+def generate_dataset(out_dir, total_rows, rows_per_file=None, numbered_every=3,
+                     corrupted_every=4, seed=0):
+    """
+    Generate a directory of synthetic sublist*.xlsx workbooks
+
+    Args:
+        out_dir: Target directory (created if missing)
+        total_rows: Total data rows across all workbooks
+        rows_per_file: Rows per monthly snapshot (default: spread over >= 9 files)
+        numbered_every: Every Nth file uses numbered 0..14 headers (0 = never)
+        corrupted_every: Every Nth file is written without its workbook part (0 = never)
+        seed: Random seed
+
+    Returns:
+        Manifest dictionary (also written to out_dir/manifest.json)
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / 'manifest.json'
+
+    plan = plan_files(total_rows, rows_per_file)
+    wanted = {
+        'total_rows': total_rows,
+        'seed': seed,
+        'numbered_every': numbered_every,
+        'corrupted_every': corrupted_every,
+        'files': [name for name, _ in plan],
+        'file_rows': [n_rows for _, n_rows in plan],
+        'statuses': list(STATUSES),
+    }
+    if manifest_path.exists():
+        existing = json.loads(manifest_path.read_text())
+        if {k: existing.get(k) for k in wanted} == wanted and all((out_dir / n).exists() for n in wanted['files']):
+            logging.info(f"Reusing synthetic dataset in {out_dir} ({total_rows:,} rows)")
+            return existing
+
+    vocab = Vocabulary(seed)
+    files = []
+    for idx, (name, n_rows) in enumerate(plan):
+        if corrupted_every and idx % corrupted_every == corrupted_every - 1:
+            variant = 'corrupted'
+        elif numbered_every and idx % numbered_every == numbered_every - 1:
+            variant = 'numbered'
+        else:
+            variant = 'named'
+        columns = snapshot_frame(vocab, n_rows, idx, seed)
+        write_workbook(out_dir / name, vocab, columns, n_rows, variant)
+        files.append({'name': name, 'rows': n_rows, 'variant': variant})
+        logging.info(f"Wrote {name}: {n_rows:,} rows ({variant})")
+
+    manifest = dict(wanted, details=files)
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Generate synthetic sublist*.xlsx workbooks")
+    p.add_argument("--rows", type=int, default=500_000, help="Total rows across all workbooks")
+    p.add_argument("--out", default="bench_data/raw", help="Output directory")
+    p.add_argument("--rows-per-file", type=int, default=None, help="Rows per monthly workbook")
+    p.add_argument("--seed", type=int, default=0, help="Random seed")
+    return p.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] : %(message)s:')
+    args = parse_args()
+    generate_dataset(args.out, args.rows, rows_per_file=args.rows_per_file, seed=args.seed)
@@ -1,4 +1,82 @@
-from src.METLN import etl_pipeline
+import argparse
+import time
+
+from src.METLN.utils.logs import configure_logging
+
+# Pipeline modules are imported by the command that needs them, so short
+# commands such as `info` start without loading pandas or the plotting stack
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="MTLN data pipeline")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("ingest", help="Combine new raw files into processed_data.csv (default)")
+
+    watch = commands.add_parser("watch", help="Keep running and process new raw files as they land")
+    watch.add_argument("--raw-dir", default=None, help="Folder to watch (default: data/raw)")
+    watch.add_argument("--db-uri", default=None, help="Database URI (default: data/database/mtln.db)")
+    watch.add_argument("--table", default="subscriptions", help="Table new rows are appended to")
+    watch.add_argument("--interval", type=float, default=1.0, help="Seconds between directory scans")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       help="Seconds a file must stay unchanged before it is processed")
+    watch.add_argument("--plots", action="store_true", help="Also regenerate charts after each file")
+    watch.add_argument("--max-idle", type=float, default=None,
+                       help="Exit after this many seconds without new files")
+
+    info = commands.add_parser("info", help="Show row count and columns of a database table")
+    info.add_argument("--db-uri", default=None, help="Database URI (default: data/database/mtln.db)")
+    info.add_argument("--table", default="subscriptions", help="Table to describe")
+
+    commands.add_parser("plan", help="Show the memory budget and the chunk sizes and workers each stage will use")
+
+    serve = commands.add_parser("serve", help="Serve daily, status, publication and geography rollups over HTTP")
+    serve.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only)")
+    serve.add_argument("--port", type=int, default=8050, help="TCP port")
+    serve.add_argument("--data-path", default=None,
+                       help="Cleaned data CSV (default: data/processed/cleaned_data.csv)")
+    return parser.parse_args()
+
+
+def show_info(db_uri, table):
+    from src.METLN.utils import db
+
+    start = time.perf_counter()
+    info = db.get_table_info(table, db_uri)
+    print(f"Table:   {info['table_name']}")
+    print(f"Rows:    {info['row_count']:,}")
+    print(f"Columns: {info['column_count']} ({', '.join(info['columns'])})")
+    print(f"Query time: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def show_plan():
+    from src.METLN import data_cleaner, etl_pipeline, planner
+
+    raw_files = etl_pipeline.get_raw_data() if etl_pipeline.RAW_DATA_DIR.exists() else []
+    plan = planner.plan_pipeline(raw_files, data_cleaner.PROCESSED_FILE, data_cleaner.CLEAN_FILE)
+    print(f"Memory budget: {plan['budget_mb']:,} MB ({plan['cpus']} CPUs)")
+    for name, stage in plan['ingest'].items():
+        print(f"  ingest   {name}: {stage['sheets']} sheets, ~{stage['rows']:,} rows, {stage['workers']} workers")
+    for stage in ('cleaning', 'database', 'analysis'):
+        if stage in plan:
+            print(f"  {stage:8s} " + ", ".join(f"{key}={value:,}" if isinstance(value, int) else f"{key}={value}"
+                                            for key, value in plan[stage].items()))
+
 
 if __name__=="__main__":
-    etl_pipeline.combine_data_files()
\ No newline at end of file
+    args = parse_args()
+    configure_logging()
+    if args.command == "watch":
+        from src.METLN import watcher
+        watcher.watch(args.raw_dir, args.db_uri, args.table, args.interval, args.settle,
+                      args.plots, args.max_idle)
+    elif args.command == "info":
+        show_info(args.db_uri, args.table)
+    elif args.command == "plan":
+        show_plan()
+    elif args.command == "serve":
+        from src.METLN import service
+        service.serve(args.host, args.port, args.data_path)
+    else:
+        from src.METLN import etl_pipeline
+        etl_pipeline.combine_data_files()
@@ -0,0 +1,140 @@
+"""
+Batched anomaly detection across segment time series
+Scores every publication/state/route series at once using matrix operations
+on a date x segment count matrix
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+# 1.4826 * MAD estimates the standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+# sqrt(pi/2) * mean absolute deviation, fallback when more than half the
+# points equal the median (MAD == 0)
+MEAN_AD_SCALE = 1.2533
+
+METHODS = ('mad', 'rolling', 'zscore')
+
+
+def segment_matrix(df, by=('publication', 'state'), date_col='date_of_extract'):
+    """
+    Build the date x segment count matrix
+
+    Args:
+        df: Subscription-level DataFrame
+        by: Columns defining a segment (e.g. ('publication', 'state'))
+        date_col: Snapshot date column
+
+    Returns:
+        DataFrame indexed by date with one column per segment (MultiIndex
+        columns when more than one segment column), zero-filled
+    """
+    by = list(by)
+    counts = df.groupby([date_col] + by, observed=True, sort=True).size()
+    matrix = counts.unstack(by, fill_value=0).sort_index()
+    logging.info(f"Segment matrix: {matrix.shape[0]} dates x {matrix.shape[1]:,} series ({', '.join(by)})")
+    return matrix
+
+
+def _robust_scale(deviations, axis):
+    """MAD-based scale with a mean-absolute-deviation fallback; NaN when constant"""
+    with np.errstate(all='ignore'):
+        mad = np.nanmedian(deviations, axis=axis) * MAD_SCALE
+        mean_ad = np.nanmean(deviations, axis=axis) * MEAN_AD_SCALE
+    scale = np.where(mad > 0, mad, mean_ad)
+    return np.where(scale > 0, scale, np.nan)
+
+
+def robust_scores(values, method='mad', window=6):
+    """
+    Score every column of a (time x series) array in one pass
+
+    Args:
+        values: 2-D float array, rows are dates and columns are series
+        method: 'mad'     - median/MAD over the whole history of each series
+                'rolling' - median of the preceding ``window`` points, scaled by
+                            the robust spread of the series' residuals
+                'zscore'  - mean/std over the whole history (classic z-score)
+        window: Trailing window length for the rolling method
+
+    Returns:
+        (scores, expected) arrays with the same shape as ``values``;
+        NaN where a series has no usable scale or history
+    """
+    values = np.asarray(values, dtype=float)
+
+    if method == 'mad':
+        expected = np.nanmedian(values, axis=0, keepdims=True)
+        scale = _robust_scale(np.abs(values - expected), axis=0)
+        expected = np.broadcast_to(expected, values.shape)
+    elif method == 'zscore':
+        expected = np.nanmean(values, axis=0, keepdims=True)
+        std = np.nanstd(values, axis=0, ddof=1)
+        scale = np.where(std > 0, std, np.nan)
+        expected = np.broadcast_to(expected, values.shape)
+    elif method == 'rolling':
+        expected = np.full(values.shape, np.nan)
+        if values.shape[0] > window:
+            # windows[t] holds points t .. t+window-1, which precede date t+window
+            windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)[:-1]
+            expected[window:] = np.nanmedian(windows, axis=2)
+        # A handful of trailing points gives an unstable spread, so the scale
+        # comes from each series' residuals over its whole history
+        scale = _robust_scale(np.abs(values - expected), axis=0)
+    else:
+        raise ValueError(f"Unknown method '{method}'. Expected one of {METHODS}")
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = (values - expected) / scale
+    return scores, expected
+
+
+def detect_segment_anomalies(matrix, method='mad', threshold=3.5, window=6, min_volume=10):
+    """
+    Flag anomalous segment-dates in a date x segment count matrix
+
+    Args:
+        matrix: Output of segment_matrix()
+        method: Scoring method, see robust_scores()
+        threshold: Absolute score above which a point is flagged
+        window: Trailing window for the rolling method
+        min_volume: Ignore series whose median count is below this value
+
+    Returns:
+        DataFrame of flagged points ranked by absolute score, with the
+        segment columns, date, count, expected, deviation, score and direction
+    """
+    values = matrix.to_numpy(dtype=float)
+    scores, expected = robust_scores(values, method=method, window=window)
+
+    volume_ok = np.median(values, axis=0) >= min_volume
+    flagged = (np.abs(scores) > threshold) & volume_ok[None, :]
+    date_idx, series_idx = np.nonzero(flagged)
+
+    segments = matrix.columns
+    segment_names = list(segments.names) if segments.names[0] is not None else ['segment']
+    segment_values = segments[series_idx]
+    if isinstance(segments, pd.MultiIndex):
+        segment_frame = pd.DataFrame(segment_values.tolist(), columns=segment_names)
+    else:
+        segment_frame = pd.DataFrame({segment_names[0]: np.asarray(segment_values)})
+
+    counts = values[date_idx, series_idx]
+    expect = expected[date_idx, series_idx]
+    score = scores[date_idx, series_idx]
+    result = segment_frame.assign(
+        date=matrix.index[date_idx],
+        count=counts.astype(int),
+        expected=expect,
+        deviation=counts - expect,
+        score=score,
+        direction=np.where(score < 0, 'drop', 'spike'),
+    )
+    result = result.iloc[np.argsort(-np.abs(score), kind='stable')].reset_index(drop=True)
+
+    logging.info(
+        f"Scored {values.shape[1]:,} series x {values.shape[0]} dates ({method}); "
+        f"{len(result):,} flagged above |score| > {threshold}"
+    )
+    return result
@@ -4,7 +4,12 @@ Converts numbered column headers to proper named headers
 """
 import pandas as pd
 import logging
+import os
 from pathlib import Path
+from . import normalize, planner
+from .utils.instrument import traced
+from .utils import columnar
+from .utils.logs import configure_logging
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = PROJECT_ROOT / "data"
@@ -12,9 +17,6 @@ PROCESSED_DATA_DIR = DATA_DIR / "processed"
 PROCESSED_FILE = PROCESSED_DATA_DIR / "processed_data.csv"
 CLEAN_FILE = PROCESSED_DATA_DIR / "cleaned_data.csv"
 
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s] : %(message)s:')
-
-
 # Column mapping from numbered headers to proper names
 COLUMN_MAPPING = {
     '0': 'Publication',
@@ -35,10 +37,102 @@ COLUMN_MAPPING = {
 }
 
 
+# Final column order: date_of_extract first, then the 15 main columns
+FINAL_COLUMNS = ['date_of_extract'] + list(COLUMN_MAPPING.values())
+
+
+def standardize_frame(df, normalize_labels=True):
+    """
+    Map numbered columns onto the named columns for an in-memory frame
+    
+    Args:
+        df: Raw rows with numbered (0-14) and/or named headers
+        normalize_labels: Canonicalize City, Publication and State labels
+                          (normalize.py); off to keep values as received
+    
+    Returns:
+        DataFrame with exactly FINAL_COLUMNS
+    """
+    # Numbered headers are ints when read straight from Excel
+    df = df.rename(columns=str)
+    for num_col, name_col in COLUMN_MAPPING.items():
+        if num_col not in df.columns:
+            continue
+        if name_col not in df.columns:
+            df[name_col] = df[num_col]
+            continue
+        # Copy values from numbered columns to named columns where numbered exists
+        mask = df[num_col].notna()
+        df.loc[mask, name_col] = df.loc[mask, num_col]
+    df = df.reindex(columns=FINAL_COLUMNS)
+    return normalize.normalize_frame(df) if normalize_labels else df
+
+
+def append_clean_rows(df_clean):
+    """
+    Append standardized rows to the clean data file
+    
+    Args:
+        df_clean: Output of standardize_frame()
+    
+    Returns:
+        Size of the file before the append (None when it did not exist), for
+        discard_clean_rows(); a failed append is undone before raising
+    """
+    PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    size = CLEAN_FILE.stat().st_size if CLEAN_FILE.exists() else None
+    try:
+        df_clean.to_csv(CLEAN_FILE, mode='a', header=size is None, index=False)
+    except BaseException:
+        discard_clean_rows(size)
+        raise
+    logging.info(f"Appended {len(df_clean):,} rows to {CLEAN_FILE}")
+    return size
+
+
+def discard_clean_rows(size):
+    """
+    Undo an append_clean_rows() call
+    
+    Args:
+        size: Value it returned (None removes the file it created)
+    """
+    if size is None:
+        CLEAN_FILE.unlink(missing_ok=True)
+    else:
+        os.truncate(CLEAN_FILE, size)
+    logging.info(f"Discarded rows appended to {CLEAN_FILE}")
+
+
+def clean_processed_file():
+    """
+    Write the clean data file within the memory budget: in memory with
+    standardize_columns() when the processed file fits, else in chunks
+    
+    Returns:
+        Number of rows written to the clean data file
+    """
+    if not PROCESSED_FILE.exists():
+        logging.error(f"Processed file not found: {PROCESSED_FILE}")
+        raise FileNotFoundError(f"Processed file not found: {PROCESSED_FILE}")
+    
+    chunk_rows = planner.csv_chunk_rows(PROCESSED_FILE)
+    if chunk_rows is not None:
+        return standardize_in_chunks(chunk_rows)
+    return len(standardize_columns())
+
+
+@traced()
 def standardize_columns():
     """
     Standardize column names in the processed data file.
     Converts numbered columns (0-14) to proper descriptive names.
+    
+    The whole file is loaded; use clean_processed_file() to stay within
+    the memory budget.
+    
+    Returns:
+        DataFrame written to the clean data file
     """
     logging.info("Starting column standardization...")
     
@@ -52,23 +146,15 @@ def standardize_columns():
     logging.info(f"Loaded {len(df):,} rows and {len(df.columns)} columns")
     
     # Identify rows that have numbered columns vs named columns
-    has_numbered = df['0'].notna()
-    has_named = df['Publication'].notna()
+    # Either layout may be absent when every file used the same headers
+    has_numbered = df['0'].notna() if '0' in df.columns else pd.Series(False, index=df.index)
+    has_named = df['Publication'].notna() if 'Publication' in df.columns else pd.Series(False, index=df.index)
     
     logging.info(f"Rows with numbered columns: {has_numbered.sum():,}")
     logging.info(f"Rows with named columns: {has_named.sum():,}")
     
     # For rows with numbered columns, map the values to the proper named columns
-    for num_col, name_col in COLUMN_MAPPING.items():
-        # Copy values from numbered columns to named columns where numbered exists
-        mask = df[num_col].notna()
-        df.loc[mask, name_col] = df.loc[mask, num_col]
-    
-    # Define the final column order (keeping date_of_extract first, then the 15 main columns)
-    final_columns = ['date_of_extract'] + list(COLUMN_MAPPING.values())
-    
-    # Keep only the standardized columns
-    df_clean = df[final_columns].copy()
+    df_clean = standardize_frame(df)
     
     logging.info(f"Standardized data shape: {df_clean.shape}")
     logging.info(f"Columns in clean data: {list(df_clean.columns)}")
@@ -77,32 +163,81 @@ def standardize_columns():
     df_clean.to_csv(CLEAN_FILE, index=False)
     logging.info(f"Clean data saved to {CLEAN_FILE}")
     
-    # Print summary statistics
+    # Columnar copy for fast memory-mapped loads by the analyzer and DB loader
+    columnar.write_cache(df_clean, CLEAN_FILE)
+    
+    print_summary(len(df_clean), df_clean.notna().sum(), df_clean['date_of_extract'].value_counts(),
+                  df_clean.head(), df_clean.dtypes)
+    
+    return df_clean
+
+
+@traced()
+def standardize_in_chunks(chunk_rows):
+    """
+    Standardize a processed file too large for the memory budget, chunk by chunk
+    
+    Values are read as text so every chunk writes them exactly as they
+    appear in the processed file. No columnar cache is written (it needs
+    the whole frame); a stale one is removed.
+    
+    Args:
+        chunk_rows: Rows per chunk (see planner.csv_chunk_rows)
+    
+    Returns:
+        Number of rows written
+    """
+    logging.info(f"Standardizing {PROCESSED_FILE} in chunks of {chunk_rows:,} rows")
+    tmp_path = CLEAN_FILE.with_name(CLEAN_FILE.name + ".tmp")
+    rows = 0
+    non_null = pd.Series(0, index=FINAL_COLUMNS)
+    extract_counts = pd.Series(dtype='int64')
+    head = None
+    try:
+        for chunk in pd.read_csv(PROCESSED_FILE, dtype=str, chunksize=chunk_rows):
+            df_clean = standardize_frame(chunk)
+            df_clean.to_csv(tmp_path, mode='a' if rows else 'w', header=not rows, index=False)
+            rows += len(df_clean)
+            non_null += df_clean.notna().sum()
+            extract_counts = extract_counts.add(df_clean['date_of_extract'].value_counts(), fill_value=0)
+            head = df_clean.head() if head is None else head
+        os.replace(tmp_path, CLEAN_FILE)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    columnar.cache_path(CLEAN_FILE).unlink(missing_ok=True)
+    logging.info(f"Clean data saved to {CLEAN_FILE} ({rows:,} rows)")
+    
+    print_summary(rows, non_null, extract_counts.astype('int64').rename('count'), head,
+                  head.dtypes if head is not None else None)
+    return rows
+
+
+def print_summary(n_rows, non_null, extract_counts, head, dtypes):
+    """Print the cleaning summary from per-column non-null counts and rows per extract date"""
     print("\n" + "="*80)
     print("DATA CLEANING SUMMARY")
     print("="*80)
-    print(f"Total rows: {len(df_clean):,}")
-    print(f"Total columns: {len(df_clean.columns)}")
+    print(f"Total rows: {n_rows:,}")
+    print(f"Total columns: {len(non_null)}")
     print(f"\nColumn names:")
-    for i, col in enumerate(df_clean.columns, 1):
-        non_null = df_clean[col].notna().sum()
-        print(f"  {i:2d}. {col:25s} - {non_null:,} non-null values ({non_null/len(df_clean)*100:.1f}%)")
+    for i, (col, count) in enumerate(non_null.items(), 1):
+        print(f"  {i:2d}. {col:25s} - {count:,} non-null values ({count/n_rows*100:.1f}%)")
     
     print(f"\nData by extract date:")
-    print(df_clean['date_of_extract'].value_counts().sort_index())
+    print(extract_counts.sort_index())
     
     print(f"\nFirst 5 rows:")
-    print(df_clean.head().to_string())
+    print(head.to_string() if head is not None else "(no rows)")
     
     print(f"\nData types:")
-    print(df_clean.dtypes)
+    print(dtypes)
     
     print("\n" + "="*80)
     print(f"✅ Clean data ready for analysis at: {CLEAN_FILE}")
     print("="*80)
-    
-    return df_clean
 
 
 if __name__ == "__main__":
-    standardize_columns()
+    configure_logging()
+    clean_processed_file()
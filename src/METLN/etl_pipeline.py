@@ -4,10 +4,10 @@ import glob
 import re
 import os
 
-from tqdm import tqdm
 from pathlib import Path
-from openpyxl import load_workbook
-from .excel_repair import extract_data_from_corrupted_xlsx
+from .excel_repair import extract_data_from_corrupted_xlsx, workbook_sheets, map_sheets, merge_sheets
+from . import planner, validation
+from .utils.instrument import traced, add_rows
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
@@ -15,10 +15,8 @@ DATA_DIR = PROJECT_ROOT / "data"
 RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 PROCESSED_FILE = PROCESSED_DATA_DIR / "processed_data.csv"
-
-
-logging.basicConfig(level = logging.INFO,
-                     format= '[%(asctime)s] : %(message)s:')
+# Parsed and validated raw files wait here until they are committed to PROCESSED_FILE
+STAGING_DIR = PROCESSED_DATA_DIR / "staging"
 
 
 # check for presence of raw data folder
@@ -58,21 +56,308 @@ def extract_date(filename):
 
 
 def load_processed_dates():
+    recover_processed()
     if not PROCESSED_FILE.exists():
         logging.error(f"No processed file exists yet. All data files are new.")
         return set()
     
-    df = pd.read_csv(PROCESSED_FILE)
+    # Only the date column is needed, so skip parsing the rest of the file
+    df = pd.read_csv(PROCESSED_FILE, usecols=lambda col: col == "date_of_extract")
     if "date_of_extract" not in df.columns:
         raise ValueError("Processed file must contain date_of_extract column")
-    processed_dates = set(df['date_of_extract'].unique())
+    # Compare as dates, matching what extract_date returns
+    processed_dates = set(pd.to_datetime(df['date_of_extract'].unique()).date)
     logging.info(f"Data is already processed for - {processed_dates}")
     return processed_dates
+
+
+# read one raw file, falling back to XML extraction for corrupted workbooks
+def read_excel_sheet(file, sheet_name):
+    """Read one named sheet with openpyxl (runs in worker processes)"""
+    return pd.read_excel(file, engine='openpyxl', sheet_name=sheet_name)
+
+
+def read_raw_file(file, workers=None):
+    """
+    Read every sheet of a raw workbook
+
+    Single-sheet workbooks are read as before. Workbooks with several sheets
+    (a month split across sheets) are read one sheet per worker process and
+    merged with a 'source_sheet' column; the XML repair reader is the
+    fallback in both cases.
+
+    Args:
+        file: Path to the Excel file
+        workers: Maximum worker processes for multi-sheet workbooks (None = one per CPU)
+
+    Returns:
+        pandas DataFrame with the data
+    """
+    try:
+        sheets = workbook_sheets(file)
+    except Exception:
+        sheets = []
+    if len(sheets) > 1:
+        try:
+            df = merge_sheets(map_sheets(read_excel_sheet, file, [(name, name) for name, _ in sheets], workers))
+            logging.info(f"Successfully read {len(sheets)} sheets of {file.name}")
+            return df
+        except Exception as e:
+            logging.info(f"Reading the sheets of {file.name} with openpyxl failed ({e}); trying XML extraction")
+            try:
+                df = extract_data_from_corrupted_xlsx(file, workers=workers)
+                logging.info(f"Successfully read {file.name} using manual XML extraction")
+                return df
+            except Exception as repair_error:
+                raise ValueError(f"All methods failed. Last error: {repair_error}")
+
+    methods = [
+        lambda: pd.read_excel(file, engine='openpyxl'),
+        lambda: pd.read_excel(file, engine='openpyxl', sheet_name=0),
+        lambda: pd.read_excel(file, engine='openpyxl', sheet_name='Sheet1'),
+    ]
     
+    # Try reading with openpyxl directly for corrupted files
+    for i, method in enumerate(methods):
+        try:
+            df = method()
+            logging.info(f"Successfully read {file.name} using method {i+1}")
+            return df
+        except Exception as method_error:
+            if i == len(methods) - 1:  # Last method
+                # Try manual repair using direct XML extraction
+                try:
+                    df = extract_data_from_corrupted_xlsx(file)
+                    logging.info(f"Successfully read {file.name} using manual XML extraction")
+                    return df
+                except Exception as repair_error:
+                    raise ValueError(f"All methods failed. Last error: {repair_error}")
+
+
+def _fsync(path):
+    """Flush a file (or, for a folder, its entries) to disk"""
+    if path.is_dir():
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    else:
+        fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path, write):
+    """
+    Write a file through a temporary sibling and rename it into place
+
+    A crash or failed write leaves the previous file untouched, never a
+    truncated one.
+
+    Args:
+        path: Destination file
+        write: Callable writing the complete content to the path it is given
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        write(tmp_path)
+        _fsync(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    # Persist the rename itself
+    _fsync(path.parent)
+
+
+def _pending_path():
+    # Holds the processed file's size before a commit until the commit is durable
+    return PROCESSED_FILE.with_name(PROCESSED_FILE.name + ".pending")
+
+
+def _truncate_processed(size):
+    """Cut the processed file back to a previous size (None removes it)"""
+    if size is None:
+        PROCESSED_FILE.unlink(missing_ok=True)
+    elif PROCESSED_FILE.exists():
+        os.truncate(PROCESSED_FILE, size)
+
+
+def recover_processed():
+    """
+    Undo a commit to the processed file that was interrupted by a crash
+
+    Returns:
+        True when a partial commit was rolled back
+    """
+    pending = _pending_path()
+    if not pending.exists():
+        return False
+    text = pending.read_text().strip()
+    _truncate_processed(int(text) if text else None)
+    PROCESSED_FILE.with_name(PROCESSED_FILE.name + ".tmp").unlink(missing_ok=True)
+    pending.unlink()
+    logging.warning(f"Rolled back an interrupted commit to {PROCESSED_FILE}")
+    return True
+
+
+def _rewrite_header(src, dst, header):
+    """Copy processed rows to dst under a wider header, as text and in budget-sized chunks"""
+    pd.DataFrame(columns=header).to_csv(dst, index = False)
+    chunk_rows = planner.csv_chunk_rows(src)
+    existing = pd.read_csv(src, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    for chunk in ([existing] if chunk_rows is None else existing):
+        chunk.reindex(columns=header).to_csv(dst, mode='a', header=False, index=False)
+
+
+# append new rows to the processed file without re-reading what is already there
+def append_processed(df):
+    append_frames([df])
+
+
+def append_frames(frames):
+    """
+    Append several frames to the processed file as one commit
+
+    Rows are appended in place and fsynced, reading each frame once and
+    holding one at a time. The size before the commit is recorded first: a
+    failed commit is truncated back to it straight away, and one cut short
+    by a crash on the next recover_processed(). Only a frame with new
+    columns makes the file be rewritten, once, through a temporary file
+    that replaces it when the commit completes.
+
+    Args:
+        frames: Frames to append, iterated once (e.g. staged pickles read one by one)
+
+    Returns:
+        Number of rows appended
+    """
+    PROCESSED_DATA_DIR.mkdir(parents = True, exist_ok = True)
+    recover_processed()
+    size = PROCESSED_FILE.stat().st_size if PROCESSED_FILE.exists() else None
+    header = list(pd.read_csv(PROCESSED_FILE, nrows=0).columns) if size is not None else None
+    pending = _pending_path()
+    pending.write_text("" if size is None else str(size))
+    _fsync(pending)
+
+    tmp_path = PROCESSED_FILE.with_name(PROCESSED_FILE.name + ".tmp")
+    target = PROCESSED_FILE
+    rows = 0
+    try:
+        for df in frames:
+            # Numbered headers read from Excel are ints but come back from the CSV as strings
+            df = df.rename(columns=str)
+            if header is None:
+                header = list(df.columns)
+                pd.DataFrame(columns=header).to_csv(target, index = False)
+            elif any(col not in header for col in df.columns):
+                # New columns change the header, so the rows so far are rewritten
+                # under it; the processed file itself is left as it was
+                header += [col for col in df.columns if col not in header]
+                widened = tmp_path.with_name(tmp_path.name + ".new") if target == tmp_path else tmp_path
+                _rewrite_header(target, widened, header)
+                if target == tmp_path:
+                    os.replace(widened, tmp_path)
+                else:
+                    _truncate_processed(size)
+                target = tmp_path
+            df.reindex(columns=header).to_csv(target, mode='a', header=False, index=False)
+            rows += len(df)
+        if header is not None:
+            _fsync(target)
+        # From here on the commit is complete, whether or not the rename below survives a crash
+        pending.unlink()
+        if target == tmp_path:
+            os.replace(tmp_path, PROCESSED_FILE)
+        _fsync(PROCESSED_DATA_DIR)
+    except BaseException:
+        if pending.exists():
+            tmp_path.unlink(missing_ok=True)
+            _truncate_processed(size)
+            pending.unlink()
+        raise
+    return rows
+
+
+def staged_path(file):
+    """Staging file for a raw file; the name carries its size and mtime so an edited file is parsed again"""
+    st = os.stat(file)
+    return STAGING_DIR / f"{file.stem}.{st.st_size:x}-{st.st_mtime_ns:x}.pkl"
+
+
+def _stale_stages(file, keep=None):
+    """Staging files of a raw file other than ``keep``"""
+    if not STAGING_DIR.exists():
+        return []
+    return [
+        path for path in STAGING_DIR.glob("*.pkl")
+        if path.name.rsplit(".", 2)[0] == file.stem and path != keep
+    ]
+
+
+def stage_file(file):
+    """
+    Parse and validate one raw file into the staging folder
+
+    The staged frame is written atomically, so after a crash a rerun reuses
+    every file that was completely staged and only parses the rest.
+
+    Args:
+        file: Raw workbook
+
+    Returns:
+        Path of the staged frame, or None when the file has no data
+    """
+    path = staged_path(file)
+    if path.exists():
+        logging.info(f"Reusing staged {file.name}")
+        return path
+
+    # Sheets read in parallel only as far as the memory budget allows
+    df = read_raw_file(file, workers=planner.ingest_workers(file))
+    if df is None:
+        return None
+    df.insert(0, "date_of_extract", extract_date(file.name))
+    df = validate_rows(df, file.name)
+
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, lambda tmp: df.to_pickle(tmp, compression=None))
+    for stale in _stale_stages(file, keep=path):
+        stale.unlink(missing_ok=True)
+    return path
+
+
+def discard_staged(file):
+    """Remove the staging files of a raw file (after it was committed)"""
+    for path in _stale_stages(file):
+        path.unlink(missing_ok=True)
+
+
+@traced()
+def validate_rows(df, source):
+    """
+    Quarantine rows of one file that fail the data-quality rules
+
+    Args:
+        df: Raw rows of one file, with date_of_extract already inserted
+        source: Source file name recorded with quarantined rows
+
+    Returns:
+        DataFrame of the rows that passed
+    """
+    valid, quarantined, counts = validation.validate(df)
+    extract = df["date_of_extract"].iat[0] if len(df) and "date_of_extract" in df.columns else None
+    validation.write_quarantine(quarantined, counts, source, len(df), extract)
+    return valid
+
 
 # combine all raw data files together to perform data cleaning and preprocessing before saving it to SQL Table
+@traced()
 def combine_data_files():
-    PROCESSED_DATA_DIR.mkdir(exist_ok = True)
+    from tqdm import tqdm
+
+    PROCESSED_DATA_DIR.mkdir(parents = True, exist_ok = True)
 
     check_raw_dir()
     raw_data_files = get_raw_data()
@@ -81,60 +366,38 @@ def combine_data_files():
         return
     
     processed_dates = load_processed_dates()
-    new_dataframes = []
+    staged = []
     skipped_files = []
 
+    # Stage 1: parse and validate each new file into its own staging file
     for file in tqdm(raw_data_files,desc="Processing files"):
         try:
             date_str = extract_date(file.name)
 
             if date_str in processed_dates:
                 skipped_files.append(file.name)
+                # Left over when a previous run stopped right after committing
+                discard_staged(file)
                 continue
 
-            # Try multiple methods to read the Excel file
-            df = None
-            methods = [
-                lambda: pd.read_excel(file, engine='openpyxl'),
-                lambda: pd.read_excel(file, engine='openpyxl', sheet_name=0),
-                lambda: pd.read_excel(file, engine='openpyxl', sheet_name='Sheet1'),
-            ]
-            
-            # Try reading with openpyxl directly for corrupted files
-            for i, method in enumerate(methods):
-                try:
-                    df = method()
-                    logging.info(f"Successfully read {file.name} using method {i+1}")
-                    break
-                except Exception as method_error:
-                    if i == len(methods) - 1:  # Last method
-                        # Try manual repair using direct XML extraction
-                        try:
-                            df = extract_data_from_corrupted_xlsx(file)
-                            logging.info(f"Successfully read {file.name} using manual XML extraction")
-                        except Exception as repair_error:
-                            raise ValueError(f"All methods failed. Last error: {repair_error}")
-            
-            if df is not None:
-                df.insert(0,"date_of_extract",date_str)
-                new_dataframes.append(df)
+            path = stage_file(file)
+            if path is not None:
+                staged.append((file, path))
         except Exception as e:
             logging.error(f"Error processing file {file.name} : {e}")
     
-    if not new_dataframes:
+    if not staged:
         logging.info("No new data found. All data files were previously processed")
         if skipped_files:
             logging.info(f"Skipped files already processed {skipped_files}")
+        return
     
-    combined_new = pd.concat(new_dataframes, ignore_index=True)
-    if PROCESSED_FILE.exists():
-        existing = pd.read_csv(PROCESSED_FILE)
-        final_df = pd.concat([existing, new_dataframes], ignore_index=True)
-    else:
-        final_df = combined_new
-    
-    final_df.to_csv(PROCESSED_FILE, index = False)
+    # Stage 2: commit every staged file to the processed file in one commit,
+    # holding one staged frame in memory at a time
+    add_rows(append_frames(pd.read_pickle(path) for _, path in staged))
+    for file, _ in staged:
+        discard_staged(file)
     logging.info(f"Processed data saved to {PROCESSED_FILE}")
     
     if skipped_files:
-        logging.info(f"Skipped already processed files: {skipped_files}")
\ No newline at end of file
+        logging.info(f"Skipped already processed files: {skipped_files}")
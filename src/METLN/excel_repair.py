@@ -1,128 +1,564 @@
 """
 Utility to repair and read corrupted Excel files
 """
+import numpy as np
 import pandas as pd
+import os
+import posixpath
+import re
+import sys
 import zipfile
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import logging
+from .utils.instrument import traced
 
+# Added to frames merged from several sheets: name of the sheet each row came from
+SHEET_COLUMN = 'source_sheet'
 
-def extract_data_from_corrupted_xlsx(file_path):
+# Rows preallocated when the sheet has no usable <dimension>; arrays double as needed
+DEFAULT_ROW_CAPACITY = 1024
+
+# Built-in number formats that display dates/times
+BUILTIN_DATE_FORMATS = frozenset(range(14, 23)) | {45, 46, 47}
+# Excel's day zero for serial dates (1900 date system, including its leap-year bug)
+EXCEL_EPOCH = np.datetime64('1899-12-30')
+
+_CELL_REF = re.compile(r'([A-Z]+)(\d*)')
+_DIMENSION = re.compile(r'[A-Z]+(\d+):([A-Z]+)(\d+)')
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+_DATE_TOKENS = re.compile(r'[dmyhs]', re.IGNORECASE)
+_ESCAPED_CHAR = re.compile(r'_x([0-9A-Fa-f]{4})_')
+_SHEET_NUMBER = re.compile(r'(\d+)\.xml$')
+_column_indexes = {}
+
+
+def _local(tag):
+    """Tag name without its namespace"""
+    return tag.rpartition('}')[2]
+
+
+def _namespace(tag):
+    """Namespace prefix of a tag ('{uri}' or ''); Excel uses more than one"""
+    return tag[:tag.index('}') + 1] if tag.startswith('{') else ''
+
+
+def _string_item_text(item, ns):
+    """
+    Text of a shared-string <si> or inline-string <is> element
+
+    Plain items hold one <t>; rich text splits the string into <r> runs,
+    each with its own <t>. Phonetic hints (<rPh>) are not part of the value.
+    """
+    parts = []
+    for child in item:
+        if child.tag == ns + 't':
+            parts.append(child.text or '')
+        elif child.tag == ns + 'r':
+            t = child.find(ns + 't')
+            if t is not None:
+                parts.append(t.text or '')
+    text = ''.join(parts)
+    if '_x' in text:
+        # Characters XML cannot carry are escaped as _xHHHH_ (e.g. _x000D_)
+        text = _ESCAPED_CHAR.sub(lambda m: chr(int(m.group(1), 16)), text)
+    return text
+
+
+def column_index(letters):
+    """Zero-based column number of a cell reference's letters (A -> 0, AB -> 27)"""
+    idx = _column_indexes.get(letters)
+    if idx is None:
+        idx = 0
+        for ch in letters:
+            idx = idx * 26 + ord(ch) - 64
+        idx -= 1
+        _column_indexes[letters] = idx
+    return idx
+
+
+class _ColumnBuilder:
+    """
+    Values of one column, written by row position into preallocated arrays
+
+    Numbers go straight into a float64 array and shared strings into an
+    int32 array of indexes into the shared-strings table; the object array
+    is only allocated once the column holds any other text.
+    """
+
+    def __init__(self, capacity):
+        self.numbers = np.full(capacity, np.nan)
+        self.codes = None
+        self.objects = None
+        self.n_numbers = 0
+        self.n_dates = 0
+        self.n_codes = 0
+        self.n_objects = 0
+
+    def grow(self, capacity):
+        numbers = np.full(capacity, np.nan)
+        numbers[:len(self.numbers)] = self.numbers
+        self.numbers = numbers
+        if self.codes is not None:
+            codes = np.full(capacity, -1, dtype=np.int32)
+            codes[:len(self.codes)] = self.codes
+            self.codes = codes
+        if self.objects is not None:
+            objects = np.empty(capacity, dtype=object)
+            objects[:len(self.objects)] = self.objects
+            self.objects = objects
+
+    def set_number(self, row, value, is_date=False):
+        self.numbers[row] = value
+        self.n_numbers += 1
+        self.n_dates += is_date
+
+    def set_code(self, row, idx):
+        if self.codes is None:
+            self.codes = np.full(len(self.numbers), -1, dtype=np.int32)
+        self.codes[row] = idx
+        self.n_codes += 1
+
+    def set_object(self, row, value):
+        if self.objects is None:
+            self.objects = np.empty(len(self.numbers), dtype=object)
+        self.objects[row] = value
+        self.n_objects += 1
+
+    def finish(self, n_rows, dictionary):
+        """
+        Final column array
+
+        Numeric columns stay float64 (int64 when complete and integral) and
+        are handed to pandas as-is; date-styled columns become datetime64;
+        columns of only shared strings become categoricals; other text and
+        mixed columns become object.
+
+        Args:
+            n_rows: Number of data rows
+            dictionary: _SharedStrings of the workbook
+        """
+        numbers = self.numbers[:n_rows]
+        is_dates = self.n_dates and self.n_dates == self.n_numbers
+        if self.n_codes:
+            codes = self.codes[:n_rows]
+            if self.n_numbers == 0 and self.n_objects == 0:
+                return dictionary.categorical(codes)
+            if self.objects is None:
+                self.objects = np.empty(len(self.numbers), dtype=object)
+            present = codes >= 0
+            self.objects[:n_rows][present] = dictionary.strings[codes[present]]
+        if self.n_objects == 0 and self.n_codes == 0:
+            if is_dates:
+                return _serial_to_datetime(numbers)
+            if self.n_numbers == n_rows and np.all(numbers == np.floor(numbers)):
+                return numbers.astype(np.int64)
+            return numbers
+        objects = self.objects[:n_rows]
+        if self.n_numbers:
+            mask = ~np.isnan(numbers)
+            if is_dates:
+                objects[mask] = list(pd.DatetimeIndex(_serial_to_datetime(numbers[mask])))
+            else:
+                objects[mask] = [int(x) if x.is_integer() else x for x in numbers[mask].tolist()]
+        return objects
+
+
+def _serial_to_datetime(serials):
+    """Excel serial day numbers to datetime64[ns] (NaN -> NaT), rounded to the millisecond"""
+    millis = np.round(serials * 86_400_000)
+    result = np.full(len(serials), np.datetime64('NaT'), dtype='datetime64[ns]')
+    valid = ~np.isnan(millis)
+    result[valid] = EXCEL_EPOCH + millis[valid].astype('timedelta64[ms]')
+    return result
+
+
+class _SharedStrings:
+    """
+    The shared-strings table as the dictionary of categorical columns
+
+    Entries with identical text (e.g. the same word once plain and once as
+    rich text) collapse into one category.
+    """
+
+    def __init__(self, strings):
+        self.strings = np.array(strings, dtype=object)
+        self._unique_codes = None
+        self._unique = None
+
+    def __len__(self):
+        return len(self.strings)
+
+    def categorical(self, codes):
+        """
+        Categorical column from table indexes (-1 = empty cell)
+
+        Categories are limited to the strings the column uses, so a State
+        column does not carry every city name in the workbook.
+        """
+        if self._unique_codes is None:
+            self._unique_codes, self._unique = pd.factorize(self.strings)
+        present = codes >= 0
+        merged = np.where(present, self._unique_codes[np.where(present, codes, 0)], -1)
+        used = np.flatnonzero(np.bincount(merged[present], minlength=len(self._unique)))
+        lookup = np.full(len(self._unique), -1, dtype=np.int32)
+        lookup[used] = np.arange(len(used), dtype=np.int32)
+        final = np.where(present, lookup[np.where(present, merged, 0)], -1)
+        return pd.Categorical.from_codes(final, categories=pd.Index(self._unique[used], dtype=object))
+
+
+def read_shared_strings(zip_ref):
+    """
+    Read the shared-strings table of a workbook
+
+    Args:
+        zip_ref: Open ZipFile of the workbook
+
+    Returns:
+        List of strings (empty when the workbook has none)
+    """
+    shared_strings = []
+    try:
+        with zip_ref.open('xl/sharedStrings.xml') as f:
+            root = ET.parse(f).getroot()
+    except KeyError:
+        logging.info("No shared strings found")
+        return shared_strings
+
+    ns = _namespace(root.tag)
+    shared_strings = [_string_item_text(si, ns) for si in root.iter(ns + 'si')]
+    logging.info(f"Found {len(shared_strings)} shared strings")
+    return shared_strings
+
+
+def read_date_styles(zip_ref):
+    """
+    Find the cell styles that display numbers as dates
+
+    Args:
+        zip_ref: Open ZipFile of the workbook
+
+    Returns:
+        Set of style indexes (the ``s`` attribute of cells); empty when the
+        workbook has no styles part
+    """
+    try:
+        with zip_ref.open('xl/styles.xml') as f:
+            root = ET.parse(f).getroot()
+    except KeyError:
+        return set()
+
+    date_formats = set(BUILTIN_DATE_FORMATS)
+    for elem in root.iter():
+        if _local(elem.tag) == 'numFmt':
+            code = _FORMAT_LITERALS.sub('', elem.get('formatCode', ''))
+            if _DATE_TOKENS.search(code):
+                date_formats.add(int(elem.get('numFmtId')))
+
+    date_styles = set()
+    for elem in root.iter():
+        if _local(elem.tag) == 'cellXfs':
+            for idx, xf in enumerate(x for x in elem if _local(x.tag) == 'xf'):
+                if int(xf.get('numFmtId', 0)) in date_formats:
+                    date_styles.add(str(idx))
+            break
+    return date_styles
+
+
+def read_sheet(zip_ref, sheet_name, shared_strings, date_styles=frozenset()):
+    """
+    Stream one worksheet into a DataFrame
+
+    Cells are placed by their ``r`` reference (so missing cells leave gaps
+    instead of shifting later values left) into per-column arrays sized from
+    the sheet's <dimension>. Numbers are converted while parsing, and
+    date-styled numbers become datetimes. The first non-empty row is the
+    header; empty rows are skipped.
+
+    Args:
+        zip_ref: Open ZipFile of the workbook
+        sheet_name: Archive path of the worksheet XML
+        shared_strings: Shared-strings table from read_shared_strings()
+        date_styles: Date style indexes from read_date_styles()
+
+    Returns:
+        pandas DataFrame with the data
+    """
+    dictionary = _SharedStrings(shared_strings)
+    capacity = DEFAULT_ROW_CAPACITY
+    columns = {}      # column index -> _ColumnBuilder
+    headers = None    # column index -> header text
+    n_rows = 0
+    sheet_data = None
+    ns = None
+
+    with zip_ref.open(sheet_name) as f:
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if ns is None:
+                    # Namespace of the root <worksheet>; full tags are compared from here on
+                    ns = _namespace(elem.tag)
+                    row_tag, v_tag, is_tag = ns + 'row', ns + 'v', ns + 'is'
+                elif elem.tag == ns + 'sheetData':
+                    sheet_data = elem
+                elif elem.tag == ns + 'dimension':
+                    match = _DIMENSION.fullmatch(elem.get('ref', ''))
+                    if match:
+                        capacity = max(int(match.group(3)) - int(match.group(1)), 1)
+                continue
+            if elem.tag != row_tag:
+                continue
+
+            is_header = headers is None
+            if is_header:
+                row_headers = {}
+            elif n_rows == capacity:
+                capacity *= 2
+                for builder in columns.values():
+                    builder.grow(capacity)
+
+            # Place each cell by its reference
+            written = False
+            position = -1
+            for cell in elem:
+                ref = cell.get('r')
+                position = column_index(_CELL_REF.match(ref).group(1)) if ref else position + 1
+                v = cell.find(v_tag)
+                if v is not None:
+                    value = v.text
+                else:
+                    inline = cell.find(is_tag)  # Inline string (t="inlineStr")
+                    if inline is None:
+                        continue
+                    value = _string_item_text(inline, ns)
+                if value is None:
+                    continue
+
+                cell_type = cell.get('t', 'n')  # 'n' for number, 's' for shared string, 'd' for date
+                code = -1
+                if cell_type == 's':
+                    idx = int(value)
+                    if idx < len(shared_strings):
+                        code = idx
+                        value = shared_strings[idx]
+                written = True
+                if is_header:
+                    # Header text as written (numbered layouts keep '0'..'14')
+                    row_headers[position] = value
+                    continue
+
+                builder = columns.get(position)
+                if builder is None:
+                    builder = columns[position] = _ColumnBuilder(capacity)
+                if code >= 0:
+                    builder.set_code(n_rows, code)
+                elif cell_type == 'n':
+                    try:
+                        builder.set_number(n_rows, float(value), cell.get('s') in date_styles)
+                    except ValueError:
+                        builder.set_object(n_rows, value)
+                else:
+                    builder.set_object(n_rows, value)
+
+            elem.clear()
+            if sheet_data is not None:
+                sheet_data.clear()
+            if not written:  # Only add non-empty rows
+                continue
+            if is_header:
+                headers = row_headers
+            else:
+                n_rows += 1
+
+    if sheet_data is None:
+        raise ValueError("No sheetData element found in worksheet")
+    if headers is None:
+        raise ValueError("No data found in worksheet")
+
+    n_cols = max(list(headers) + list(columns)) + 1
+    data = {}
+    for pos in range(n_cols):
+        builder = columns.get(pos)
+        data[pos] = builder.finish(n_rows, dictionary) if builder is not None else np.full(n_rows, np.nan)
+    df = pd.DataFrame(data, copy=False)
+    # Use the header row when it names every column
+    if len(headers) == n_cols:
+        df.columns = [headers[pos] for pos in range(n_cols)]
+    return df
+
+
+def list_sheets(zip_ref):
+    """
+    Worksheets of a workbook in the order Excel shows them
+
+    Sheets are resolved through xl/workbook.xml and its relationships part.
+    When those are missing (a common corruption) every worksheet part is
+    returned instead, ordered by number (sheet2 before sheet10).
+
+    Args:
+        zip_ref: Open ZipFile of the workbook
+
+    Returns:
+        List of (sheet name, archive path of the worksheet XML)
+    """
+    names = set(zip_ref.namelist())
+    try:
+        workbook = ET.fromstring(zip_ref.read('xl/workbook.xml'))
+        rels = ET.fromstring(zip_ref.read('xl/_rels/workbook.xml.rels'))
+    except (KeyError, ET.ParseError):
+        workbook = rels = None
+
+    if workbook is not None:
+        targets = {rel.get('Id'): rel.get('Target', '') for rel in rels if _local(rel.tag) == 'Relationship'}
+        sheets = []
+        for sheet in workbook.iter():
+            if _local(sheet.tag) != 'sheet':
+                continue
+            # r:id is namespaced; match on the local attribute name
+            rel_id = next((value for key, value in sheet.attrib.items() if _local(key) == 'id'), None)
+            target = targets.get(rel_id, '')
+            path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            # Chartsheets and dangling relationships have no worksheet data
+            if path.startswith('xl/worksheets/') and path in names:
+                sheets.append((sheet.get('name'), path))
+        if sheets:
+            return sheets
+        logging.warning("workbook.xml lists no readable worksheets; falling back to worksheet parts")
+
+    paths = [n for n in names if n.startswith('xl/worksheets/') and n.endswith('.xml') and '/_rels/' not in n]
+    paths.sort(key=lambda n: (int(m.group(1)) if (m := _SHEET_NUMBER.search(n)) else sys.maxsize, n))
+    return [(posixpath.splitext(posixpath.basename(path))[0], path) for path in paths]
+
+
+def workbook_sheets(file_path):
+    """list_sheets() for a workbook file"""
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        return list_sheets(zip_ref)
+
+
+def read_sheet_file(file_path, sheet_path):
+    """
+    Read one worksheet of a workbook file (runs in worker processes)
+
+    Args:
+        file_path: Path to the Excel file
+        sheet_path: Archive path of the worksheet XML
+
+    Returns:
+        pandas DataFrame with the data
+    """
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        return read_sheet(zip_ref, sheet_path, read_shared_strings(zip_ref), read_date_styles(zip_ref))
+
+
+def map_sheets(reader, file_path, sheets, workers=None):
+    """
+    Read several sheets of one workbook, one worker process per sheet
+
+    Each worker opens the workbook itself, so only the resulting frames
+    cross process boundaries. A single sheet (or workers=1) is read in
+    this process.
+
+    Args:
+        reader: Picklable function reader(file_path, key) -> DataFrame
+        file_path: Path to the Excel file
+        sheets: List of (sheet name, key passed to reader)
+        workers: Maximum worker processes (None = one per CPU)
+
+    Returns:
+        List of (sheet name, DataFrame) in sheet order; sheets that fail
+        (e.g. empty ones) are logged and left out
+
+    Raises:
+        The last error when no sheet could be read
+    """
+    workers = min(len(sheets), workers or os.cpu_count() or 1)
+    results = []
+    errors = []
+    if workers <= 1:
+        for name, key in sheets:
+            try:
+                results.append((name, reader(file_path, key)))
+            except Exception as e:
+                errors.append((name, e))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(name, pool.submit(reader, file_path, key)) for name, key in sheets]
+            for name, future in futures:
+                try:
+                    results.append((name, future.result()))
+                except Exception as e:
+                    errors.append((name, e))
+
+    for name, e in errors:
+        logging.warning(f"Skipping sheet '{name}' of {Path(file_path).name}: {e}")
+    if not results:
+        raise errors[-1][1] if errors else ValueError("No worksheet found in the Excel file")
+    return results
+
+
+def merge_sheets(frames):
+    """
+    Stack the frames of several sheets
+
+    Args:
+        frames: List of (sheet name, DataFrame) from map_sheets()
+
+    Returns:
+        The frame itself for a single sheet; otherwise the concatenated rows
+        with a SHEET_COLUMN naming each row's sheet. Columns that are
+        categorical in every sheet stay categorical.
+    """
+    # Empty sheets would only turn integer columns into floats
+    frames = [(name, df) for name, df in frames if len(df)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0][1]
+
+    dfs = [df for _, df in frames]
+    common = set(dfs[0].columns).intersection(*(df.columns for df in dfs[1:]))
+    for col in common:
+        if all(isinstance(df[col].dtype, pd.CategoricalDtype) for df in dfs):
+            categories = pd.api.types.union_categoricals([df[col] for df in dfs]).categories
+            dfs = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in dfs]
+
+    merged = pd.concat(
+        [df.assign(**{SHEET_COLUMN: name}) for (name, _), df in zip(frames, dfs)],
+        ignore_index=True,
+    )
+    logging.info(f"Merged {len(frames)} sheets ({len(merged)} rows)")
+    return merged
+
+
+@traced()
+def extract_data_from_corrupted_xlsx(file_path, workers=None):
     """
     Manually extract data from a corrupted .xlsx file by reading the XML directly.
-    
+
+    Every worksheet is read (in parallel when there are several) and merged
+    with a SHEET_COLUMN naming the sheet of origin.
+
     Args:
         file_path: Path to the Excel file
-        
+        workers: Maximum worker processes for multi-sheet workbooks (None = one per CPU)
+
     Returns:
         pandas DataFrame with the data
     """
     logging.info(f"Attempting manual extraction for {file_path}")
-    
+
     try:
         # xlsx files are zip archives
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            # Read shared strings (if any)
-            shared_strings = []
-            try:
-                with zip_ref.open('xl/sharedStrings.xml') as f:
-                    tree = ET.parse(f)
-                    root = tree.getroot()
-                    # Excel uses multiple possible namespaces for shared strings
-                    namespaces = [
-                        {'ss': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'},
-                        {'ss': 'http://purl.oclc.org/ooxml/spreadsheetml/main'}
-                    ]
-                    
-                    # Try different namespaces
-                    for ns in namespaces:
-                        si_elements = root.findall('.//ss:si', ns)
-                        if si_elements:
-                            for si in si_elements:
-                                t = si.find('.//ss:t', ns)
-                                if t is not None:
-                                    shared_strings.append(t.text if t.text else '')
-                                else:
-                                    shared_strings.append('')
-                            logging.info(f"Found {len(shared_strings)} shared strings")
-                            break
-            except KeyError:
-                logging.info("No shared strings found")
-            
-            # Find the first worksheet
-            sheet_files = [f for f in zip_ref.namelist() if f.startswith('xl/worksheets/sheet')]
-            if not sheet_files:
-                raise ValueError("No worksheet found in the Excel file")
-            
-            # Read the first sheet
-            with zip_ref.open(sheet_files[0]) as f:
-                tree = ET.parse(f)
-                root = tree.getroot()
-                
-                # Excel uses multiple possible namespaces
-                namespaces = {
-                    'ss': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
-                    'ss2': 'http://purl.oclc.org/ooxml/spreadsheetml/main'
-                }
-                
-                # Try to find sheetData with different namespaces
-                sheet_data = None
-                for ns_key, ns_val in namespaces.items():
-                    sheet_data = root.find(f'.//{{{ns_val}}}sheetData')
-                    if sheet_data is not None:
-                        ns = {ns_key: ns_val}
-                        logging.info(f"Found sheetData using namespace: {ns_val}")
-                        break
-                
-                if sheet_data is None:
-                    raise ValueError("No sheetData element found in worksheet")
-                
-                # Extract all rows
-                rows_data = []
-                for row in sheet_data.findall(f'.//{{{ns[ns_key]}}}row'):
-                    row_data = []
-                    cells = row.findall(f'.//{{{ns[ns_key]}}}c')
-                    
-                    # Track cell references to handle missing cells
-                    for cell in cells:
-                        value = cell.find(f'.//{{{ns[ns_key]}}}v')
-                        cell_type = cell.get('t', 'n')  # 'n' for number, 's' for shared string, 'd' for date
-                        
-                        if value is not None:
-                            if cell_type == 's':  # Shared string
-                                idx = int(value.text)
-                                if idx < len(shared_strings):
-                                    row_data.append(shared_strings[idx])
-                                else:
-                                    row_data.append(value.text)
-                            else:
-                                row_data.append(value.text)
-                        else:
-                            row_data.append(None)
-                    
-                    if row_data:  # Only add non-empty rows
-                        rows_data.append(row_data)
-                
-                if not rows_data:
-                    raise ValueError("No data found in worksheet")
-                
-                # First row as headers
-                headers = rows_data[0] if rows_data else []
-                data_rows = rows_data[1:] if len(rows_data) > 1 else []
-                
-                # Make sure all rows have the same length
-                max_cols = max(len(row) for row in rows_data) if rows_data else 0
-                for row in data_rows:
-                    while len(row) < max_cols:
-                        row.append(None)
-                
-                # Create DataFrame
-                df = pd.DataFrame(data_rows, columns=headers if len(headers) == max_cols else None)
-                logging.info(f"Successfully extracted {len(df)} rows and {len(df.columns)} columns")
-                
-                return df
-                
+        sheets = workbook_sheets(file_path)
+        if not sheets:
+            raise ValueError("No worksheet found in the Excel file")
+
+        frames = map_sheets(read_sheet_file, file_path, sheets, workers)
+        df = merge_sheets(frames)
+        logging.info(f"Successfully extracted {len(df)} rows and {len(df.columns)} columns")
+
+        return df
+
     except Exception as e:
         logging.error(f"Failed to manually extract data: {e}")
         raise
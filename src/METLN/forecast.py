@@ -0,0 +1,181 @@
+"""
+Batched forecasting across segment time series
+Fits linear-trend and exponential-smoothing models to every publication,
+state or route series at once (the recursion runs over dates, vectorized
+over series) on the same date x segment count matrix as anomaly.py, and
+backtests them on the latest extracts
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+METHODS = ('linear', 'ses', 'holt')
+
+# Smoothing parameters tried for every series; the pair with the lowest
+# in-sample one-step-ahead squared error is kept per series
+ALPHA_GRID = np.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+BETA_GRID = np.array([0.05, 0.1, 0.2, 0.3, 0.5])
+
+DEFAULT_HORIZON = 3
+DEFAULT_HOLDOUT = 3
+
+
+def _linear(values, horizon):
+    """Least-squares line per column, extrapolated horizon steps"""
+    n = values.shape[0]
+    x = np.arange(n, dtype=float)
+    x_centered = x - x.mean()
+    y_mean = values.mean(axis=0)
+    slope = x_centered @ (values - y_mean) / (x_centered @ x_centered) if n > 1 else np.zeros(values.shape[1])
+    steps = np.arange(n, n + horizon, dtype=float)[:, None] - x.mean()
+    return y_mean + steps * slope, {'slope': slope}
+
+
+def _smooth(values, horizon, alphas, betas, trend):
+    """
+    Exponential smoothing for every column and every parameter pair at once
+
+    Runs the level (and trend) recursion for all len(alphas) * len(betas)
+    parameter pairs as a (pairs, series) array, keeps the pair with the
+    lowest one-step-ahead squared error per series and extrapolates it.
+    """
+    n, n_series = values.shape
+    alpha = np.repeat(alphas, len(betas))[:, None]
+    beta = np.tile(betas, len(alphas))[:, None]
+
+    level = np.broadcast_to(values[0], (len(alpha), n_series)).copy()
+    slope = np.zeros_like(level)
+    if trend and n > 1:
+        slope[:] = values[1] - values[0]
+    sse = np.zeros_like(level)
+    for t in range(1, n):
+        predicted = level + slope
+        sse += (values[t] - predicted) ** 2
+        new_level = alpha * values[t] + (1 - alpha) * predicted
+        if trend:
+            slope = beta * (new_level - level) + (1 - beta) * slope
+        level = new_level
+
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(n_series)
+    level, slope = level[best, columns], slope[best, columns]
+    steps = np.arange(1, horizon + 1, dtype=float)[:, None]
+    params = {'alpha': alpha[best, 0]}
+    if trend:
+        params['beta'] = beta[best, 0]
+    return level + steps * slope, params
+
+
+def forecast_values(values, horizon=DEFAULT_HORIZON, method='holt'):
+    """
+    Forecast every column of a (date x series) array
+
+    Args:
+        values: 2-D float array, rows are dates (oldest first), columns are series
+        horizon: Number of future extracts to forecast
+        method: 'linear' - least-squares trend line
+                'ses'    - simple exponential smoothing (flat forecast)
+                'holt'   - Holt's exponential smoothing with a linear trend
+
+    Returns:
+        (forecasts, params): a (horizon x series) array clipped at zero and a
+        dictionary of fitted per-series parameter arrays
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape[0] == 0:
+        raise ValueError("Cannot forecast series without history")
+    if method == 'linear':
+        forecasts, params = _linear(values, horizon)
+    elif method == 'ses':
+        forecasts, params = _smooth(values, horizon, ALPHA_GRID, np.zeros(1), trend=False)
+    elif method == 'holt':
+        forecasts, params = _smooth(values, horizon, ALPHA_GRID, BETA_GRID, trend=True)
+    else:
+        raise ValueError(f"Unknown method '{method}'. Expected one of {METHODS}")
+    # Subscription counts cannot go negative
+    return np.maximum(forecasts, 0), params
+
+
+def backtest(values, holdout=DEFAULT_HOLDOUT, method='holt'):
+    """
+    Fit on all but the last ``holdout`` dates and score the forecast of them
+
+    Args:
+        values: 2-D (date x series) array
+        holdout: Number of most recent dates held out
+        method: See forecast_values()
+
+    Returns:
+        Dictionary of per-series arrays: mae, rmse, mape (%, over non-zero
+        actuals), naive_mae (repeating the last training value) and skill
+        (1 - mae / naive_mae; above 0 beats the naive forecast). All NaN when
+        there are fewer than holdout + 3 dates.
+    """
+    values = np.asarray(values, dtype=float)
+    n_series = values.shape[1]
+    if holdout < 1 or values.shape[0] < holdout + 3:
+        empty = np.full(n_series, np.nan)
+        return {name: empty for name in ('mae', 'rmse', 'mape', 'naive_mae', 'skill')}
+
+    train, actual = values[:-holdout], values[-holdout:]
+    predicted, _ = forecast_values(train, holdout, method)
+    errors = actual - predicted
+    naive_errors = actual - train[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.abs(errors).mean(axis=0)
+        naive_mae = np.abs(naive_errors).mean(axis=0)
+        nonzero = actual != 0
+        pct_errors = np.where(nonzero, np.abs(errors) / np.where(nonzero, np.abs(actual), 1), 0)
+        mape = pct_errors.sum(axis=0) / nonzero.sum(axis=0) * 100
+        return {
+            'mae': mae,
+            'rmse': np.sqrt((errors ** 2).mean(axis=0)),
+            'mape': mape,
+            'naive_mae': naive_mae,
+            'skill': np.where(naive_mae > 0, 1 - mae / naive_mae, np.nan),
+        }
+
+
+def future_dates(dates, horizon):
+    """Extract dates after the last one: the dates' own frequency if regular, else the median gap"""
+    dates = pd.DatetimeIndex(dates)
+    freq = pd.infer_freq(dates) if len(dates) >= 3 else None
+    if freq is not None:
+        return pd.date_range(dates[-1], periods=horizon + 1, freq=freq, name=dates.name)[1:]
+    step = pd.Series(dates).diff().median() if len(dates) > 1 else pd.Timedelta(days=30)
+    step = pd.Timedelta(days=max(1, round(step / pd.Timedelta(days=1))))
+    return pd.DatetimeIndex([dates[-1] + step * (i + 1) for i in range(horizon)], name=dates.name)
+
+
+def forecast_segments(matrix, horizon=DEFAULT_HORIZON, method='holt', holdout=DEFAULT_HOLDOUT, min_volume=10):
+    """
+    Forecast and backtest every series of a date x segment count matrix
+
+    Args:
+        matrix: Output of anomaly.segment_matrix()
+        horizon: Number of future extracts to forecast
+        method: See forecast_values()
+        holdout: Recent extracts held out for the backtest
+        min_volume: Skip series whose median count is below this value
+
+    Returns:
+        (forecasts, metrics): forecasts is indexed by future extract date with
+        the matrix's segment columns; metrics has one row per segment with
+        the backtest errors (see backtest()) and the fitted parameters
+    """
+    values = matrix.to_numpy(dtype=float)
+    keep = np.median(values, axis=0) >= min_volume if len(values) else np.zeros(values.shape[1], dtype=bool)
+    values = values[:, keep]
+    segments = matrix.columns[keep]
+
+    predicted, params = forecast_values(values, horizon, method)
+    forecasts = pd.DataFrame(predicted, index=future_dates(matrix.index, horizon), columns=segments)
+    metrics = pd.DataFrame({**backtest(values, holdout, method), **params}, index=segments)
+
+    mape = metrics['mape'].median()
+    logging.info(
+        f"Forecast {values.shape[1]:,} series x {horizon} extracts ({method}); "
+        f"backtest median MAPE {mape:.1f}%"
+    )
+    return forecasts, metrics
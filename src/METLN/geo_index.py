@@ -0,0 +1,279 @@
+"""
+Geography index module for MTLN project
+Counts subscriptions by state -> city -> zip3 -> zip5 per extract date in one
+pass over the rows, so drill-downs (top cities of a state, zips under a
+prefix, a city's zips) are lookups into small pre-aggregated tables instead
+of groupbys over the full frame
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = 'date_of_extract'
+
+# Zip as stored in the extracts: 3-5 digits (Excel drops leading zeros),
+# optionally a '.0' from a float column and a '+4' suffix
+ZIP_PATTERN = r'^(\d{3,5})(?:\.0)?(?:-\d{4})?$'
+
+# Sorts after every digit, so [prefix, prefix + ':') spans all zips starting with prefix
+_PREFIX_END = ':'
+
+
+def _zip_codes(values):
+    """Row codes into sorted zip5 strings (-1 where missing or not a zip), parsing each distinct value once"""
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    text = pd.Series(np.asarray(uniques, dtype=object)).map(
+        lambda v: str(int(v)) if isinstance(v, (float, np.floating)) and float(v).is_integer() else str(v).strip()
+    )
+    zip5 = text.str.extract(ZIP_PATTERN, expand=False).str.zfill(5)
+    zip_codes, zip_uniques = pd.factorize(zip5, sort=True, use_na_sentinel=True)
+    return np.append(zip_codes, -1)[codes], pd.Index(zip_uniques, dtype=object)
+
+
+def normalize_zips(values):
+    """
+    Five-digit zip strings ('04101') for raw zip values
+
+    Args:
+        values: Zip values (ints, floats or strings)
+
+    Returns:
+        Series of zip5 strings aligned with ``values``; None where the value
+        is missing or not a zip
+    """
+    values = pd.Series(values)
+    codes, uniques = _zip_codes(values)
+    labels = np.append(uniques.to_numpy(dtype=object), None)
+    return pd.Series(labels[codes], index=values.index, dtype=object)
+
+
+def _level(key_codes, key_labels, names, date_codes, dates, counts):
+    """
+    Wide key x date table from leaf counts
+
+    Args:
+        key_codes: Code array per key column (-1 = missing, row dropped)
+        key_labels: Sorted labels per key column
+        names: Key column names
+        date_codes, dates: Date code per leaf and the sorted dates
+        counts: Row count per leaf
+
+    Returns:
+        DataFrame with one row per key (sorted) and one column per date
+    """
+    keep = np.logical_and.reduce([codes >= 0 for codes in key_codes])
+    shape = tuple(len(labels) for labels in key_labels)
+    flat = np.ravel_multi_index([codes[keep] for codes in key_codes], shape)
+    # Labels are sorted, so sorting the codes sorts the keys
+    keys, inverse = np.unique(flat, return_inverse=True)
+    matrix = np.bincount(inverse * len(dates) + date_codes[keep], weights=counts[keep],
+                         minlength=len(keys) * len(dates))
+    positions = np.unravel_index(keys, shape)
+    if len(names) == 1:
+        index = pd.Index(key_labels[0].take(positions[0]), name=names[0])
+    else:
+        index = pd.MultiIndex.from_arrays([labels.take(pos) for labels, pos in zip(key_labels, positions)],
+                                          names=names)
+    return pd.DataFrame(matrix.astype(np.int64).reshape(len(keys), len(dates)), index=index, columns=dates)
+
+
+def _prefix_rows(frame, prefix):
+    """Rows of a frame (sorted string index) whose key starts with prefix"""
+    if not prefix:
+        return frame
+    keys = frame.index.to_numpy(dtype=object)
+    lo = np.searchsorted(keys, prefix, side='left')
+    hi = np.searchsorted(keys, prefix + _PREFIX_END, side='left')
+    return frame.iloc[lo:hi]
+
+
+def _column(frame, date):
+    """Counts for one extract date, or totals over all dates"""
+    if date is None:
+        return frame.sum(axis=1)
+    date = pd.Timestamp(date)
+    if date not in frame.columns:
+        return pd.Series(0, index=frame.index, dtype='int64')
+    return frame[date]
+
+
+class GeoIndex:
+    """
+    Pre-aggregated subscription counts for every geography level
+
+    Each level is a wide table with one row per key and one column per
+    extract date, sorted by key:
+        states:      state
+        cities:      (state, city)
+        city_names:  city (merged across states, rows without a state included)
+        zips:        (state, city, zip5)
+        zip3:        zip3
+        zip5:        zip5
+    Rows with a missing key at a level are left out of that level only.
+    """
+
+    def __init__(self, states, cities, city_names, zips, zip3, zip5):
+        self.states = states
+        self.cities = cities
+        self.city_names = city_names
+        self.zips = zips
+        self.zip3 = zip3
+        self.zip5 = zip5
+        # Per-state city totals, largest first, so top-k is a head()
+        totals = cities.sum(axis=1)
+        order = np.lexsort((-totals.to_numpy(), totals.index.get_level_values('state')))
+        self._city_totals = totals.iloc[order]
+        # Largest city names first (same as value_counts)
+        self._city_name_totals = city_names.sum(axis=1).sort_values(ascending=False, kind='stable')
+
+    @classmethod
+    def build(cls, df, state='state', city='city', zip_column='zip', date=DATE_COLUMN, count=None):
+        """
+        Build the index in one pass over the rows
+
+        Args:
+            df: Subscription rows with date, state, city and zip columns
+            state, city, zip_column, date: Column names
+            count: Column holding a row count per row when ``df`` is already
+                   grouped (e.g. a GROUP BY result); None counts rows
+
+        Returns:
+            GeoIndex
+        """
+        factorized = [pd.factorize(df[col], sort=True, use_na_sentinel=True) for col in (date, state, city)]
+        if zip_column in df.columns:
+            factorized.append(_zip_codes(df[zip_column]))
+        else:
+            factorized.append((np.full(len(df), -1), pd.Index([], dtype=object)))
+        labels = [pd.Index(uniques) for _, uniques in factorized]
+
+        # One pass over the rows: count each (date, state, city, zip5) leaf.
+        # Missing values get code 0 here so each level can drop them separately
+        shape = tuple(len(uniques) + 1 for uniques in labels)
+        leaf = np.ravel_multi_index([codes + 1 for codes, _ in factorized], shape)
+        if count is None:
+            leaf, counts = np.unique(leaf, return_counts=True)
+        else:
+            leaf, inverse = np.unique(leaf, return_inverse=True)
+            counts = np.bincount(inverse, weights=df[count].to_numpy(dtype=np.float64)).astype(np.int64)
+        date_codes, state_codes, city_codes, zip_codes = (pos - 1 for pos in np.unravel_index(leaf, shape))
+        dates, states, cities, zips = labels
+        dates = dates.rename(DATE_COLUMN)
+        keep = date_codes >= 0
+        date_codes, state_codes, city_codes, zip_codes, counts = (
+            a[keep] for a in (date_codes, state_codes, city_codes, zip_codes, counts))
+
+        zip3_codes, zip3 = pd.factorize(zips.str[:3], sort=True) if len(zips) else (np.empty(0, dtype=np.intp), zips)
+        zip3_codes = np.append(zip3_codes, -1)[zip_codes]
+        zip3 = pd.Index(zip3, dtype=object)
+
+        def level(*pairs):
+            return _level([codes for codes, _, _ in pairs], [lab for _, lab, _ in pairs],
+                          [name for _, _, name in pairs], date_codes, dates, counts)
+
+        state_key = (state_codes, states, 'state')
+        city_key = (city_codes, cities, 'city')
+        zip5_key = (zip_codes, zips, 'zip5')
+        index = cls(level(state_key), level(state_key, city_key), level(city_key),
+                    level(state_key, city_key, zip5_key), level((zip3_codes, zip3, 'zip3')), level(zip5_key))
+        logging.info(f"Geography index built: {len(index.states)} states, {len(index.cities):,} cities, "
+                     f"{len(index.zip5):,} zips over {index.states.shape[1]} extract dates")
+        return index
+
+    @classmethod
+    def merge(cls, indexes):
+        """
+        Combine indexes built over disjoint sets of rows
+
+        Args:
+            indexes: GeoIndex objects (e.g. one per slice of the data)
+
+        Returns:
+            GeoIndex equal to one built over all the rows
+        """
+        def combine(frames):
+            first = frames[0].index
+            merged = pd.concat(frames).groupby(level=list(range(first.nlevels))).sum()
+            merged = merged.fillna(0).astype(np.int64).sort_index(axis=1)
+            # groupby infers label dtypes; keep the built ones (zips are object)
+            if first.nlevels == 1:
+                merged.index = merged.index.astype(first.dtype)
+            else:
+                merged.index = merged.index.set_levels(
+                    [level.astype(built.dtype) for level, built in zip(merged.index.levels, first.levels)])
+            merged.index.names = first.names
+            # Dates as built (the sorted union of the slices' dates may carry an inferred freq)
+            merged.columns = pd.Index(merged.columns.to_numpy(), name=DATE_COLUMN)
+            return merged
+
+        levels = ('states', 'cities', 'city_names', 'zips', 'zip3', 'zip5')
+        return cls(*(combine([getattr(index, level) for index in indexes]) for level in levels))
+
+    @property
+    def dates(self):
+        """Extract dates covered by the index"""
+        return self.states.columns
+
+    def state_counts(self, date=None):
+        """Subscriptions per state on one extract date (default: all dates)"""
+        return _column(self.states, date)
+
+    def city_counts(self, state, date=None):
+        """Subscriptions per city of one state"""
+        if state not in self.cities.index.get_level_values('state'):
+            return pd.Series(dtype='int64')
+        return _column(self.cities.loc[state], date)
+
+    def top_cities(self, k=10, state=None, date=None):
+        """
+        Largest cities overall or within one state
+
+        Args:
+            k: Number of cities
+            state: State code (default: all states, cities merged by name)
+            date: Extract date (default: totals over all dates)
+
+        Returns:
+            Series of counts indexed by city, largest first
+        """
+        if date is None:
+            if state is None:
+                return self._city_name_totals.head(k)
+            if state not in self._city_totals.index.get_level_values('state'):
+                return pd.Series(dtype='int64')
+            return self._city_totals.loc[state].head(k)
+        if state is None:
+            counts = _column(self.city_names, date)
+        else:
+            counts = self.city_counts(state, date)
+        return counts.sort_values(ascending=False, kind='stable').head(k)
+
+    def zip_counts(self, prefix='', date=None):
+        """Subscriptions per zip5 for zips starting with prefix (e.g. '041')"""
+        return _column(_prefix_rows(self.zip5, prefix), date)
+
+    def zip3_counts(self, prefix='', date=None):
+        """Subscriptions per zip3 area for areas starting with prefix"""
+        return _column(_prefix_rows(self.zip3, prefix), date)
+
+    def city_zip_counts(self, state, city, date=None):
+        """Subscriptions per zip5 of one city"""
+        try:
+            rows = self.zips.loc[(state, city)]
+        except KeyError:
+            return pd.Series(dtype='int64')
+        return _column(rows, date)
+
+    def state_series(self, states=None):
+        """Extract date x state counts (all states by default)"""
+        frame = self.states if states is None else self.states.reindex(states, fill_value=0)
+        return frame.T.rename_axis(columns='state')
+
+    def city_series(self, cities, state=None):
+        """Extract date x city counts; without a state, cities are merged by name across states"""
+        if state is None:
+            frame = self.city_names
+        else:
+            frame = self.cities[self.cities.index.get_level_values('state') == state].droplevel('state')
+        return frame.reindex(cities, fill_value=0).T.rename_axis(columns='city')
@@ -0,0 +1,163 @@
+"""
+Label normalization module for MTLN project
+Canonicalizes City, Publication and State values (whitespace, case and
+punctuation, then a persisted alias table) on their distinct values only,
+and maps the canonical forms back to the rows through factorize codes, so
+the cost follows the number of distinct labels rather than the number of rows
+"""
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+ALIAS_FILE = PROJECT_ROOT / "config" / "aliases.csv"
+
+NORMALIZED_COLUMNS = ('Publication', 'City', 'State')
+
+_aliases = {}  # (path, size, mtime) -> {column: {rule form, casefolded: canonical}}
+
+
+def _text(value):
+    """Text form of a label: whole floats lose their '.0', whitespace runs become one space"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    return ' '.join(str(value).split())
+
+
+def _capitalize(segment):
+    # Mixed case is kept as written (McAdam, DeWitt); all-caps names such as
+    # MCADAM cannot be told apart from Mcadam here and are fixed by aliases
+    return segment.capitalize() if segment.isupper() or segment.islower() else segment
+
+
+def _city(text):
+    # Each part of a hyphenated name is a word of its own (Dover-Foxcroft).
+    # Abbreviations are kept (St George, E Millinocket are official names);
+    # the ones to spell out are listed in the alias table
+    return ' '.join('-'.join(map(_capitalize, word.split('-'))) for word in text.replace('.', ' ').split())
+
+
+def _code(text):
+    return text.replace('.', '').upper()
+
+
+# Column -> rule applied to the text form of each distinct value
+RULES = {
+    'City': _city,
+    'Publication': str.upper,
+    'State': _code,
+}
+
+
+def _rule_form(value, column):
+    """Rule-normalized text of one value, None when it is blank"""
+    text = _text(value)
+    return RULES.get(column, str)(text) or None
+
+
+def load_aliases(path=ALIAS_FILE):
+    """
+    Read the alias table (column, alias, canonical; '#' starts a comment)
+
+    Aliases are matched after the rules and without regard to case, so one
+    entry covers every spelling the rules already fold together. The table
+    is re-read only when the file changes.
+
+    Returns:
+        Dictionary of column -> {alias key: canonical value} ({} when the
+        file is missing)
+    """
+    path = Path(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    if key not in _aliases:
+        table = pd.read_csv(path, comment='#', dtype=str, skipinitialspace=True).dropna()
+        aliases = {}
+        for column, alias, canonical in table[['column', 'alias', 'canonical']].itertuples(index=False):
+            alias = _rule_form(alias, column)
+            if alias is not None:
+                aliases.setdefault(column, {})[alias.casefold()] = _text(canonical)
+        _aliases.clear()
+        _aliases[key] = aliases
+        logging.info(f"Loaded {sum(map(len, aliases.values()))} aliases from {path}")
+    return _aliases[key]
+
+
+def canonical_forms(uniques, column, aliases=None):
+    """
+    Canonical value of each distinct label
+
+    Args:
+        uniques: Distinct non-null values
+        column: Column they come from (selects the rule and the aliases)
+        aliases: load_aliases() result (default: the alias file)
+
+    Returns:
+        Object array aligned with ``uniques`` (None where a value is blank)
+    """
+    aliases = load_aliases() if aliases is None else aliases
+    table = aliases.get(column, {})
+    out = np.empty(len(uniques), dtype=object)
+    for i, value in enumerate(uniques):
+        form = _rule_form(value, column)
+        out[i] = table.get(form.casefold(), form) if form is not None else None
+    return out
+
+
+def normalize_values(values, column, aliases=None):
+    """
+    Normalize one column's labels
+
+    Args:
+        values: Labels (Series or array)
+        column: Column they come from
+        aliases: load_aliases() result (default: the alias file)
+
+    Returns:
+        Series of canonical labels aligned with ``values``; text columns
+        keep their dtype
+    """
+    return _normalize(values, column, aliases)[0]
+
+
+def _normalize(values, column, aliases):
+    """normalize_values() plus the distinct counts before and after"""
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    # Canonical forms get codes of their own; rows are remapped code to code
+    # and each label is taken from a small array instead of built per row
+    form_codes, labels = pd.factorize(canonical_forms(uniques, column, aliases), use_na_sentinel=True)
+    row_codes = np.append(form_codes, -1)[codes]
+    dtype = values.dtype if pd.api.types.is_string_dtype(values.dtype) else object
+    labels = pd.array(np.asarray(labels, dtype=object), dtype=dtype)
+    result = pd.Series(labels.take(row_codes, allow_fill=True), index=values.index, name=values.name)
+    return result, len(uniques), len(labels)
+
+
+def normalize_frame(df, columns=NORMALIZED_COLUMNS, aliases=None):
+    """
+    Normalize the label columns of a cleaned frame
+
+    Args:
+        df: Rows with named (cleaned) headers
+        columns: Columns to normalize (missing ones are skipped)
+        aliases: load_aliases() result (default: the alias file)
+
+    Returns:
+        Copy of ``df`` with canonical labels
+    """
+    aliases = load_aliases() if aliases is None else aliases
+    df = df.copy()
+    for column in columns:
+        if column not in df.columns:
+            continue
+        df[column], before, after = _normalize(df[column], column, aliases)
+        if after != before:
+            logging.info(f"Normalized '{column}': {before:,} -> {after:,} distinct values")
+    return df
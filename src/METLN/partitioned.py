@@ -0,0 +1,344 @@
+"""
+Partitioned aggregation module for MTLN project
+Computes the analyzer's daily counts, status / publication / geography
+breakdowns and summary totals as partial aggregates over bounded slices of
+the cleaned data in a process pool, then merges the partials, so the full
+history never has to be loaded as one DataFrame
+"""
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import planner
+from .geo_index import GeoIndex
+from .utils import columnar, dates
+
+DATE_COLUMN = 'date_of_extract'
+
+# Most rows handed to one worker; the memory budget may lower it (planner.py)
+DEFAULT_ROWS_PER_TASK = 250_000
+
+# Columns counted distinct per extract date (merged as (date, value) pairs)
+PAIR_COLUMNS = ('publication', 'city', 'state', 'route_id')
+
+# Partial results a CSV reader may queue per worker before waiting
+_QUEUE_PER_WORKER = 2
+
+
+def _prepare(df, columns, source):
+    """Analysis column names and parsed extract dates (as TimeSeriesAnalyzer._prepare)"""
+    df = df.rename(columns=columns)
+    df[DATE_COLUMN] = dates.parse_dates(df[DATE_COLUMN], source=source, column=DATE_COLUMN, errors='raise')
+    return df
+
+
+def partial_aggregates(df):
+    """
+    Aggregate one slice of prepared rows
+
+    Args:
+        df: Rows with analysis column names and a parsed extract date
+
+    Returns:
+        Dictionary of partial results that merge_partials() combines
+    """
+    by_date = df[DATE_COLUMN]
+    active = df['status'] == 'A'
+    pairs = {}
+    for col in PAIR_COLUMNS:
+        pairs[col] = df[[DATE_COLUMN, col]].dropna().drop_duplicates()
+    return {
+        'rows': len(df),
+        'active': active.sum(),
+        'daily': pd.DataFrame({
+            'total_subscriptions': df['accoutid'].groupby(by_date).count(),
+            'active_subscriptions': active.groupby(by_date).sum(),
+        }),
+        'pairs': pairs,
+        'accounts': np.unique(np.asarray(df['accoutid'].dropna().unique())),
+        'status': df.groupby([DATE_COLUMN, 'status']).size(),
+        'publication': df.groupby([DATE_COLUMN, 'publication']).size(),
+        'publication_counts': df['publication'].value_counts(sort=False),
+        'geography': GeoIndex.build(df),
+    }
+
+
+def _arrow_task(csv_path, start, stop, columns):
+    """Partial aggregates of rows [start, stop) of the columnar cache (runs in worker processes)"""
+    pa = columnar._pyarrow()
+    with pa.memory_map(str(columnar.cache_path(csv_path)), 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    # Slicing the mapped table is free; only this slice is converted
+    table = table.select([c for c in table.column_names if c in columns]).slice(start, stop - start)
+    return partial_aggregates(_prepare(table.to_pandas(split_blocks=True), columns, csv_path))
+
+
+def _frame_task(df, columns, source):
+    """Partial aggregates of one CSV chunk (runs in worker processes)"""
+    return partial_aggregates(_prepare(df, columns, source))
+
+
+def _arrow_rows(csv_path):
+    """Row count of the columnar cache (read from the mapped file without loading it)"""
+    pa = columnar._pyarrow()
+    with pa.memory_map(str(columnar.cache_path(csv_path)), 'r') as source:
+        return pa.ipc.open_file(source).read_all().num_rows
+
+
+def _in_order(pool, calls, ahead):
+    """
+    Results of calls run in a process pool, yielded in submission order
+
+    At most ``ahead`` calls are submitted but not yet consumed, so finished
+    results do not pile up while the caller merges earlier ones.
+
+    Args:
+        pool: ProcessPoolExecutor
+        calls: Iterable of (function, *args) tuples
+        ahead: Most calls in flight at once
+    """
+    pending = deque()
+    for call in calls:
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+        pending.append(pool.submit(*call))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _map_arrow(csv_path, columns, workers, rows_per_task):
+    """Partials of the columnar cache, one task per row range, yielded in row order"""
+    n_rows = _arrow_rows(csv_path)
+    bounds = list(range(0, n_rows, rows_per_task)) + [n_rows]
+    tasks = list(zip(bounds[:-1], bounds[1:])) or [(0, 0)]
+    logging.info(f"Aggregating {n_rows:,} rows from {columnar.cache_path(csv_path)} in {len(tasks)} tasks")
+    if workers <= 1:
+        for start, stop in tasks:
+            yield _arrow_task(csv_path, start, stop, columns)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        calls = ((_arrow_task, csv_path, start, stop, columns) for start, stop in tasks)
+        yield from _in_order(pool, calls, workers * _QUEUE_PER_WORKER)
+
+
+def _map_csv(csv_path, columns, workers, rows_per_task):
+    """Partials of the CSV read in chunks, yielded in row order; only a few chunks are in memory at a time"""
+    # Labels and IDs as text so every chunk agrees on their type
+    text = {col: str for col, name in columns.items() if name != DATE_COLUMN}
+    chunks = pd.read_csv(csv_path, usecols=lambda c: c in columns, dtype=text, chunksize=rows_per_task)
+    logging.info(f"Aggregating {csv_path} in chunks of {rows_per_task:,} rows (no columnar cache)")
+    if workers <= 1:
+        for chunk in chunks:
+            yield _frame_task(chunk, columns, csv_path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        calls = ((_frame_task, chunk, columns, csv_path) for chunk in chunks)
+        yield from _in_order(pool, calls, workers * _QUEUE_PER_WORKER)
+
+
+def _fold(merged, partial):
+    """Merge one more partial (covering later rows) into the running merge"""
+    return {
+        'rows': merged['rows'] + partial['rows'],
+        'active': merged['active'] + partial['active'],
+        'daily': pd.concat([merged['daily'], partial['daily']]).groupby(level=0).sum(),
+        'pairs': {
+            col: pd.concat([merged['pairs'][col], partial['pairs'][col]], ignore_index=True).drop_duplicates()
+            for col in PAIR_COLUMNS
+        },
+        # Sorted unique IDs, so the union is a merge rather than a hash of every ID seen
+        'accounts': np.union1d(merged['accounts'], partial['accounts']),
+        'status': pd.concat([merged['status'], partial['status']]).groupby(level=[0, 1]).sum(),
+        'publication': pd.concat([merged['publication'], partial['publication']]).groupby(level=[0, 1]).sum(),
+        # First-seen order, so ties rank as in value_counts()
+        'publication_counts': pd.concat([merged['publication_counts'], partial['publication_counts']])
+                                .groupby(level=0, sort=False).sum(),
+        'geography': GeoIndex.merge([merged['geography'], partial['geography']]),
+    }
+
+
+def read_extracts(csv_path, columns, extract_dates, rows_per_task=DEFAULT_ROWS_PER_TASK):
+    """
+    Rows of some extract dates, read from the CSV in chunks
+
+    Labels and IDs keep pandas' inferred types, as when the whole file is
+    loaded, so values hash the same as in memory mode (sketch.hash_values).
+
+    Args:
+        csv_path: Cleaned data CSV
+        columns: Source header -> analysis column name
+        extract_dates: Extract dates to keep
+        rows_per_task: Rows read per chunk
+
+    Returns:
+        DataFrame of the matching rows with analysis column names
+    """
+    wanted = pd.DatetimeIndex(extract_dates)
+    columns = {**columns, DATE_COLUMN: DATE_COLUMN}
+    chunks = pd.read_csv(csv_path, usecols=lambda c: c in columns, chunksize=rows_per_task)
+    parts = [df[df[DATE_COLUMN].isin(wanted)] for df in (_prepare(chunk, columns, csv_path) for chunk in chunks)]
+    rows = pd.concat(parts, ignore_index=True)
+    logging.info(f"Read {len(rows):,} rows of {len(wanted)} extracts from {csv_path}")
+    return rows
+
+
+def merge_partials(partials, source=None):
+    """
+    Combine partial aggregates in row order
+
+    Each partial is folded into running totals as it arrives and dropped,
+    so only the merged results and one partial are held at a time.
+
+    Args:
+        partials: Iterable of partial_aggregates() results, in the order of
+                  the rows they cover (e.g. as workers finish them)
+        source: (csv_path, columns, rows_per_task) the partials were computed
+                from, for PartitionedAggregates.extract_rows()
+
+    Returns:
+        PartitionedAggregates
+    """
+    merged, count = None, 0
+    for partial in partials:
+        merged = partial if merged is None else _fold(merged, partial)
+        count += 1
+    if merged is None:
+        raise ValueError("No partial aggregates to merge")
+    logging.info(f"Merged {count} partials")
+    return PartitionedAggregates(
+        rows=merged['rows'],
+        active=merged['active'],
+        daily=merged['daily'].sort_index(),
+        pairs=merged['pairs'],
+        n_accounts=len(merged['accounts']),
+        status=merged['status'].unstack(fill_value=0),
+        publication=merged['publication'].unstack(fill_value=0),
+        publication_counts=merged['publication_counts'].sort_values(ascending=False),
+        geography=merged['geography'],
+        source=source,
+    )
+
+
+def aggregate(csv_path, columns, workers=None, rows_per_task=None):
+    """
+    Map-reduce the analyzer's aggregates over a cleaned data CSV
+
+    Reads the memory-mapped columnar cache when it is fresh (each worker
+    converts only its row range), otherwise the CSV in chunks; either way
+    at most a few slices of rows are in memory at once.
+
+    Args:
+        csv_path: Cleaned data CSV
+        columns: Source header -> analysis column name (the extract date
+                 column keeps its name)
+        workers: Maximum worker processes (None = as many as the memory
+                 budget allows, up to one per CPU; 1 = this process)
+        rows_per_task: Rows aggregated per task (None = sized from the memory budget)
+
+    Returns:
+        PartitionedAggregates
+    """
+    columns = {**columns, DATE_COLUMN: DATE_COLUMN}
+    if workers is None or rows_per_task is None:
+        plan = planner.analysis_plan(csv_path)
+        workers = workers or plan['workers']
+        rows_per_task = rows_per_task or plan['rows_per_task']
+    if columnar.is_fresh(csv_path):
+        partials = _map_arrow(csv_path, columns, workers, rows_per_task)
+    else:
+        partials = _map_csv(csv_path, columns, workers, rows_per_task)
+    aggregates = merge_partials(partials, source=(csv_path, columns, rows_per_task))
+    logging.info(f"Aggregated {aggregates.rows:,} rows, {len(aggregates.daily)} extract dates")
+    return aggregates
+
+
+class PartitionedAggregates:
+    """
+    Merged aggregates of the whole cleaned data
+
+    Holds everything the analyzer's breakdowns and summary report need, so
+    they are answered without the rows:
+        rows, active:        row and active-status totals
+        daily:               per-date total and active subscriptions
+        pairs:               distinct (date, value) pairs of PAIR_COLUMNS
+        n_accounts:          distinct account IDs
+        status, publication: date x label row counts
+        publication_counts:  rows per publication, largest first
+        geography:           GeoIndex of all rows
+        source:              (csv_path, columns, rows_per_task) read by
+                             extract_rows(), or None
+    """
+
+    def __init__(self, rows, active, daily, pairs, n_accounts, status, publication,
+                 publication_counts, geography, source=None):
+        self.rows = rows
+        self.active = active
+        self.daily = daily
+        self.pairs = pairs
+        self.n_accounts = n_accounts
+        self.status = status
+        self.publication = publication
+        self.publication_counts = publication_counts
+        self.geography = geography
+        self.source = source
+
+    @property
+    def dates(self):
+        """Extract dates, sorted"""
+        return self.daily.index
+
+    def daily_aggregations(self, distinct_columns):
+        """
+        Daily counts with exact distinct counts
+
+        Args:
+            distinct_columns: Column -> output name for the distinct counts
+
+        Returns:
+            DataFrame indexed by extract date, as the in-memory groupby
+        """
+        daily = self.daily.copy()
+        for col, name in distinct_columns.items():
+            daily[name] = self.pairs[col].groupby(DATE_COLUMN).size().reindex(daily.index, fill_value=0)
+        return daily
+
+    def distinct_count(self, column, start=None, end=None):
+        """
+        Number of distinct values of a column over a range of extract dates
+
+        Account IDs are kept as one set over all dates, not per date (that
+        would be about one entry per row), so they are counted over the
+        whole history only.
+
+        Raises:
+            ValueError: for account IDs with a start or end date, and for
+                        columns other than PAIR_COLUMNS
+        """
+        if column == 'accoutid' and start is None and end is None:
+            return int(self.n_accounts)
+        if column not in self.pairs:
+            raise ValueError(f"Distinct counts of '{column}' over a date range are not supported in "
+                             f"partitioned mode")
+        pairs = self.pairs[column]
+        mask = np.ones(len(pairs), dtype=bool)
+        if start is not None:
+            mask &= (pairs[DATE_COLUMN] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (pairs[DATE_COLUMN] <= pd.Timestamp(end)).to_numpy()
+        return int(pairs.loc[mask, column].nunique())
+
+    def extract_rows(self, extract_dates):
+        """
+        Rows of some extract dates, read back from the source CSV (e.g. to
+        build the sketches of new extracts)
+
+        Raises:
+            ValueError: when the aggregates were not computed from a CSV
+        """
+        if self.source is None:
+            raise ValueError("These aggregates have no source CSV to read rows from")
+        csv_path, columns, rows_per_task = self.source
+        return read_extracts(csv_path, columns, extract_dates, rows_per_task)
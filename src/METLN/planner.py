@@ -0,0 +1,341 @@
+"""
+Memory planning module for MTLN project
+Turns one pipeline-wide memory budget (config/config.yaml) into worker
+counts and chunk sizes for ingest, cleaning, database loading and analysis,
+from a cheap pre-scan of the inputs: each workbook's sheet <dimension> and
+part sizes, and a sample of each CSV's lines
+"""
+import logging
+import os
+import re
+import zipfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+CONFIG_FILE = PROJECT_ROOT / "config" / "config.yaml"
+
+# Overrides the configured budget, e.g. METLN_MEMORY_BUDGET_MB=1500
+BUDGET_ENV = "METLN_MEMORY_BUDGET_MB"
+
+DEFAULT_AUTO_FRACTION = 0.6
+MIN_BUDGET_MB = 256
+
+# Peak memory per unit of input, measured on the synthetic benchmark data
+# (15-column extracts, pandas 3 with pyarrow strings)
+EXCEL_CELL_BYTES = 75     # openpyxl read of one worksheet cell
+CSV_PARSE_FACTOR = 5      # parsed frame vs CSV text, e.g. 104 B lines -> ~500 B rows
+SQL_ROW_BYTES = 2_400     # one row inside a to_sql batch (parameter tuples)
+ANALYSIS_ROW_BYTES = 300  # one row in a partitioned-analysis task
+
+# Fallback when a sheet has no usable <dimension>: XML bytes per cell
+XML_CELL_BYTES = 35
+
+# Budget share of one database chunk: load_frame_to_sql copies it once more
+DATABASE_SHARE = 0.25
+
+MIN_CHUNK_ROWS = 10_000
+CSV_SAMPLE_LINES = 2_000
+
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    Read config/config.yaml
+
+    Returns:
+        Dictionary of settings ({} when the file is missing, empty or
+        PyYAML is not installed)
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        import yaml
+    except ImportError:
+        logging.info("PyYAML not installed; using default memory settings")
+        return {}
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _setting(config, section, key):
+    """config[section][key], with None and 'auto' meaning not set"""
+    value = (config.get(section) or {}).get(key)
+    return None if value in (None, "auto") else value
+
+
+def _read_int(path):
+    try:
+        return int(Path(path).read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def available_memory():
+    """
+    Bytes of memory this process can still use
+
+    The smaller of MemAvailable and the remaining cgroup (container) limit;
+    physical memory when neither can be read, None when nothing can.
+    """
+    candidates = []
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    candidates.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+    limit = _read_int("/sys/fs/cgroup/memory.max")  # 'max' (no limit) reads as None
+    if limit is None:
+        limit = _read_int("/sys/fs/cgroup/memory/memory.limit_in_bytes")  # cgroup v1
+    if limit is not None and limit < 1 << 60:
+        usage = _read_int("/sys/fs/cgroup/memory.current") or _read_int(
+            "/sys/fs/cgroup/memory/memory.usage_in_bytes") or 0
+        candidates.append(max(0, limit - usage))
+    if candidates:
+        return min(candidates)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def memory_budget(config=None):
+    """
+    Pipeline memory budget in bytes
+
+    METLN_MEMORY_BUDGET_MB wins over memory.budget_mb in config.yaml; with
+    neither set (or 'auto') the budget is memory.auto_fraction (default 0.6)
+    of the available memory.
+    """
+    config = load_config() if config is None else config
+    budget_mb = os.environ.get(BUDGET_ENV) or _setting(config, "memory", "budget_mb")
+    if budget_mb is None:
+        available = available_memory()
+        if available is None:
+            return 2_048 * 2**20
+        fraction = float(_setting(config, "memory", "auto_fraction") or DEFAULT_AUTO_FRACTION)
+        return max(MIN_BUDGET_MB * 2**20, int(available * fraction))
+    return max(MIN_BUDGET_MB, int(float(budget_mb))) * 2**20
+
+
+def _cpus():
+    return os.cpu_count() or 1
+
+
+def _column_number(letters):
+    number = 0
+    for char in letters.decode():
+        number = number * 26 + ord(char) - ord('A') + 1
+    return number
+
+
+def scan_workbook(path):
+    """
+    Estimate the size of every worksheet without parsing it
+
+    Reads the <dimension ref="A1:O64001"/> element at the start of each
+    sheet's XML; when it is missing or only names one cell (some writers do
+    that), rows are estimated from the uncompressed XML size.
+
+    Args:
+        path: Excel workbook
+
+    Returns:
+        List of dictionaries with sheet, rows, columns and xml_bytes
+    """
+    from .excel_repair import list_sheets
+
+    sheets = []
+    with zipfile.ZipFile(path) as zip_ref:
+        for name, part in list_sheets(zip_ref):
+            try:
+                info = zip_ref.getinfo(part)
+            except KeyError:
+                continue
+            with zip_ref.open(info) as f:
+                head = f.read(4096)
+            match = _DIMENSION.search(head)
+            rows = columns = None
+            if match and match.group(3):
+                columns = _column_number(match.group(3)) - _column_number(match.group(1)) + 1
+                rows = max(0, int(match.group(4)) - int(match.group(2)))  # header row excluded
+            if not rows:
+                columns = columns or 15
+                rows = info.file_size // (XML_CELL_BYTES * columns)
+            sheets.append({'sheet': name, 'rows': rows, 'columns': columns, 'xml_bytes': info.file_size})
+    return sheets
+
+
+def scan_csv(path):
+    """
+    Estimate a CSV's row count from its size and a sample of its lines
+
+    Returns:
+        Dictionary with rows, columns, bytes and bytes_per_row (zeros for a
+        missing or empty file)
+    """
+    path = Path(path)
+    if not path.exists() or path.stat().st_size == 0:
+        return {'rows': 0, 'columns': 0, 'bytes': 0, 'bytes_per_row': 0}
+    size = path.stat().st_size
+    with open(path, 'rb') as f:
+        header = f.readline()
+        sample = [line for _, line in zip(range(CSV_SAMPLE_LINES), f)]
+    sampled = sum(len(line) for line in sample)
+    bytes_per_row = sampled / len(sample) if sample else len(header) or 1
+    return {
+        'rows': int((size - len(header)) / bytes_per_row) if sample else 0,
+        'columns': header.count(b',') + 1,
+        'bytes': size,
+        'bytes_per_row': bytes_per_row,
+    }
+
+
+def _scan_sheets(path):
+    """scan_workbook(), or [] for a file that is not a readable zip"""
+    try:
+        return scan_workbook(path)
+    except (OSError, zipfile.BadZipFile):
+        return []
+
+
+def ingest_workers(path, budget=None, config=None, sheets=None):
+    """
+    Worker processes for reading one workbook's sheets
+
+    As many sheets are read at once as fit in the budget (at least one,
+    at most one per CPU and per sheet). ingest.workers overrides.
+
+    Args:
+        path: Excel workbook
+        budget: Budget in bytes (default: memory_budget())
+        config: Parsed config.yaml
+        sheets: scan_workbook() result, when already scanned
+    """
+    config = load_config() if config is None else config
+    configured = _setting(config, "ingest", "workers")
+    if configured is not None:
+        return int(configured)
+    budget = memory_budget(config) if budget is None else budget
+    sheets = _scan_sheets(path) if sheets is None else sheets
+    if not sheets:
+        return 1
+    largest = max(sheet['rows'] * sheet['columns'] for sheet in sheets) * EXCEL_CELL_BYTES
+    return max(1, min(len(sheets), _cpus(), budget // max(1, largest)))
+
+
+def csv_chunk_rows(path, budget=None, config=None, section="cleaning", share=0.5):
+    """
+    Rows per chunk for streaming a CSV, or None to load it whole
+
+    The file is loaded whole (as before) when its parsed frame fits in
+    ``share`` of the budget, leaving the rest for the copies the stage
+    makes; otherwise chunks are sized to that share. <section>.chunk_rows
+    overrides.
+
+    Args:
+        path: CSV to read
+        budget: Budget in bytes (default: memory_budget())
+        config: Parsed config.yaml
+        section: Config section with the chunk_rows override ('cleaning', 'database')
+        share: Fraction of the budget one parsed chunk may take
+    """
+    config = load_config() if config is None else config
+    configured = _setting(config, section, "chunk_rows")
+    if configured is not None:
+        return int(configured) or None
+    budget = memory_budget(config) if budget is None else budget
+    scan = scan_csv(path)
+    row_bytes = max(1, scan['bytes_per_row'] * CSV_PARSE_FACTOR)
+    if scan['rows'] * row_bytes <= budget * share:
+        return None
+    return max(MIN_CHUNK_ROWS, int(budget * share / row_bytes))
+
+
+def sql_batch_rows(n_rows, budget=None, config=None):
+    """
+    Rows per to_sql batch: what fits in a quarter of the budget next to the frame
+
+    database.batch_rows overrides.
+    """
+    config = load_config() if config is None else config
+    configured = _setting(config, "database", "batch_rows")
+    if configured is not None:
+        return int(configured)
+    budget = memory_budget(config) if budget is None else budget
+    return max(MIN_CHUNK_ROWS, min(max(1, n_rows), int(budget / 4 / SQL_ROW_BYTES)))
+
+
+def analysis_plan(path, budget=None, config=None):
+    """
+    How TimeSeriesAnalyzer should run over a cleaned data CSV
+
+    In memory when the parsed frame fits in half the budget, otherwise
+    partitioned, with tasks sized so every worker's slice fits in its share
+    of the budget. analysis.execution / workers / rows_per_task override.
+
+    Returns:
+        Dictionary with execution, workers and rows_per_task
+    """
+    from .partitioned import DEFAULT_ROWS_PER_TASK
+
+    config = load_config() if config is None else config
+    budget = memory_budget(config) if budget is None else budget
+    scan = scan_csv(path)
+    fits = scan['rows'] * scan['bytes_per_row'] * CSV_PARSE_FACTOR <= budget / 2
+    workers = int(_setting(config, "analysis", "workers") or _cpus())
+    rows_per_task = _setting(config, "analysis", "rows_per_task")
+    if rows_per_task is None:
+        rows_per_task = max(MIN_CHUNK_ROWS, min(DEFAULT_ROWS_PER_TASK, int(budget / workers / ANALYSIS_ROW_BYTES)))
+    # Fewer workers than CPUs when even minimum-size tasks would not fit
+    workers = max(1, min(workers, int(budget // (int(rows_per_task) * ANALYSIS_ROW_BYTES))))
+    return {
+        'execution': _setting(config, "analysis", "execution") or ('memory' if fits else 'partitioned'),
+        'workers': workers,
+        'rows_per_task': int(rows_per_task),
+    }
+
+
+def plan_pipeline(raw_files=(), processed_file=None, clean_file=None, config=None):
+    """
+    Pre-scan the inputs and report the settings every stage will use
+
+    Args:
+        raw_files: Workbooks still to ingest
+        processed_file: processed_data.csv (cleaning input)
+        clean_file: cleaned_data.csv (database and analysis input)
+        config: Parsed config.yaml (default: read it)
+
+    Returns:
+        Dictionary with the budget and one entry per stage
+    """
+    config = load_config() if config is None else config
+    budget = memory_budget(config)
+    plan = {'budget_mb': budget // 2**20, 'cpus': _cpus()}
+    plan['ingest'] = {}
+    for file in raw_files:
+        sheets = _scan_sheets(file)
+        plan['ingest'][Path(file).name] = {
+            'sheets': len(sheets),
+            'rows': sum(sheet['rows'] for sheet in sheets),
+            'workers': ingest_workers(file, budget, config, sheets),
+        }
+    if processed_file is not None:
+        plan['cleaning'] = {
+            'rows': scan_csv(processed_file)['rows'],
+            'chunk_rows': csv_chunk_rows(processed_file, budget, config),
+        }
+    if clean_file is not None:
+        rows = scan_csv(clean_file)['rows']
+        plan['database'] = {
+            'rows': rows,
+            'chunk_rows': csv_chunk_rows(clean_file, budget, config, section="database", share=DATABASE_SHARE),
+            'batch_rows': sql_batch_rows(rows, budget, config),
+        }
+        plan['analysis'] = analysis_plan(clean_file, budget, config)
+    logging.info(f"Memory plan: {plan}")
+    return plan
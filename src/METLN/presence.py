@@ -0,0 +1,333 @@
+"""
+Account presence index for MTLN data
+Maps every account ID to a dense integer and keeps one bitmap per
+(extract date, publication, status), so questions such as "accounts present
+in February and June but not October, for publication X" are answered with
+bitwise AND/OR/NOT instead of filtering the rows once per snapshot
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PRESENCE_FILE_PREFIX = "presence_"
+ACCOUNTS_FILE = "accounts.npy"
+
+# Stored label for a missing publication or status
+MISSING = ""
+
+def _popcount(bits):
+    """Number of set bits in a packed uint8 array"""
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return int(np.bitwise_count(bits).sum())
+    return int(np.unpackbits(bits).sum())
+
+
+def _resize(bits, n_bytes):
+    """Packed bitmap zero-extended to n_bytes (accounts added later are absent)"""
+    if len(bits) >= n_bytes:
+        return bits
+    out = np.zeros(n_bytes, dtype=np.uint8)
+    out[:len(bits)] = bits
+    return out
+
+
+class AccountSet:
+    """
+    Set of accounts as a packed bitmap over the index's dense account IDs
+
+    Combine with & (and), | (or), - (and not), ^ (xor) and ~ (every known
+    account not in the set).
+    """
+
+    def __init__(self, index, bits):
+        self.index = index
+        self.bits = _resize(bits, index.n_bytes)
+
+    def _combine(self, other, op):
+        if other.index is not self.index:
+            raise ValueError("Cannot combine account sets from different indexes")
+        return AccountSet(self.index, op(self.bits, other.bits))
+
+    def __and__(self, other):
+        return self._combine(other, np.bitwise_and)
+
+    def __or__(self, other):
+        return self._combine(other, np.bitwise_or)
+
+    def __xor__(self, other):
+        return self._combine(other, np.bitwise_xor)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def __invert__(self):
+        return AccountSet(self.index, ~self.bits & self.index.universe)
+
+    def __len__(self):
+        return _popcount(self.bits)
+
+    def __contains__(self, account_id):
+        dense = self.index.dense_ids([account_id])[0]
+        return dense >= 0 and bool(self.bits[dense >> 3] & (0x80 >> (dense & 7)))
+
+    def dense_ids(self):
+        """Dense IDs of the accounts in the set"""
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.index.n_accounts))
+
+    def account_ids(self):
+        """Account IDs in the set, in dense-ID (first seen) order"""
+        return self.index.accounts[self.dense_ids()]
+
+
+class PresenceIndex:
+    """
+    Per-extract presence bitmaps persisted next to the data
+
+    Dense account IDs are assigned in first-seen order and never change, so
+    partitions built earlier stay valid as new extracts add accounts; each
+    partition is stored once as presence_<date>.npz (zlib-compressed) and
+    the account dictionary as accounts.npy. Each partition also keeps its
+    extract's row count (rows with an account ID), the signature sync()
+    checks against the data's own per-extract counts.
+
+    Only the files are compressed: in memory every (publication, status) of
+    every extract is a dense packed bitmap over all known accounts, i.e.
+    n_accounts / 8 bytes however few accounts it holds (about 125 KB per
+    group and extract at a million accounts).
+    """
+
+    def __init__(self, directory=None):
+        """
+        Initialize the index
+
+        Args:
+            directory: Folder holding the index files (None = in memory only)
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self.accounts = np.empty(0, dtype=np.int64)  # dense ID -> account ID
+        self._lookup = pd.Index(self.accounts)
+        # date string -> {'rows': int, 'keys': [(publication, status)], 'bits': 2-D uint8}
+        self.partitions = {}
+
+    @property
+    def n_accounts(self):
+        return len(self.accounts)
+
+    @property
+    def n_bytes(self):
+        return (self.n_accounts + 7) // 8
+
+    @property
+    def universe(self):
+        """Packed bitmap with a bit set for every known account"""
+        return np.packbits(np.ones(self.n_accounts, dtype=bool))
+
+    def _path(self, date_key):
+        return self.directory / f"{PRESENCE_FILE_PREFIX}{date_key}.npz"
+
+    def load_accounts(self):
+        """Load the stored account dictionary only (enough to index new extracts)"""
+        if self.directory is not None and (self.directory / ACCOUNTS_FILE).exists():
+            self.accounts = np.load(self.directory / ACCOUNTS_FILE)
+            self._lookup = pd.Index(self.accounts)
+        return self
+
+    def load(self):
+        """Load the account dictionary and every stored partition"""
+        if self.directory is None or not (self.directory / ACCOUNTS_FILE).exists():
+            return self
+        self.load_accounts()
+        for path in sorted(self.directory.glob(f"{PRESENCE_FILE_PREFIX}*.npz")):
+            with np.load(path) as data:
+                self.partitions[path.stem[len(PRESENCE_FILE_PREFIX):]] = {
+                    'rows': int(data['rows']),
+                    'keys': list(zip(data['publications'].tolist(), data['statuses'].tolist())),
+                    'bits': data['bits'],
+                }
+        logging.info(f"Loaded presence index: {self.n_accounts:,} accounts, {len(self.partitions)} extracts")
+        return self
+
+    def save_accounts(self):
+        """Write the account dictionary to disk"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.directory / ACCOUNTS_FILE, self.accounts)
+
+    def save_partition(self, date_key):
+        """Write one partition to disk (save the dictionary first if it grew)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partition = self.partitions[date_key]
+        publications, statuses = zip(*partition['keys']) if partition['keys'] else ((), ())
+        np.savez_compressed(self._path(date_key), rows=partition['rows'], bits=partition['bits'],
+                            publications=np.array(publications, dtype=str),
+                            statuses=np.array(statuses, dtype=str))
+
+    def dense_ids(self, account_ids):
+        """Dense IDs of account IDs (-1 for accounts not in the index)"""
+        ids = pd.to_numeric(pd.Series(account_ids), errors='coerce')
+        known = ids.notna().to_numpy()
+        positions = np.full(len(ids), -1, dtype=np.intp)
+        positions[known] = self._lookup.get_indexer(ids[known].to_numpy(dtype=np.int64))
+        return positions
+
+    def _assign(self, account_ids):
+        """Dense IDs of account IDs, adding unseen accounts to the dictionary"""
+        positions = self._lookup.get_indexer(account_ids)
+        unseen = positions < 0
+        if unseen.any():
+            new = pd.unique(account_ids[unseen])
+            self.accounts = np.concatenate([self.accounts, new])
+            self._lookup = pd.Index(self.accounts)
+            positions[unseen] = self._lookup.get_indexer(account_ids[unseen])
+        return positions
+
+    def update(self, df, account='accoutid', publication='publication', status='status',
+               date_col='date_of_extract', save=True):
+        """
+        Index every extract in ``df``, replacing stored partitions of the same dates
+
+        Args:
+            df: Rows of whole extracts (e.g. one newly appended extract)
+            account, publication, status, date_col: Column names
+            save: Persist the built partitions (and the grown dictionary)
+
+        Returns:
+            List of partition keys that were built
+        """
+        ids = pd.to_numeric(df[account], errors='coerce')
+        valid = ids.notna().to_numpy()
+        has_account = df[account].notna().to_numpy()
+        skipped = int(has_account.sum() - valid.sum())
+        if skipped:
+            logging.warning(f"Presence index skips {skipped:,} rows without a numeric account ID")
+
+        # Factorize once over all rows; (publication, status) becomes one integer
+        all_codes, dates = pd.factorize(df[date_col].to_numpy(), sort=True)
+        counts = np.bincount(all_codes[has_account], minlength=len(dates))
+        accounts = ids.to_numpy()[valid].astype(np.int64)
+        date_codes = all_codes[valid]
+        labels = []
+        group = np.zeros(len(accounts), dtype=np.int64)
+        for col in (publication, status):
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col].to_numpy()[valid], sort=True)
+            else:
+                codes, uniques = np.full(len(accounts), -1), []
+            labels.append(np.array([MISSING] + [str(u) for u in uniques], dtype=object))
+            group = group * len(labels[-1]) + codes + 1
+        order = np.argsort(date_codes, kind='stable')
+        bounds = np.searchsorted(date_codes[order], np.arange(len(dates) + 1))
+
+        built = []
+        saved_accounts = self.n_accounts
+        for i, date in enumerate(dates):
+            rows = order[bounds[i]:bounds[i + 1]]
+            date_key = pd.Timestamp(date).strftime('%Y-%m-%d')
+            dense = self._assign(accounts[rows])
+            groups, codes = np.unique(group[rows], return_inverse=True)
+            pub_codes, status_codes = np.divmod(groups, len(labels[1]))
+            keys = list(zip(labels[0][pub_codes], labels[1][status_codes]))
+
+            # One packed row per (publication, status), filled group by group
+            by_group = np.argsort(codes, kind='stable')
+            group_bounds = np.searchsorted(codes[by_group], np.arange(len(keys) + 1))
+            bits = np.zeros((len(keys), self.n_bytes), dtype=np.uint8)
+            present = np.zeros(self.n_accounts, dtype=bool)
+            for row in range(len(keys)):
+                members = dense[by_group[group_bounds[row]:group_bounds[row + 1]]]
+                present[members] = True
+                bits[row] = np.packbits(present)
+                present[members] = False
+            self.partitions[date_key] = {
+                'rows': int(counts[i]),
+                'keys': keys,
+                'bits': bits,
+            }
+            if save and self.directory is not None:
+                # The dictionary goes first so a stored bitmap never refers
+                # to dense IDs missing from accounts.npy
+                if self.n_accounts != saved_accounts:
+                    self.save_accounts()
+                    saved_accounts = self.n_accounts
+                self.save_partition(date_key)
+            built.append(date_key)
+        if built:
+            logging.info(f"Indexed presence for {len(built)} extracts ({self.n_accounts:,} accounts)")
+        return built
+
+    def sync(self, counts, load_rows, save=True, **columns):
+        """
+        Bring the stored partitions in line with the data's extracts
+
+        A partition is rebuilt only when its extract is new or its row count
+        differs from ``counts``, so nothing is read while the index is
+        current; partitions of extracts no longer in the data are dropped.
+
+        Args:
+            counts: Rows with an account ID per extract date (e.g. the daily
+                    total_subscriptions)
+            load_rows: Callable taking a list of extract dates and returning
+                       their rows; called only when some extract is stale
+            save: Persist rebuilt partitions and delete dropped ones
+            **columns: Column names as in update()
+
+        Returns:
+            List of partition keys that were (re)built
+        """
+        wanted = {pd.Timestamp(date).strftime('%Y-%m-%d'): int(n) for date, n in counts.items()}
+        stale = [key for key, n in wanted.items()
+                 if key not in self.partitions or self.partitions[key]['rows'] != n]
+        rebuilt = self.update(load_rows(pd.to_datetime(stale)), save=save, **columns) if stale else []
+        dropped = sorted(set(self.partitions) - set(wanted))
+        for date_key in dropped:
+            del self.partitions[date_key]
+            if save and self.directory is not None:
+                self._path(date_key).unlink(missing_ok=True)
+        if dropped:
+            logging.info(f"Dropped presence of {len(dropped)} extracts no longer in the data")
+        return rebuilt
+
+    @property
+    def dates(self):
+        """Indexed extract dates"""
+        return pd.to_datetime(sorted(self.partitions))
+
+    def accounts_in(self, date, publication=None, status=None):
+        """
+        Accounts present in one extract
+
+        Args:
+            date: Extract date
+            publication: Publication or list of publications (None = any)
+            status: Status or list of statuses (None = any)
+
+        Returns:
+            AccountSet (empty when the date is not indexed)
+        """
+        partition = self.partitions.get(pd.Timestamp(date).strftime('%Y-%m-%d'))
+        bits = np.zeros(self.n_bytes, dtype=np.uint8)
+        if partition is None:
+            return AccountSet(self, bits)
+        wanted = [
+            None if value is None else {str(v) for v in ([value] if isinstance(value, str) else value)}
+            for value in (publication, status)
+        ]
+        for row, key in enumerate(partition['keys']):
+            if all(allowed is None or part in allowed for allowed, part in zip(wanted, key)):
+                stored = partition['bits'][row]
+                bits[:len(stored)] |= stored
+        return AccountSet(self, bits)
+
+    def daily_counts(self, publication=None, status=None):
+        """
+        Number of accounts present per extract date
+
+        Args:
+            publication, status: Filters as in accounts_in
+
+        Returns:
+            Series indexed by extract date
+        """
+        return pd.Series([len(self.accounts_in(date, publication, status)) for date in self.dates],
+                         index=self.dates, name='accounts')
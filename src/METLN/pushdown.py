@@ -0,0 +1,199 @@
+"""
+SQL push-down module for MTLN project
+Runs the analyzer's daily counts, status / publication / geography
+breakdowns and summary totals as GROUP BY queries against the subscriptions
+table loaded by utils/db, so only the aggregated results leave the database
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .geo_index import GeoIndex
+from .utils import dates
+
+DATE_COLUMN = 'date_of_extract'
+
+
+def _parse_dates(values):
+    """Extract dates as returned by the database (SQLite keeps them as text)"""
+    return dates.parse_dates(pd.Series(values), errors='raise').to_numpy()
+
+
+class SqlAggregates:
+    """
+    Aggregates of the subscriptions table, computed in the database
+
+    Offers the same attributes and methods as partitioned.PartitionedAggregates
+    (rows, active, dates, status, publication, publication_counts, geography,
+    daily_aggregations(), distinct_count(), extract_rows()), so TimeSeriesAnalyzer uses either
+    one the same way. Distinct counts over a date range are queried when asked.
+    """
+
+    def __init__(self, engine, table, columns):
+        """
+        Run the aggregation queries
+
+        Args:
+            engine: SQLAlchemy engine (kept for later distinct counts)
+            table: Table loaded by utils.db.load_csv_to_sql
+            columns: Source header -> analysis column name
+        """
+        self.engine = engine
+        self.table = table
+        self._sources = {name: source for source, name in columns.items()}
+        self._sources[DATE_COLUMN] = DATE_COLUMN
+        self._aggregate()
+
+    def _q(self, name):
+        """Quoted table column for an analysis column name"""
+        return self.engine.dialect.identifier_preparer.quote(self._sources.get(name, name))
+
+    def _read(self, sql, params=None):
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(sql), conn, params=params)
+
+    def _by_date_and(self, column):
+        """Date x label row counts (rows with a missing label left out, as in groupby)"""
+        counts = self._read(
+            f"SELECT {self._q(DATE_COLUMN)} AS d, {self._q(column)} AS label, COUNT(*) AS n "
+            f"FROM {self._table} WHERE {self._q(column)} IS NOT NULL GROUP BY 1, 2"
+        )
+        counts['d'] = _parse_dates(counts['d'])
+        frame = counts.pivot_table(index='d', columns='label', values='n', aggfunc='sum', fill_value=0)
+        return frame.rename_axis(index=DATE_COLUMN, columns=column).astype(np.int64)
+
+    @property
+    def _table(self):
+        return self.engine.dialect.identifier_preparer.quote(self.table)
+
+    def _aggregate(self):
+        date, status = self._q(DATE_COLUMN), self._q('status')
+        active = f"SUM(CASE WHEN {status} = 'A' THEN 1 ELSE 0 END)"
+
+        daily = self._read(
+            f"SELECT {date} AS d, COUNT({self._q('accoutid')}) AS total_subscriptions, "
+            f"{active} AS active_subscriptions, "
+            f"COUNT(DISTINCT {self._q('publication')}) AS unique_publications, "
+            f"COUNT(DISTINCT {self._q('city')}) AS unique_cities, "
+            f"COUNT(DISTINCT {self._q('state')}) AS unique_states, "
+            f"COUNT(DISTINCT {self._q('route_id')}) AS unique_routes "
+            f"FROM {self._table} WHERE {date} IS NOT NULL GROUP BY 1"
+        )
+        daily.index = pd.Index(_parse_dates(daily.pop('d')), name=DATE_COLUMN)
+        self.daily = daily.sort_index().astype(np.int64)
+
+        totals = self._read(
+            f"SELECT COUNT(*) AS n_rows, {active} AS active, "
+            f"COUNT(DISTINCT {self._q('accoutid')}) AS n_accounts FROM {self._table}"
+        ).iloc[0]
+        self.rows = int(totals['n_rows'])
+        self.active = np.int64(totals['active'] or 0)
+        self.n_accounts = int(totals['n_accounts'])
+
+        self.status = self._by_date_and('status')
+        self.publication = self._by_date_and('publication')
+
+        counts = self._read(
+            f"SELECT {self._q('publication')} AS publication, COUNT(*) AS n FROM {self._table} "
+            f"WHERE {self._q('publication')} IS NOT NULL GROUP BY 1 ORDER BY 2 DESC, 1"
+        )
+        self.publication_counts = pd.Series(counts['n'].to_numpy(), name='count',
+                                            index=pd.Index(counts['publication'], name='publication'))
+
+        # One row per (date, state, city, zip) leaf; the index is built from their counts
+        leaves = self._read(
+            f"SELECT {date} AS {DATE_COLUMN}, {self._q('state')} AS state, {self._q('city')} AS city, "
+            f"{self._q('zip')} AS zip, COUNT(*) AS n FROM {self._table} GROUP BY 1, 2, 3, 4"
+        )
+        leaves[DATE_COLUMN] = _parse_dates(leaves[DATE_COLUMN])
+        self.geography = GeoIndex.build(leaves, count='n')
+        logging.info(f"Aggregated {self.rows:,} rows of table '{self.table}' in the database "
+                     f"({len(leaves):,} geography leaves pulled)")
+
+    @property
+    def dates(self):
+        """Extract dates, sorted"""
+        return self.daily.index
+
+    def daily_aggregations(self, distinct_columns):
+        """
+        Daily counts with exact distinct counts
+
+        Args:
+            distinct_columns: Column -> output name for the distinct counts
+
+        Returns:
+            DataFrame indexed by extract date, as the in-memory groupby
+        """
+        return self.daily[['total_subscriptions', 'active_subscriptions'] + list(distinct_columns.values())].copy()
+
+    def extract_rows(self, extract_dates):
+        """
+        Rows of some extract dates with analysis column names (e.g. to build
+        the sketches of new extracts)
+
+        Args:
+            extract_dates: Extract dates to read
+
+        Returns:
+            DataFrame of the matching rows
+        """
+        from sqlalchemy import DateTime, bindparam, text
+
+        wanted = pd.DatetimeIndex(extract_dates)
+        if wanted.empty:
+            return pd.DataFrame(columns=list(self._sources))
+        date = self._q(DATE_COLUMN)
+        quote = self.engine.dialect.identifier_preparer.quote
+        selected = ', '.join(f"{self._q(name)} AS {quote(name)}" for name in self._sources)
+        # Compared as a range, as in distinct_count(); the exact dates are matched once parsed
+        query = text(f"SELECT {selected} FROM {self._table} WHERE {date} >= :start AND {date} <= :end")
+        query = query.bindparams(bindparam('start', type_=DateTime()), bindparam('end', type_=DateTime()))
+        with self.engine.connect() as conn:
+            rows = pd.read_sql(query, conn, params={'start': wanted.min().to_pydatetime(),
+                                                    'end': wanted.max().to_pydatetime()})
+        rows[DATE_COLUMN] = _parse_dates(rows[DATE_COLUMN])
+        rows = rows[rows[DATE_COLUMN].isin(wanted)].reset_index(drop=True)
+        logging.info(f"Read {len(rows):,} rows of {len(wanted)} extracts from table '{self.table}'")
+        return rows
+
+    def distinct_count(self, column, start=None, end=None):
+        """Number of distinct values of a column over a range of extract dates (COUNT(DISTINCT) query)"""
+        from sqlalchemy import DateTime, bindparam, text
+
+        conditions, params = [], {}
+        for name, value, op in (('start', start, '>='), ('end', end, '<=')):
+            if value is not None:
+                conditions.append(f"{self._q(DATE_COLUMN)} {op} :{name}")
+                params[name] = pd.Timestamp(value).to_pydatetime()
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = text(f"SELECT COUNT(DISTINCT {self._q(column)}) FROM {self._table}{where}")
+        query = query.bindparams(*(bindparam(name, type_=DateTime()) for name in params))
+        with self.engine.connect() as conn:
+            return int(conn.execute(query, params).scalar())
+
+
+def aggregate(columns, db_uri=None, table="subscriptions"):
+    """
+    Aggregate the subscriptions table in the database
+
+    Args:
+        columns: Source header -> analysis column name
+        db_uri: Database URI (None = the default SQLite database)
+        table: Table loaded by utils.db.load_csv_to_sql
+
+    Returns:
+        SqlAggregates
+    """
+    from sqlalchemy import create_engine, inspect
+
+    from .utils.db import default_db_uri
+
+    engine = create_engine(db_uri or default_db_uri())
+    if not inspect(engine).has_table(table):
+        engine.dispose()
+        raise FileNotFoundError(f"Table '{table}' not found in {engine.url}; load it with utils.db.load_csv_to_sql")
+    return SqlAggregates(engine, table, columns)
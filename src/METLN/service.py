@@ -0,0 +1,263 @@
+"""
+Analytics service module for MTLN project
+Read-only local HTTP API that serves the analyzer's rollups (daily totals,
+status mix, publication trends, geography) from precomputed JSON, with
+ETag / If-None-Match revalidation tied to the version of the cleaned data
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from .timeseries import TimeSeriesAnalyzer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+
+# How often (seconds) a request may stat the data file to look for a new version
+VERSION_CHECK_INTERVAL = 1.0
+
+ENDPOINTS = {
+    "/api/daily": "daily",
+    "/api/status": "status",
+    "/api/publications": "publications",
+    "/api/geography": "geography",
+    "/api/version": "version",
+}
+
+
+def _frame_payload(df):
+    """Column-oriented JSON-ready dict of a frame indexed by extract date"""
+    frame = df.astype(object).where(df.notna(), None)
+    return {
+        "dates": [d.strftime("%Y-%m-%d") for d in frame.index],
+        "series": {str(col): frame[col].tolist() for col in frame.columns},
+    }
+
+
+def build_rollups(analyzer):
+    """
+    Compute every endpoint's payload from a loaded analyzer
+
+    Args:
+        analyzer: TimeSeriesAnalyzer with data loaded
+
+    Returns:
+        Dictionary of endpoint name -> JSON-ready payload
+    """
+    daily = analyzer.create_daily_aggregations()
+    status_counts, status_pct = analyzer.analyze_by_status()
+    state_ts, city_ts = analyzer.analyze_by_geography()
+    return {
+        "daily": _frame_payload(daily),
+        "status": {"counts": _frame_payload(status_counts), "percent": _frame_payload(status_pct.round(3))},
+        "publications": _frame_payload(analyzer.analyze_by_publication()),
+        "geography": {"states": _frame_payload(state_ts), "top_cities": _frame_payload(city_ts)},
+    }
+
+
+class RollupStore:
+    """
+    Precomputed, serialized responses for one version of the cleaned data
+
+    The version is the data file's size and modification time, so any
+    rewrite or append (ingest, watch mode) produces a new version. Requests
+    look for a new version at most every VERSION_CHECK_INTERVAL seconds;
+    the rollups are rebuilt once per version while requests keep being
+    answered from the previous one.
+    """
+
+    def __init__(self, data_path=None, check_interval=VERSION_CHECK_INTERVAL):
+        """
+        Initialize the store
+
+        Args:
+            data_path: Cleaned data CSV (default: the analyzer's default)
+            check_interval: Minimum seconds between data file checks
+        """
+        self.analyzer = TimeSeriesAnalyzer(Path(data_path) if data_path else None)
+        self.data_path = Path(self.analyzer.data_path)
+        self.check_interval = check_interval
+        self.version = None
+        self._responses = {}  # endpoint name -> (etag, body bytes)
+        self._checked_at = 0.0
+        self._build_lock = threading.Lock()
+
+    def data_version(self):
+        """Version string of the data file (size and mtime)"""
+        st = os.stat(self.data_path)
+        return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+    def refresh(self, force=False):
+        """
+        Rebuild the responses if the data file changed
+
+        Args:
+            force: Check the file even if it was checked recently
+
+        Returns:
+            True when a new version was built
+        """
+        now = time.monotonic()
+        if not force and self.version is not None and now - self._checked_at < self.check_interval:
+            return False
+        # One request rebuilds; concurrent ones keep serving the current version
+        if not self._build_lock.acquire(blocking=self.version is None):
+            return False
+        try:
+            self._checked_at = now
+            version = self.data_version()
+            if version == self.version:
+                return False
+
+            start = time.perf_counter()
+            self.analyzer.load_data()
+            rollups = build_rollups(self.analyzer)
+            rollups["version"] = {
+                "version": version,
+                "rows": len(self.analyzer.df),
+                "first_extract": rollups["daily"]["dates"][0] if rollups["daily"]["dates"] else None,
+                "last_extract": rollups["daily"]["dates"][-1] if rollups["daily"]["dates"] else None,
+                "built_at": datetime.now().isoformat(timespec="seconds"),
+                "endpoints": sorted(ENDPOINTS),
+            }
+
+            responses = {}
+            for name, payload in rollups.items():
+                body = json.dumps(payload, separators=(",", ":")).encode()
+                tag = hashlib.sha1(f"{version}:{name}".encode()).hexdigest()[:20]
+                responses[name] = (f'"{tag}"', body)
+            # Swap in the new version in one step
+            self._responses, self.version = responses, version
+            logging.info(f"Rollups built for data version {version} in {time.perf_counter() - start:.2f}s")
+            return True
+        finally:
+            self._build_lock.release()
+
+    def get(self, name):
+        """(etag, body) of an endpoint for the current data version"""
+        try:
+            self.refresh()
+        except Exception as e:
+            if self.version is None:
+                raise
+            logging.error(f"Could not refresh rollups, serving version {self.version}: {e}")
+        return self._responses[name]
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches an ETag (weak comparison)"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class RollupRequestHandler(BaseHTTPRequestHandler):
+    """GET/HEAD handler for the rollup endpoints"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so dashboards reuse connections
+    server_version = "METLN"
+    # Headers and body are separate writes; without TCP_NODELAY the body waits
+    # for the client's delayed ACK (~40 ms) on keep-alive connections
+    disable_nagle_algorithm = True
+    store = None  # RollupStore, set by make_server()
+
+    def do_GET(self):
+        self._respond(include_body=True)
+
+    def do_HEAD(self):
+        self._respond(include_body=False)
+
+    def _respond(self, include_body):
+        name = ENDPOINTS.get(urlsplit(self.path).path.rstrip("/"))
+        if name is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown endpoint", include_body)
+            return
+        try:
+            etag, body = self.store.get(name)
+        except Exception as e:
+            logging.error(f"Rollups unavailable: {e}")
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, "Data not available", include_body)
+            return
+
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._send_cache_headers(etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self._send_cache_headers(etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def _send_cache_headers(self, etag):
+        self.send_header("ETag", etag)
+        # Clients may keep the response but must revalidate it on every use
+        self.send_header("Cache-Control", "no-cache")
+
+    def _send_error(self, status, message, include_body):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, data_path=None, store=None):
+    """
+    Create the HTTP server with its rollups built
+
+    Args:
+        host: Interface to bind (default: localhost only)
+        port: TCP port (0 = any free port)
+        data_path: Cleaned data CSV (default: data/processed/cleaned_data.csv)
+        store: Existing RollupStore to serve from
+
+    Returns:
+        ThreadingHTTPServer (call serve_forever())
+    """
+    store = store or RollupStore(data_path)
+    if not store.data_path.exists():
+        raise FileNotFoundError(f"Data file not found: {store.data_path}")
+    store.refresh(force=True)
+    handler = type("BoundRollupRequestHandler", (RollupRequestHandler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, data_path=None):
+    """Serve the rollups until interrupted"""
+    server = make_server(host, port, data_path)
+    logging.info(f"Serving rollups on http://{host}:{server.server_address[1]} ({', '.join(sorted(ENDPOINTS))})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Service stopped")
+    finally:
+        server.server_close()
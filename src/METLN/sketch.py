@@ -0,0 +1,266 @@
+"""
+Mergeable approximate distinct counts (HyperLogLog) for MTLN data
+Sketches are built once per extract partition, stored next to the data and
+merged to answer distinct counts for any date range without rescanning rows
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PRECISION = 14  # 16,384 registers, ~0.8% standard error
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+SKETCH_FILE_PREFIX = "sketch_"
+
+
+def _bit_length(values):
+    """Exact bit length of uint64 values (0 for 0), vectorized"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # frexp returns e with x = m * 2**e, 0.5 <= m < 1, i.e. e == bit length;
+    # 32-bit halves are exact in float64
+    high_bits = np.frexp(high)[1]
+    low_bits = np.frexp(low)[1]
+    return np.where(high > 0, high_bits + 32, low_bits)
+
+
+def hash_values(values):
+    """
+    Deterministic 64-bit hashes of non-null values
+
+    Floats that hold whole numbers are hashed as integers, so an account ID
+    read as 12345.0 in one partition and 12345 in another hash identically.
+    """
+    values = pd.Series(values).dropna()
+    if values.empty:
+        return np.empty(0, dtype=np.uint64)
+    if pd.api.types.is_float_dtype(values) and (values % 1 == 0).all():
+        values = values.astype('int64')
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch
+
+    Two sketches with the same precision merge by taking the register-wise
+    maximum, so partition sketches can be combined in any order.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        """
+        Initialize an empty sketch
+
+        Args:
+            precision: Number of index bits p (m = 2**p registers, error ~1.04/sqrt(m))
+            registers: Existing register array (used when loading)
+        """
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        elif len(registers) != self.m:
+            raise ValueError(f"Expected {self.m} registers, got {len(registers)}")
+        self.registers = np.asarray(registers, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Add precomputed 64-bit hashes"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return self
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Position of the leftmost 1-bit in the remaining 64-p bits
+        rank = (64 - self.precision) - _bit_length(remainder) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def add_values(self, values):
+        """Hash and add a column of values (nulls are ignored)"""
+        return self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        """Return a new sketch counting the union of both inputs"""
+        return HyperLogLog(self.precision, self.registers.copy()).update(other)
+
+    def update(self, other):
+        """Merge another sketch into this one in place"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """Estimated number of distinct values"""
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+
+class SketchStore:
+    """
+    Per-partition sketches persisted as one .npz file per extract date
+
+    Each partition also keeps its extract's row count (rows with a value in
+    the count column), the signature sync() checks against the data's own
+    per-extract counts to tell which partitions are stale without reading
+    or hashing any rows.
+    """
+
+    def __init__(self, directory, precision=DEFAULT_PRECISION):
+        """
+        Initialize the store
+
+        Args:
+            directory: Folder holding sketch_<date>.npz files
+            precision: Precision used for newly built sketches
+        """
+        self.directory = Path(directory)
+        self.precision = precision
+        # date string -> {'rows': int, 'sketches': {column: HyperLogLog}}
+        self.partitions = {}
+
+    def _path(self, date_key):
+        return self.directory / f"{SKETCH_FILE_PREFIX}{date_key}.npz"
+
+    def load(self):
+        """Load every stored partition with the store's precision"""
+        if not self.directory.exists():
+            return self
+        for path in sorted(self.directory.glob(f"{SKETCH_FILE_PREFIX}*.npz")):
+            with np.load(path) as data:
+                if int(data['precision']) != self.precision:
+                    continue
+                sketches = {
+                    key[len('col_'):]: HyperLogLog(self.precision, data[key])
+                    for key in data.files if key.startswith('col_')
+                }
+                self.partitions[path.stem[len(SKETCH_FILE_PREFIX):]] = {
+                    'rows': int(data['rows']),
+                    'sketches': sketches,
+                }
+        logging.info(f"Loaded {len(self.partitions)} sketch partitions from {self.directory}")
+        return self
+
+    def save_partition(self, date_key):
+        """Write one partition's sketches to disk"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partition = self.partitions[date_key]
+        arrays = {f"col_{col}": hll.registers for col, hll in partition['sketches'].items()}
+        np.savez(self._path(date_key), precision=self.precision, rows=partition['rows'], **arrays)
+
+    def update(self, df, columns, date_col='date_of_extract', count_col='accoutid', save=True):
+        """
+        Build the partitions of every extract in ``df``, replacing stored ones
+
+        Args:
+            df: Rows of whole extracts (e.g. one newly appended extract)
+            columns: Columns to sketch
+            date_col: Partition (extract date) column
+            count_col: Column whose non-null count is kept as the row count
+            save: Persist the built partitions
+
+        Returns:
+            List of partition keys that were built
+        """
+        built = []
+        for date, part in df.groupby(date_col, sort=True):
+            date_key = pd.Timestamp(date).strftime('%Y-%m-%d')
+            self.partitions[date_key] = {
+                'rows': int(part[count_col].count()),
+                'sketches': {
+                    col: HyperLogLog(self.precision).add_values(part[col]) for col in columns if col in part.columns
+                },
+            }
+            if save:
+                self.save_partition(date_key)
+            built.append(date_key)
+        if built:
+            logging.info(f"Built sketches for {len(built)} partitions ({', '.join(columns)})")
+        return built
+
+    def sync(self, counts, load_rows, columns, date_col='date_of_extract', count_col='accoutid', save=True):
+        """
+        Bring the stored partitions in line with the data's extracts
+
+        A partition is rebuilt only when its extract is new or its row count
+        differs from ``counts``, so nothing is read while the store is
+        current; partitions of extracts no longer in the data are dropped.
+
+        Args:
+            counts: Rows with a value in ``count_col`` per extract date (e.g.
+                    the daily total_subscriptions)
+            load_rows: Callable taking a list of extract dates and returning
+                       their rows; called only when some extract is stale
+            columns, date_col, count_col, save: As in update()
+
+        Returns:
+            List of partition keys that were (re)built
+        """
+        wanted = {pd.Timestamp(date).strftime('%Y-%m-%d'): int(n) for date, n in counts.items()}
+        stale = [key for key, n in wanted.items()
+                 if key not in self.partitions or self.partitions[key]['rows'] != n
+                 or any(col not in self.partitions[key]['sketches'] for col in columns)]
+        rebuilt = self.update(load_rows(pd.to_datetime(stale)), columns, date_col, count_col, save) if stale else []
+        dropped = sorted(set(self.partitions) - set(wanted))
+        for date_key in dropped:
+            del self.partitions[date_key]
+            if save:
+                self._path(date_key).unlink(missing_ok=True)
+        if dropped:
+            logging.info(f"Dropped sketches of {len(dropped)} extracts no longer in the data")
+        return rebuilt
+
+    def _keys_in_range(self, start=None, end=None):
+        start = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        end = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+        return [
+            key for key in sorted(self.partitions)
+            if (start is None or key >= start) and (end is None or key <= end)
+        ]
+
+    def distinct_count(self, column, start=None, end=None):
+        """
+        Approximate distinct count of a column over a date range (inclusive)
+
+        Args:
+            column: Sketched column name
+            start: First extract date (None = from the beginning)
+            end: Last extract date (None = to the end)
+
+        Returns:
+            Estimated number of distinct values
+        """
+        merged = HyperLogLog(self.precision)
+        for key in self._keys_in_range(start, end):
+            sketch = self.partitions[key]['sketches'].get(column)
+            if sketch is not None:
+                merged.update(sketch)
+        return merged.count()
+
+    def daily_counts(self, column):
+        """Approximate distinct count per partition as a Series indexed by date"""
+        keys = sorted(self.partitions)
+        counts = [
+            self.partitions[key]['sketches'][column].count()
+            if column in self.partitions[key]['sketches'] else np.nan
+            for key in keys
+        ]
+        return pd.Series(counts, index=pd.to_datetime(keys), name=column)
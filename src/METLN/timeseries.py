@@ -4,16 +4,18 @@ Performs comprehensive time series analysis on subscription data
 """
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import logging
+import warnings
 from pathlib import Path
 from datetime import datetime, timedelta
-import warnings
-warnings.filterwarnings('ignore')
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s] : %(message)s:')
+from .utils.memo import MemoCache, memoized, cache_key, log_cache_stats
+from .utils.instrument import traced
+from . import anomaly, forecast, partitioned, planner, pushdown
+from .sketch import SketchStore, DEFAULT_PRECISION
+from .geo_index import GeoIndex
+from .presence import PresenceIndex
+from .utils.logs import configure_logging
+from .utils import columnar, dates
 
 # Project paths
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -22,57 +24,289 @@ PROCESSED_DATA_DIR = DATA_DIR / "processed"
 CLEAN_FILE = PROCESSED_DATA_DIR / "cleaned_data.csv"
 OUTPUT_DIR = PROJECT_ROOT / "outputs" / "timeseries"
 
+# cleaned_data.csv keeps the source headers; the analysis uses snake_case names
+ANALYSIS_COLUMNS = {
+    'Publication': 'publication',
+    'AccoutID': 'accoutid',
+    'Status': 'status',
+    'City': 'city',
+    'State': 'state',
+    'Zip': 'zip',
+    'Route ID': 'route_id',
+}
+
+# Daily distinct-count columns and the source column each one counts
+DISTINCT_COLUMNS = {
+    'publication': 'unique_publications',
+    'city': 'unique_cities',
+    'state': 'unique_states',
+    'route_id': 'unique_routes',
+}
+SKETCH_COLUMNS = ['accoutid'] + list(DISTINCT_COLUMNS)
+DISTINCT_MODES = ('exact', 'sketch')
+EXECUTION_MODES = ('memory', 'partitioned', 'sql')
+
 
 class TimeSeriesAnalyzer:
     """
     Comprehensive Time Series Analysis for subscription data
     """
     
-    def __init__(self, data_path=None):
+    def __init__(self, data_path=None, distinct_mode='exact', sketch_precision=DEFAULT_PRECISION,
+                 sketch_dir=None, presence_dir=None, execution='memory', workers=None,
+                 db_uri=None, table='subscriptions'):
         """
         Initialize the TimeSeriesAnalyzer
         
         Args:
             data_path: Path to the clean data CSV file
+            distinct_mode: 'exact' (nunique) or 'sketch' (HyperLogLog estimates
+                           from per-extract sketches stored with the data)
+            sketch_precision: HyperLogLog precision for sketch mode (4-18)
+            sketch_dir: Where partition sketches are kept (default: 'sketches'
+                        next to the data file)
+            presence_dir: Where the account presence index is kept (default:
+                          'presence' next to the data file)
+            execution: 'memory' (load every row into one DataFrame) or
+                       'partitioned' (aggregate slices of rows in a process
+                       pool and merge the partials; daily, status,
+                       publication, geography and summary results only,
+                       with exact distinct counts) or 'sql' (the same
+                       results as GROUP BY queries against the database
+                       table loaded by utils/db; only aggregates are read)
+            workers: Maximum worker processes in partitioned mode (None = sized
+                     from the memory budget, see planner.py)
+            db_uri: Database queried in sql mode (None = the default SQLite database)
+            table: Table queried in sql mode
         """
+        if execution not in EXECUTION_MODES:
+            raise ValueError(f"execution must be one of {EXECUTION_MODES}, got '{execution}'")
         self.data_path = data_path or CLEAN_FILE
-        self.df = None
-        self.ts_data = None
-        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        self._memo = MemoCache()
+        self._df = None
+        self._ts_data = None
+        self._distinct_mode = None
+        self.distinct_mode = distinct_mode
+        self.sketch_precision = sketch_precision
+        self.sketch_dir = Path(sketch_dir) if sketch_dir else Path(self.data_path).parent / "sketches"
+        self.presence_dir = Path(presence_dir) if presence_dir else Path(self.data_path).parent / "presence"
+        self.execution = execution
+        self.workers = workers
+        self.db_uri = db_uri
+        self.table = table
+        self._aggregates = None  # PartitionedAggregates / SqlAggregates outside memory mode
         logging.info(f"TimeSeriesAnalyzer initialized. Output directory: {OUTPUT_DIR}")
     
+    @property
+    def df(self):
+        """Loaded subscription data; assigning a new frame invalidates cached results"""
+        return self._df
+    
+    @df.setter
+    def df(self, value):
+        if value is not self._df:
+            self._df = value
+            self._memo.bump('df')
+    
+    @property
+    def ts_data(self):
+        """Daily time series; assigning a new frame invalidates results derived from it"""
+        return self._ts_data
+    
+    @ts_data.setter
+    def ts_data(self, value):
+        if value is not self._ts_data:
+            self._ts_data = value
+            self._memo.bump('ts_data')
+    
+    @property
+    def distinct_mode(self):
+        """How distinct counts are computed: 'exact' or 'sketch'"""
+        return self._distinct_mode
+    
+    @distinct_mode.setter
+    def distinct_mode(self, value):
+        if value not in DISTINCT_MODES:
+            raise ValueError(f"distinct_mode must be one of {DISTINCT_MODES}, got '{value}'")
+        if value != self._distinct_mode:
+            self._distinct_mode = value
+            self._memo.bump('distinct_mode')
+            # The daily series holds the distinct counts of the previous mode
+            self.ts_data = None
+    
+    @staticmethod
+    def _output_path(name):
+        """Path of an output file, creating the output directory on first write"""
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        return OUTPUT_DIR / name
+    
+    def cache_stats(self):
+        """
+        Report memoization hit/miss counts for this analyzer
+        
+        Returns:
+            Dictionary with hits, misses, entries and hit_rate
+        """
+        return self._memo.stats()
+    
+    def _require_rows(self, analysis):
+        """Fail clearly when an analysis needs the rows but only merged aggregates are kept"""
+        if self.execution != 'memory':
+            raise RuntimeError(f"{analysis} needs the rows in memory; use execution='memory' "
+                               f"(not '{self.execution}')")
+    
+    @traced()
     def load_data(self):
         """Load and prepare data for time series analysis"""
+        if self.execution == 'sql':
+            # Aggregated by the database; the cleaned CSV is not read
+            logging.info(f"Aggregating table '{self.table}' in the database")
+            self._aggregates = pushdown.aggregate(ANALYSIS_COLUMNS, db_uri=self.db_uri, table=self.table)
+            self._memo.bump('df')
+            self.ts_data = None
+            return self._aggregates
+        
         logging.info(f"Loading data from {self.data_path}")
         
         if not self.data_path.exists():
             raise FileNotFoundError(f"Data file not found: {self.data_path}")
         
-        # Load data with optimized memory usage
-        self.df = pd.read_csv(self.data_path, low_memory=False)
-        logging.info(f"Loaded {len(self.df):,} rows and {len(self.df.columns)} columns")
+        if self.execution != 'memory':
+            # Only the merged aggregates are kept; new ones invalidate every cached result
+            self._aggregates = partitioned.aggregate(self.data_path, ANALYSIS_COLUMNS, workers=self.workers)
+            self._memo.bump('df')
+            self.ts_data = None
+            return self._aggregates
         
-        # Convert date columns to datetime
-        self.df['date_of_extract'] = pd.to_datetime(self.df['date_of_extract'])
+        # Memory-mapped columnar cache when fresh, CSV otherwise (the cache is rebuilt then)
+        df = self._prepare(columnar.load_frame(self.data_path), source=self.data_path)
+        logging.info(f"Loaded {len(df):,} rows and {len(df.columns)} columns")
         
-        # Convert LastStartDate and OriginalStartDate
-        for col in ['LastStartDate', 'OriginalStartDate']:
-            if col in self.df.columns:
-                self.df[col] = pd.to_datetime(self.df[col], errors='coerce')
+        # New data invalidates every cached result, including the daily series
+        self.df = df
+        self.ts_data = None
         
         logging.info(f"Date range: {self.df['date_of_extract'].min()} to {self.df['date_of_extract'].max()}")
         logging.info(f"Unique extraction dates: {self.df['date_of_extract'].nunique()}")
         
         return self.df
     
+    def _prepare(self, df, source=None):
+        """Rename to analysis column names and parse date columns"""
+        df = df.rename(columns=ANALYSIS_COLUMNS)
+        
+        # Convert date columns to datetime (each distinct value is parsed once)
+        df['date_of_extract'] = dates.parse_dates(df['date_of_extract'], source=source,
+                                                  column='date_of_extract', errors='raise')
+        
+        # Convert LastStartDate and OriginalStartDate
+        dates.parse_date_columns(df, ['LastStartDate', 'OriginalStartDate'], source=source)
+        
+        return df
+    
+    @traced()
+    def append_data(self, rows):
+        """
+        Add newly cleaned rows (e.g. one new extract) to the loaded data
+        
+        When the rows only contain extract dates not seen before, their daily
+        aggregations are computed from the new rows alone and merged into the
+        cached daily series instead of regrouping the full history. Sketches
+        and presence bitmaps kept on disk get partitions for the new
+        extracts, built from the new rows only.
+        
+        Args:
+            rows: Cleaned rows with the cleaned_data.csv headers
+        
+        Returns:
+            The combined DataFrame
+        """
+        self._require_rows("append_data")
+        new = self._prepare(rows)
+        if self.df is None:
+            self.df = new
+            self.ts_data = None
+            return self.df
+        
+        daily = None
+        if self.distinct_mode == 'exact':
+            previous = self._daily_aggregations()
+            if not previous.index.isin(new['date_of_extract'].unique()).any():
+                added = self._with_rates(self._exact_daily_aggregations(new))
+                daily = pd.concat([previous, added]).sort_index()
+        
+        # Extracts already loaded are left to the stores' own freshness check
+        added_rows = new[~new['date_of_extract'].isin(self.df['date_of_extract'].unique())]
+        self.df = pd.concat([self.df, new], ignore_index=True)
+        self.ts_data = None
+        if daily is not None:
+            self._memo.put(cache_key('_daily_aggregations'), ('df', 'distinct_mode'), daily)
+        if not added_rows.empty and (self.distinct_mode == 'sketch' or self.sketch_dir.exists()):
+            SketchStore(self.sketch_dir, precision=self.sketch_precision).update(
+                added_rows, self._sketch_columns())
+        if not added_rows.empty and self.presence_dir.exists():
+            PresenceIndex(self.presence_dir).load_accounts().update(added_rows)
+        
+        logging.info(f"Appended {len(new):,} rows ({len(self.df):,} total)")
+        return self.df
+    
+    @traced()
     def create_daily_aggregations(self):
         """
         Create daily time series aggregations
         """
+        self.ts_data = self._daily_aggregations()
+        
+        return self.ts_data
+    
+    @memoized('df', 'distinct_mode')
+    def _daily_aggregations(self):
+        """Daily aggregation computed once per loaded frame"""
         logging.info("Creating daily aggregations...")
         
+        if self.execution != 'memory':
+            daily_stats = self._aggregates.daily_aggregations(DISTINCT_COLUMNS)
+        elif self.distinct_mode == 'sketch':
+            # Distinct counts come from per-extract sketches instead of nunique
+            daily_stats = self.df.groupby('date_of_extract').agg({
+                'accoutid': 'count',
+                'status': lambda x: (x == 'A').sum(),
+            }).rename(columns={
+                'accoutid': 'total_subscriptions',
+                'status': 'active_subscriptions',
+            })
+            store = self._sketch_store()
+            for col, name in DISTINCT_COLUMNS.items():
+                daily_stats[name] = store.daily_counts(col).reindex(daily_stats.index).to_numpy()
+        else:
+            daily_stats = self._exact_daily_aggregations()
+        
+        daily_stats = self._with_rates(daily_stats)
+        
+        logging.info(f"Created daily aggregations for {len(daily_stats)} days")
+        
+        return daily_stats
+    
+    @staticmethod
+    def _with_rates(daily_stats):
+        """Add inactive subscriptions and activation rate to daily counts"""
+        # Calculate inactive subscriptions
+        daily_stats['inactive_subscriptions'] = (
+            daily_stats['total_subscriptions'] - daily_stats['active_subscriptions']
+        )
+        
+        # Calculate activation rate
+        daily_stats['activation_rate'] = (
+            daily_stats['active_subscriptions'] / daily_stats['total_subscriptions'] * 100
+        )
+        
+        return daily_stats
+    
+    def _exact_daily_aggregations(self, df=None):
+        """Daily counts with exact distinct counts (of ``df``, default the loaded data)"""
+        df = self.df if df is None else df
         # Group by date and calculate various metrics
-        daily_stats = self.df.groupby('date_of_extract').agg({
+        daily_stats = df.groupby('date_of_extract').agg({
             'accoutid': 'count',  # Total subscriptions
             'status': lambda x: (x == 'A').sum(),  # Active subscriptions
             'publication': 'nunique',  # Number of publications
@@ -88,32 +322,110 @@ class TimeSeriesAnalyzer:
             'route_id': 'unique_routes'
         })
         
-        # Calculate inactive subscriptions
-        daily_stats['inactive_subscriptions'] = (
-            daily_stats['total_subscriptions'] - daily_stats['active_subscriptions']
-        )
+        return daily_stats
+    
+    @memoized('df')
+    def _extract_rows(self):
+        """
+        Rows with an account ID per extract date
         
-        # Calculate activation rate
-        daily_stats['activation_rate'] = (
-            daily_stats['active_subscriptions'] / daily_stats['total_subscriptions'] * 100
-        )
+        The signature stored sketches and presence bitmaps are checked
+        against: taken from the daily counts, so it costs no extra pass.
+        """
+        if self.execution != 'memory':
+            return self._aggregates.daily['total_subscriptions']
+        return self.df.groupby('date_of_extract')['accoutid'].count()
+    
+    def _extract_frames(self, extract_dates):
+        """Rows of some extract dates: from the loaded data, or read back from the source"""
+        if self.execution != 'memory':
+            return self._aggregates.extract_rows(extract_dates)
+        return self.df[self.df['date_of_extract'].isin(extract_dates)]
+    
+    def _sketch_columns(self):
+        """Columns sketched per extract (those of SKETCH_COLUMNS the data has)"""
+        if self.execution != 'memory':
+            return list(SKETCH_COLUMNS)
+        return [col for col in SKETCH_COLUMNS if col in self.df.columns]
+    
+    @memoized('df', 'distinct_mode')
+    def _sketch_store(self):
+        """
+        Partition sketches for the loaded data
         
-        self.ts_data = daily_stats
-        logging.info(f"Created daily aggregations for {len(daily_stats)} days")
+        Stored partitions whose row count matches the data's are used as
+        they are; rows are read only for new or changed extracts.
+        """
+        store = SketchStore(self.sketch_dir, precision=self.sketch_precision).load()
+        store.sync(self._extract_rows(), self._extract_frames, self._sketch_columns())
+        return store
+    
+    @traced()
+    @memoized('df')
+    def presence_index(self):
+        """
+        Account presence bitmaps per (extract date, publication, status)
         
-        return daily_stats
+        The stored index is loaded and used as it is while its per-extract
+        row counts match the data's; only new or changed extracts are read
+        (from the loaded data, or back from the source outside memory mode)
+        and indexed.
+        
+        Returns:
+            PresenceIndex; combine accounts_in() results with & | - ~
+        """
+        index = PresenceIndex(self.presence_dir).load()
+        index.sync(self._extract_rows(), self._extract_frames)
+        return index
     
+    @memoized('df', 'distinct_mode')
+    def distinct_count(self, column, start=None, end=None):
+        """
+        Number of distinct values of a column over a range of extract dates
+        
+        Args:
+            column: Column to count (e.g. 'accoutid', 'city', 'route_id')
+            start: First extract date, inclusive (None = earliest)
+            end: Last extract date, inclusive (None = latest)
+        
+        Returns:
+            Exact count, or a HyperLogLog estimate in sketch mode (in every
+            execution mode)
+        
+        Raises:
+            ValueError: in partitioned execution with exact counts, for
+                        account IDs over a date range (only the all-time
+                        count is kept)
+        """
+        if self.distinct_mode == 'sketch':
+            return self._sketch_store().distinct_count(column, start, end)
+        if self.execution != 'memory':
+            return self._aggregates.distinct_count(column, start, end)
+        
+        dates = self.df['date_of_extract']
+        mask = pd.Series(True, index=self.df.index)
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates <= pd.Timestamp(end)
+        return int(self.df.loc[mask, column].nunique())
+    
+    @traced()
     def calculate_growth_metrics(self):
         """
         Calculate growth metrics over time
         """
-        if self.ts_data is None:
-            self.create_daily_aggregations()
+        self.ts_data = self._growth_metrics()
         
+        return self.ts_data
+    
+    @memoized('df', 'distinct_mode')
+    def _growth_metrics(self):
+        """Growth metrics computed once per loaded frame"""
         logging.info("Calculating growth metrics...")
         
-        # Sort by date
-        ts_sorted = self.ts_data.sort_index()
+        # Sort by date (sort_index copies, so the cached daily frame stays untouched)
+        ts_sorted = self._daily_aggregations().sort_index()
         
         # Calculate day-over-day change
         ts_sorted['dod_change'] = ts_sorted['total_subscriptions'].diff()
@@ -131,10 +443,10 @@ class TimeSeriesAnalyzer:
                     ts_sorted['total_subscriptions'].rolling(window=window).mean()
                 )
         
-        self.ts_data = ts_sorted
-        
         return ts_sorted
     
+    @traced()
+    @memoized('ts_data')
     def analyze_trends(self):
         """
         Analyze trends in the time series data
@@ -174,51 +486,86 @@ class TimeSeriesAnalyzer:
         
         return results
     
+    @traced()
+    @memoized('df')
     def analyze_by_status(self):
         """
         Analyze time series by subscription status
         """
         logging.info("Analyzing by subscription status...")
         
-        status_ts = self.df.groupby(['date_of_extract', 'status']).size().unstack(fill_value=0)
+        if self.execution != 'memory':
+            status_ts = self._aggregates.status
+        else:
+            status_ts = self.df.groupby(['date_of_extract', 'status']).size().unstack(fill_value=0)
         
         # Calculate percentages
         status_pct = status_ts.div(status_ts.sum(axis=1), axis=0) * 100
         
         return status_ts, status_pct
     
+    @traced()
+    @memoized('df')
     def analyze_by_publication(self):
         """
         Analyze time series by publication
         """
         logging.info("Analyzing by publication...")
         
+        if self.execution != 'memory':
+            return self._aggregates.publication
         pub_ts = self.df.groupby(['date_of_extract', 'publication']).size().unstack(fill_value=0)
         
         return pub_ts
     
+    @traced()
+    @memoized('df')
+    def geography_index(self):
+        """
+        State -> city -> zip index of the loaded data, built once per load
+
+        Returns:
+            GeoIndex (see geo_index.py) answering per-state top-k and zip
+            prefix queries without rescanning the rows
+        """
+        if self.execution != 'memory':
+            return self._aggregates.geography
+        return GeoIndex.build(self.df)
+    
+    @traced()
+    @memoized('df')
     def analyze_by_geography(self):
         """
         Analyze time series by geography (State and City)
         """
         logging.info("Analyzing by geography...")
+        geo = self.geography_index()
         
         # By State
-        state_ts = self.df.groupby(['date_of_extract', 'state']).size().unstack(fill_value=0)
+        state_ts = geo.state_series()
         
         # Top cities over time
-        top_cities = self.df['city'].value_counts().head(10).index
-        city_ts = self.df[self.df['city'].isin(top_cities)].groupby(
-            ['date_of_extract', 'city']
-        ).size().unstack(fill_value=0)
+        top_cities = geo.top_cities(10).index
+        city_ts = geo.city_series(sorted(top_cities))
         
         return state_ts, city_ts
     
+    @memoized('df')
+    def _value_counts(self, column):
+        """Value counts of a column, used by the summary report"""
+        if self.execution != 'memory' and column == 'publication':
+            return self._aggregates.publication_counts
+        self._require_rows(f"Value counts of '{column}'")
+        return self.df[column].value_counts()
+    
+    @traced()
+    @memoized('df')
     def analyze_new_vs_existing(self):
         """
         Analyze new subscriptions vs existing subscriptions over time
         """
         logging.info("Analyzing new vs existing subscriptions...")
+        self._require_rows("New vs existing analysis")
         
         if 'LastStartDate' not in self.df.columns:
             logging.warning("LastStartDate column not found. Skipping new vs existing analysis.")
@@ -248,6 +595,7 @@ class TimeSeriesAnalyzer:
         
         return new_vs_existing
     
+    @traced()
     def detect_anomalies(self, threshold=3):
         """
         Detect anomalies in the time series using statistical methods
@@ -258,25 +606,105 @@ class TimeSeriesAnalyzer:
         if self.ts_data is None:
             self.calculate_growth_metrics()
         
+        z_score, is_anomaly = self._anomaly_flags(threshold)
+        
+        # Scores go on a copy: ts_data is a cached result shared with the
+        # other analyses and is never modified in place
+        scored = self.ts_data.assign(z_score=z_score, is_anomaly=is_anomaly)
+        anomalies = scored[is_anomaly]
+        
+        logging.info(f"Found {len(anomalies)} anomalies")
+        
+        return anomalies
+    
+    @memoized('ts_data')
+    def _anomaly_flags(self, threshold):
+        """Z-scores and anomaly flags for a given threshold"""
         logging.info(f"Detecting anomalies (threshold: {threshold} std devs)...")
         
         # Calculate z-scores
         mean = self.ts_data['total_subscriptions'].mean()
         std = self.ts_data['total_subscriptions'].std()
         
-        self.ts_data['z_score'] = (self.ts_data['total_subscriptions'] - mean) / std
-        self.ts_data['is_anomaly'] = np.abs(self.ts_data['z_score']) > threshold
+        z_score = (self.ts_data['total_subscriptions'] - mean) / std
+        is_anomaly = np.abs(z_score) > threshold
         
-        anomalies = self.ts_data[self.ts_data['is_anomaly']]
+        return z_score, is_anomaly
+    
+    @traced()
+    def detect_segment_anomalies(self, by=('publication', 'state'), method='mad',
+                                 threshold=3.5, window=6, min_volume=10):
+        """
+        Detect anomalies in every segment series at once (e.g. each publication x state)
         
-        logging.info(f"Found {len(anomalies)} anomalies")
+        Args:
+            by: Columns defining a segment, e.g. ('publication', 'state') or ('route_id',)
+            method: 'mad' (robust median/MAD), 'rolling' (trailing median/MAD) or 'zscore'
+            threshold: Absolute score above which a segment-date is flagged
+            window: Trailing window (number of extracts) for the rolling method
+            min_volume: Skip series whose median count is below this value
+        
+        Returns:
+            DataFrame of flagged segment-dates ranked by absolute score
+        """
+        self._require_rows("Segment anomaly detection")
+        if self.df is None:
+            self.load_data()
         
-        return anomalies
+        return self._segment_anomalies(tuple(by), method, threshold, window, min_volume)
+    
+    @memoized('df')
+    def _segment_matrix(self, by):
+        """Date x segment count matrix, shared by segment-level analyses"""
+        return anomaly.segment_matrix(self.df, by)
+    
+    @memoized('df')
+    def _segment_anomalies(self, by, method, threshold, window, min_volume):
+        logging.info(f"Detecting segment anomalies by {', '.join(by)} ({method}, threshold {threshold})...")
+        matrix = self._segment_matrix(by)
+        return anomaly.detect_segment_anomalies(
+            matrix, method=method, threshold=threshold, window=window, min_volume=min_volume
+        )
+    
+    @traced()
+    def forecast_segments(self, by=('publication',), horizon=forecast.DEFAULT_HORIZON, method='holt',
+                          holdout=forecast.DEFAULT_HOLDOUT, min_volume=10):
+        """
+        Forecast every segment series at once and backtest the model
+        
+        Args:
+            by: Columns defining a segment, e.g. ('publication',), ('state',) or ('route_id',)
+            horizon: Number of future extracts to forecast
+            method: 'linear' (trend line), 'ses' (exponential smoothing) or 'holt'
+                    (exponential smoothing with trend)
+            holdout: Most recent extracts held out to measure forecast error
+            min_volume: Skip series whose median count is below this value
+        
+        Returns:
+            (forecasts, metrics): future extract date x segment forecasts, and
+            per-segment backtest errors (mae, rmse, mape, naive_mae, skill)
+            with the fitted parameters
+        """
+        self._require_rows("Segment forecasting")
+        if self.df is None:
+            self.load_data()
+        
+        return self._segment_forecast(tuple(by), horizon, method, holdout, min_volume)
+    
+    @memoized('df')
+    def _segment_forecast(self, by, horizon, method, holdout, min_volume):
+        logging.info(f"Forecasting segments by {', '.join(by)} ({method}, {horizon} extracts ahead)...")
+        return forecast.forecast_segments(
+            self._segment_matrix(by), horizon=horizon, method=method, holdout=holdout, min_volume=min_volume
+        )
     
+    @traced()
     def plot_overall_trends(self, save=True):
         """
         Create comprehensive trend visualizations
         """
+        import matplotlib.pyplot as plt
+        
         if self.ts_data is None:
             self.calculate_growth_metrics()
         
@@ -335,7 +763,7 @@ class TimeSeriesAnalyzer:
         plt.tight_layout()
         
         if save:
-            plot_path = OUTPUT_DIR / 'overall_trends.png'
+            plot_path = self._output_path('overall_trends.png')
             plt.savefig(plot_path, dpi=300, bbox_inches='tight')
             logging.info(f"Saved plot to {plot_path}")
         
@@ -343,10 +771,13 @@ class TimeSeriesAnalyzer:
         
         return fig
     
+    @traced()
     def plot_status_analysis(self, save=True):
         """
         Visualize subscription status distribution over time
         """
+        import matplotlib.pyplot as plt
+        
         status_ts, status_pct = self.analyze_by_status()
         
         logging.info("Creating status analysis visualizations...")
@@ -375,7 +806,7 @@ class TimeSeriesAnalyzer:
         plt.tight_layout()
         
         if save:
-            plot_path = OUTPUT_DIR / 'status_analysis.png'
+            plot_path = self._output_path('status_analysis.png')
             plt.savefig(plot_path, dpi=300, bbox_inches='tight')
             logging.info(f"Saved plot to {plot_path}")
         
@@ -383,10 +814,13 @@ class TimeSeriesAnalyzer:
         
         return fig
     
+    @traced()
     def plot_publication_trends(self, top_n=10, save=True):
         """
         Visualize trends by publication
         """
+        import matplotlib.pyplot as plt
+        
         pub_ts = self.analyze_by_publication()
         
         # Get top N publications by total count
@@ -409,7 +843,7 @@ class TimeSeriesAnalyzer:
         plt.tight_layout()
         
         if save:
-            plot_path = OUTPUT_DIR / 'publication_trends.png'
+            plot_path = self._output_path('publication_trends.png')
             plt.savefig(plot_path, dpi=300, bbox_inches='tight')
             logging.info(f"Saved plot to {plot_path}")
         
@@ -417,10 +851,13 @@ class TimeSeriesAnalyzer:
         
         return fig
     
+    @traced()
     def plot_geographic_distribution(self, save=True):
         """
         Visualize geographic distribution over time
         """
+        import matplotlib.pyplot as plt
+        
         state_ts, city_ts = self.analyze_by_geography()
         
         logging.info("Creating geographic distribution visualizations...")
@@ -450,7 +887,7 @@ class TimeSeriesAnalyzer:
         plt.tight_layout()
         
         if save:
-            plot_path = OUTPUT_DIR / 'geographic_distribution.png'
+            plot_path = self._output_path('geographic_distribution.png')
             plt.savefig(plot_path, dpi=300, bbox_inches='tight')
             logging.info(f"Saved plot to {plot_path}")
         
@@ -458,40 +895,58 @@ class TimeSeriesAnalyzer:
         
         return fig
     
+    @memoized('df')
+    def _row_totals(self):
+        """Row count, active rows and extract date range for the summary report"""
+        if self.execution != 'memory':
+            agg = self._aggregates
+            return {'rows': agg.rows, 'active': agg.active, 'first_date': agg.dates.min(),
+                    'last_date': agg.dates.max(), 'unique_dates': len(agg.dates)}
+        extract_dates = self.df['date_of_extract']
+        return {
+            'rows': len(self.df),
+            'active': (self.df['status'] == 'A').sum(),
+            'first_date': extract_dates.min(),
+            'last_date': extract_dates.max(),
+            'unique_dates': extract_dates.nunique(),
+        }
+    
+    @traced()
     def generate_summary_report(self):
         """
         Generate a comprehensive summary report
         """
         logging.info("Generating summary report...")
         
-        if self.df is None:
+        if self.df is None and self._aggregates is None:
             self.load_data()
         
         if self.ts_data is None:
             self.calculate_growth_metrics()
         
         trends = self.analyze_trends()
+        totals = self._row_totals()
         
         report = {
             'data_summary': {
-                'total_records': len(self.df),
-                'date_range': f"{self.df['date_of_extract'].min()} to {self.df['date_of_extract'].max()}",
-                'unique_dates': self.df['date_of_extract'].nunique(),
-                'unique_accounts': self.df['accoutid'].nunique(),
-                'unique_publications': self.df['publication'].nunique(),
-                'unique_states': self.df['state'].nunique(),
-                'unique_cities': self.df['city'].nunique(),
+                'total_records': totals['rows'],
+                'date_range': f"{totals['first_date']} to {totals['last_date']}",
+                'unique_dates': totals['unique_dates'],
+                'unique_accounts': self.distinct_count('accoutid'),
+                'unique_publications': self.distinct_count('publication'),
+                'unique_states': self.distinct_count('state'),
+                'unique_cities': self.distinct_count('city'),
             },
             'subscription_status': {
-                'total_subscriptions': len(self.df),
-                'active_subscriptions': (self.df['status'] == 'A').sum(),
-                'inactive_subscriptions': (self.df['status'] != 'A').sum(),
-                'activation_rate': (self.df['status'] == 'A').sum() / len(self.df) * 100,
+                'total_subscriptions': totals['rows'],
+                'active_subscriptions': totals['active'],
+                'inactive_subscriptions': totals['rows'] - totals['active'],
+                'activation_rate': totals['active'] / totals['rows'] * 100,
             },
             'trend_analysis': trends,
-            'top_publications': self.df['publication'].value_counts().head(10).to_dict(),
-            'top_states': self.df['state'].value_counts().head(10).to_dict(),
-            'top_cities': self.df['city'].value_counts().head(10).to_dict(),
+            'top_publications': self._value_counts('publication').head(10).to_dict(),
+            'top_states': self.geography_index().state_counts().nlargest(10).to_dict(),
+            'top_cities': self.geography_index().top_cities(10).to_dict(),
         }
         
         # Print report
@@ -538,7 +993,7 @@ class TimeSeriesAnalyzer:
         print("\n" + "="*80)
         
         # Save report to file
-        report_path = OUTPUT_DIR / 'summary_report.txt'
+        report_path = self._output_path('summary_report.txt')
         with open(report_path, 'w') as f:
             f.write("TIME SERIES ANALYSIS SUMMARY REPORT\n")
             f.write("="*80 + "\n\n")
@@ -554,6 +1009,7 @@ class TimeSeriesAnalyzer:
         
         return report
     
+    @traced()
     def run_full_analysis(self):
         """
         Run complete time series analysis pipeline
@@ -582,6 +1038,7 @@ class TimeSeriesAnalyzer:
         # Generate summary report
         report = self.generate_summary_report()
         
+        log_cache_stats(self._memo)
         logging.info("Full analysis complete!")
         
         return report
@@ -591,7 +1048,14 @@ def main():
     """
     Main function to run time series analysis
     """
-    analyzer = TimeSeriesAnalyzer()
+    configure_logging()
+    # Keep the console report readable (pandas/matplotlib deprecation noise)
+    warnings.filterwarnings('ignore')
+    
+    # Partitioned when the cleaned data would not fit in the memory budget
+    plan = planner.analysis_plan(CLEAN_FILE)
+    logging.info(f"Analysis plan: {plan}")
+    analyzer = TimeSeriesAnalyzer(execution=plan['execution'], workers=plan['workers'])
     report = analyzer.run_full_analysis()
     
     print("\n✅ Time series analysis complete!")
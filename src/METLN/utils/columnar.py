@@ -0,0 +1,168 @@
+"""
+Columnar cache module for MTLN project
+Keeps an Arrow IPC (Feather v2) copy of a CSV next to it and loads it through
+a memory map, so repeated loads skip text parsing and processes reading the
+same file share its pages through the OS page cache
+"""
+import logging
+import os
+from pathlib import Path
+
+CACHE_SUFFIX = ".arrow"
+
+# Schema metadata identifying the CSV a cache was built from
+META_SOURCE_SIZE = b"metln.source_size"
+META_SOURCE_MTIME = b"metln.source_mtime_ns"
+
+
+def _pyarrow():
+    """pyarrow if installed (optional dependency), else None"""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return None
+    return pa
+
+
+def cache_path(csv_path):
+    """Cache file that belongs to a CSV (cleaned_data.csv -> cleaned_data.arrow)"""
+    return Path(csv_path).with_suffix(CACHE_SUFFIX)
+
+
+def _source_signature(csv_path):
+    st = os.stat(csv_path)
+    return {META_SOURCE_SIZE: str(st.st_size).encode(), META_SOURCE_MTIME: str(st.st_mtime_ns).encode()}
+
+
+def is_fresh(csv_path):
+    """
+    Check whether the cache matches the current CSV
+
+    Args:
+        csv_path: Source CSV file
+
+    Returns:
+        True when the cache exists and was built from this exact CSV
+    """
+    pa = _pyarrow()
+    path = cache_path(csv_path)
+    if pa is None or not path.exists() or not Path(csv_path).exists():
+        return False
+    try:
+        with pa.memory_map(str(path), "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    signature = _source_signature(csv_path)
+    return all(metadata.get(key) == value for key, value in signature.items())
+
+
+def _to_arrow_table(pa, df):
+    """Convert a frame, turning mixed-type object columns (e.g. Zip) into strings"""
+    import pandas as pd
+
+    converted = {}
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) in ("mixed", "mixed-integer"):
+            converted[col] = df[col].astype("string")
+    if converted:
+        df = df.assign(**converted)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_cache(df, csv_path):
+    """
+    Write the Arrow cache for a CSV that has just been written from ``df``
+
+    The file is uncompressed so readers can memory-map it without copying,
+    and is replaced atomically so concurrent readers never see a partial file.
+
+    Args:
+        df: The frame that was saved to ``csv_path``
+        csv_path: Source CSV file (must already exist)
+
+    Returns:
+        Path of the cache, or None when it could not be written (pyarrow
+        missing, unconvertible column, read-only folder); the CSV stays the
+        source of truth either way
+    """
+    pa = _pyarrow()
+    if pa is None:
+        logging.info("pyarrow not installed; skipping columnar cache")
+        return None
+
+    path = cache_path(csv_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        table = _to_arrow_table(pa, df)
+        metadata = dict(table.schema.metadata or {})
+        metadata.update(_source_signature(csv_path))
+        table = table.replace_schema_metadata(metadata)
+
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException) as e:
+        logging.warning(f"Could not write columnar cache for {csv_path}: {e}")
+        return None
+    logging.info(f"Columnar cache written to {path} ({table.num_rows:,} rows)")
+    return path
+
+
+def read_cache(csv_path, columns=None, zero_copy=False):
+    """
+    Memory-map the cache of a CSV into a DataFrame
+
+    Args:
+        csv_path: Source CSV file
+        columns: Subset of columns to load (None = all)
+        zero_copy: Keep every column in Arrow memory (pandas ArrowDtype) so the
+                   frame is a view of the mapped file; use this in parallel
+                   workers. The default converts numeric columns to numpy
+                   dtypes (one private copy of those columns) to match the
+                   dtypes read_csv produces.
+
+    Returns:
+        DataFrame
+    """
+    import pandas as pd
+
+    pa = _pyarrow()
+    with pa.memory_map(str(cache_path(csv_path)), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    if zero_copy:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_frame(csv_path, columns=None, zero_copy=False, **read_csv_kwargs):
+    """
+    Load a CSV through its columnar cache, (re)building the cache when stale
+
+    Args:
+        csv_path: CSV file to load
+        columns: Subset of columns to load (None = all)
+        zero_copy: See read_cache()
+        **read_csv_kwargs: Passed to pandas.read_csv when the CSV has to be parsed
+
+    Returns:
+        DataFrame
+    """
+    import pandas as pd
+
+    if is_fresh(csv_path):
+        df = read_cache(csv_path, columns=columns, zero_copy=zero_copy)
+        logging.info(f"Loaded {len(df):,} rows from columnar cache {cache_path(csv_path)}")
+        return df
+
+    read_csv_kwargs.setdefault("low_memory", False)
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    if write_cache(df, csv_path) is not None and zero_copy:
+        df = read_cache(csv_path, zero_copy=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
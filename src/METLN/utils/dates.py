@@ -0,0 +1,182 @@
+"""
+Date parsing module for MTLN project
+Shared parser for extract and subscription dates: detects one format per
+column, parses each distinct value once and broadcasts the result back to
+the rows, remembering format choices per source file and parsed values
+across calls
+"""
+import logging
+import os
+from pathlib import Path
+
+# Formats seen in the sublist extracts and the CSVs written from them, most
+# specific first so e.g. '%m/%d/%Y' wins over '%m/%d/%y'
+CANDIDATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%m/%d/%Y",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%y",
+    "%m-%d-%Y",
+    "%Y%m%d",
+)
+
+# Distinct values sampled to pick a format
+SAMPLE_SIZE = 200
+
+# Parsed values kept per format; the cache is dropped when it grows past this
+MAX_CACHED_VALUES = 200_000
+
+_formats = {}  # (source signature, column) -> chosen format (None = mixed)
+_parsed = {}   # format -> Series of datetime64 indexed by the text value
+
+
+def clear_cache():
+    """Forget every remembered format and parsed value"""
+    _formats.clear()
+    _parsed.clear()
+
+
+def _source_key(source):
+    """Identify a source file by path, size and mtime so an edited file is re-detected"""
+    if source is None:
+        return None
+    try:
+        st = os.stat(source)
+    except OSError:
+        return str(source)
+    return (str(Path(source).resolve()), st.st_size, st.st_mtime_ns)
+
+
+def detect_format(values):
+    """
+    Pick the candidate format that parses the most sampled values
+
+    Args:
+        values: Distinct non-null date strings
+
+    Returns:
+        A strftime format, or None when no candidate parses any value (the
+        values are then parsed with pandas' per-element 'mixed' inference)
+    """
+    import pandas as pd
+
+    sample = pd.Index(values[:SAMPLE_SIZE])
+    if len(sample) == 0:
+        return None
+    best, best_count = None, 0
+    for fmt in CANDIDATE_FORMATS:
+        count = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if count > best_count:
+            best, best_count = fmt, count
+            if count == len(sample):
+                break
+    return best
+
+
+def _parse_unique(text, fmt):
+    """Parse distinct strings with one format, falling back to 'mixed' for the rest"""
+    import pandas as pd
+
+    if fmt is None:
+        return pd.to_datetime(text, format="mixed", errors="coerce").to_numpy()
+    parsed = pd.Series(pd.to_datetime(text, format=fmt, errors="coerce"))
+    missed = parsed.isna().to_numpy()
+    if missed.any():
+        # A few values in another layout (e.g. a stray ISO date among m/d/Y)
+        parsed[missed] = pd.to_datetime(text[missed], format="mixed", errors="coerce")
+    return parsed.to_numpy()
+
+
+def _lookup(text, fmt):
+    """
+    Parsed values for strings, reusing earlier results for the same format
+
+    ``text`` may repeat a value (distinct raw values can strip to the same
+    string); only unique strings are parsed and cached, so the cache index
+    stays unique.
+    """
+    import pandas as pd
+
+    text = pd.Index(text)
+    keys = text.unique()
+    cached = _parsed.get(fmt)
+    if cached is None or len(cached) > MAX_CACHED_VALUES:
+        cached = pd.Series(dtype="datetime64[ns]")
+    positions = cached.index.get_indexer(keys)
+    missing = positions < 0
+    if missing.any():
+        new_text = keys[missing]
+        new = pd.Series(_parse_unique(new_text, fmt), index=new_text)
+        cached = new if cached.empty else pd.concat([cached, new])
+        _parsed[fmt] = cached
+        positions = cached.index.get_indexer(keys)
+    return cached.to_numpy()[positions][keys.get_indexer(text)]
+
+
+def parse_dates(values, source=None, column=None, errors="coerce"):
+    """
+    Parse a column of dates
+
+    Args:
+        values: Series of date strings, Timestamps or a mix of both
+        source: File the column was read from; the detected format is reused
+                for later calls with the same file (unchanged) and column
+        column: Column name used with ``source`` as the cache key
+        errors: 'coerce' turns unparseable values into NaT, 'raise' raises
+                ValueError listing a few of them
+
+    Returns:
+        datetime64 Series with the same index as ``values``
+    """
+    import numpy as np
+    import pandas as pd
+
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = pd.Index(uniques)
+    if uniques.inferred_type in ("datetime", "datetime64", "date"):
+        parsed = pd.to_datetime(uniques, errors=errors).to_numpy()
+    else:
+        text = uniques.astype(str).str.strip()
+        key = (_source_key(source), column) if source is not None else None
+        if key is not None and key in _formats:
+            fmt = _formats[key]
+        else:
+            fmt = detect_format(text[text != ""])
+            if key is not None:
+                _formats[key] = fmt
+            logging.debug(f"Date format for {column or 'column'}: {fmt or 'mixed'}")
+        parsed = _lookup(text, fmt)
+
+        if errors == "raise":
+            bad = text[pd.isna(parsed) & (text != "")]
+            if len(bad):
+                raise ValueError(f"Unparseable dates in {column or 'column'}: {list(bad[:5])}")
+
+    result = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[ns]")
+    present = codes >= 0
+    result[present] = parsed[codes[present]]
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def parse_date_columns(df, columns, source=None, errors="coerce"):
+    """
+    Parse every listed column present in a frame, in place
+
+    Args:
+        df: DataFrame
+        columns: Column names to parse (missing ones are ignored)
+        source: File the frame was read from (see parse_dates)
+        errors: See parse_dates
+
+    Returns:
+        The same DataFrame
+    """
+    for col in columns:
+        if col in df.columns:
+            df[col] = parse_dates(df[col], source=source, column=col, errors=errors)
+    return df
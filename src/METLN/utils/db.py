@@ -2,28 +2,57 @@
 Database utility module for MTLN project
 Handles database connections and data loading operations
 """
-import pandas as pd
 import logging
-import sqlite3
 from pathlib import Path
-from typing import Optional
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+from .instrument import traced
+from . import columnar, dates
+
+# pandas and SQLAlchemy are imported inside the functions that use them, so
+# quick commands (e.g. table info) don't pay for the whole data stack
+if TYPE_CHECKING:
+    import pandas as pd
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 DATA_DIR = PROJECT_ROOT / "data"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 DATABASE_DIR = DATA_DIR / "database"
-DATABASE_DIR.mkdir(exist_ok=True)
 
 # Default SQLite database path
 DEFAULT_DB_PATH = DATABASE_DIR / "mtln.db"
 
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s] : %(message)s:')
+# Bound parameters per statement for multi-row INSERTs (SQLite >= 3.32 limit)
+MAX_SQL_PARAMETERS = 32766
+
+# Covering indexes for the analyzer's GROUP BY queries in sql mode (pushdown.py),
+# so the date x status / publication / geography counts are index scans
+AGGREGATE_INDEXES = {
+    'status': ('date_of_extract', 'Status'),
+    'publication': ('date_of_extract', 'Publication'),
+    'geography': ('date_of_extract', 'State', 'City', 'Zip'),
+}
+
+# Suffix of the table a load is written to before it replaces the real one
+STAGING_SUFFIX = "_staging"
+
+_Base = None
+
 
-Base = declarative_base()
+def __getattr__(name):
+    # Declarative base created on first use (module-level __getattr__, PEP 562)
+    global _Base
+    if name == "Base":
+        if _Base is None:
+            from sqlalchemy.orm import declarative_base
+            _Base = declarative_base()
+        return _Base
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def default_db_uri() -> str:
+    """URI of the default SQLite database, creating its folder if needed"""
+    DATABASE_DIR.mkdir(parents=True, exist_ok=True)
+    return f"sqlite:///{DEFAULT_DB_PATH}"
 
 
 class DatabaseConnection:
@@ -41,7 +70,7 @@ class DatabaseConnection:
                    If None, uses default SQLite database
         """
         if db_uri is None:
-            db_uri = f"sqlite:///{DEFAULT_DB_PATH}"
+            db_uri = default_db_uri()
         
         self.db_uri = db_uri
         self.engine = None
@@ -51,6 +80,9 @@ class DatabaseConnection:
     
     def connect(self):
         """Create database engine and session"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        
         try:
             self.engine = create_engine(self.db_uri, echo=False)
             Session = sessionmaker(bind=self.engine)
@@ -64,7 +96,7 @@ class DatabaseConnection:
     def create_tables(self):
         """Create all tables defined in the Base metadata"""
         try:
-            Base.metadata.create_all(self.engine)
+            __getattr__("Base").metadata.create_all(self.engine)
             logging.info("Database tables created successfully")
         except Exception as e:
             logging.error(f"Failed to create tables: {e}")
@@ -79,70 +111,236 @@ class DatabaseConnection:
         logging.info("Database connection closed")
 
 
+@traced()
 def load_csv_to_sql(
     csv_path: Path,
     table_name: str = "subscriptions",
     db_uri: Optional[str] = None,
-    if_exists: str = "replace"
+    if_exists: str = "replace",
+    create_indexes: bool = True
 ) -> int:
     """
     Load CSV data into SQL database
     
+    A failed load leaves the table as it was: the rows are loaded into a
+    staging table first whenever they take more than one transaction.
+    
     Args:
         csv_path: Path to CSV file
         table_name: Name of the database table
         db_uri: Database URI (None = use default SQLite)
         if_exists: How to behave if table exists ('fail', 'replace', 'append')
+        create_indexes: Add the AGGREGATE_INDEXES after loading (built once
+                        over all rows rather than maintained per insert)
     
     Returns:
         Number of rows loaded
     """
+    import pandas as pd
+    from sqlalchemy import create_engine, inspect, text
+    from .. import planner
+    
     logging.info(f"Loading data from {csv_path} to table '{table_name}'")
     
     if not csv_path.exists():
         raise FileNotFoundError(f"CSV file not found: {csv_path}")
     
-    # Read CSV
-    df = pd.read_csv(csv_path, low_memory=False)
-    logging.info(f"Read {len(df):,} rows from CSV")
-    
-    # Convert date columns to proper datetime
-    date_columns = ['date_of_extract', 'LastStartDate', 'OriginalStartDate']
-    for col in date_columns:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+    chunk_rows = planner.csv_chunk_rows(csv_path, section="database", share=planner.DATABASE_SHARE)
+    if chunk_rows is None:
+        # Read CSV (through its columnar cache when fresh)
+        frames = [columnar.load_frame(csv_path)]
+        logging.info(f"Read {len(frames[0]):,} rows from CSV")
+    else:
+        # Larger than the memory budget allows: stream it, appending chunk by chunk
+        logging.info(f"Reading {csv_path} in chunks of {chunk_rows:,} rows")
+        frames = pd.read_csv(csv_path, chunksize=chunk_rows, low_memory=False)
     
     # Create database connection
     if db_uri is None:
-        db_uri = f"sqlite:///{DEFAULT_DB_PATH}"
+        db_uri = default_db_uri()
     
     engine = create_engine(db_uri)
     
     try:
-        # Load to SQL
-        df.to_sql(table_name, con=engine, if_exists=if_exists, index=False, method='multi')
-        logging.info(f"Successfully loaded {len(df):,} rows to table '{table_name}'")
+        if if_exists == 'fail' and inspect(engine).has_table(table_name):
+            raise ValueError(f"Table '{table_name}' already exists.")
+        
+        # A replacing or multi-chunk load goes to a staging table that is moved
+        # into place once complete, so a failure leaves the table as it was
+        staged = if_exists == 'replace' or chunk_rows is not None
+        target = f"{table_name}{STAGING_SUFFIX}" if staged else table_name
+        rows = 0
+        try:
+            for i, df in enumerate(frames):
+                rows += load_frame_to_sql(df, table_name=target,
+                                          if_exists=('replace' if staged else if_exists) if i == 0 else 'append',
+                                          engine=engine, source=csv_path, batch_rows=planner.sql_batch_rows(len(df)))
+            if staged:
+                publish_staging_table(target, table_name, engine, replace=if_exists == 'replace')
+        except BaseException:
+            if staged:
+                drop_table(target, engine)
+            raise
+        
+        if create_indexes:
+            create_aggregate_indexes(table_name, engine=engine)
         
         # Verify the load
         with engine.connect() as conn:
-            result = conn.execute(f"SELECT COUNT(*) FROM {table_name}")
+            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
             count = result.fetchone()[0]
             logging.info(f"Verification: Table '{table_name}' contains {count:,} rows")
         
+        return rows
+    
+    finally:
+        engine.dispose()
+
+
+def publish_staging_table(staging: str, table_name: str, engine, replace: bool = True):
+    """
+    Move a fully loaded staging table into place
+    
+    With replace (or when the table does not exist yet) the staging table is
+    renamed over it; otherwise its rows are appended in one transaction.
+    
+    Args:
+        staging: Name of the loaded staging table (dropped afterwards)
+        table_name: Table to replace or append to
+        engine: Engine of the database holding both
+        replace: Replace the table's rows instead of appending to them
+    """
+    from sqlalchemy import inspect, text
+    
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        exists = inspect(conn).has_table(table_name)
+        if replace or not exists:
+            if exists:
+                conn.execute(text(f"DROP TABLE {quote(table_name)}"))
+            conn.execute(text(f"ALTER TABLE {quote(staging)} RENAME TO {quote(table_name)}"))
+        else:
+            columns = ", ".join(quote(col['name']) for col in inspect(conn).get_columns(staging))
+            conn.execute(text(f"INSERT INTO {quote(table_name)} ({columns}) SELECT {columns} FROM {quote(staging)}"))
+            conn.execute(text(f"DROP TABLE {quote(staging)}"))
+    logging.info(f"Moved staging table '{staging}' into '{table_name}'")
+
+
+def drop_table(table_name: str, engine):
+    """Drop a table if it exists"""
+    from sqlalchemy import text
+    
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {engine.dialect.identifier_preparer.quote(table_name)}"))
+
+
+def create_aggregate_indexes(table_name: str = "subscriptions", db_uri: Optional[str] = None, engine=None):
+    """
+    Create the AGGREGATE_INDEXES on a loaded table (existing ones are kept)
+    
+    Args:
+        table_name: Name of the database table
+        db_uri: Database URI (None = use default SQLite)
+        engine: Existing engine to reuse
+    """
+    from sqlalchemy import Index, MetaData, Table, create_engine
+    
+    owns_engine = engine is None
+    if owns_engine:
+        engine = create_engine(db_uri or default_db_uri())
+    
+    try:
+        table = Table(table_name, MetaData(), autoload_with=engine)
+        for name, columns in AGGREGATE_INDEXES.items():
+            if all(col in table.c for col in columns):
+                Index(f"ix_{table_name}_{name}", *(table.c[col] for col in columns)).create(engine, checkfirst=True)
+        logging.info(f"Aggregate indexes ready on table '{table_name}'")
+    finally:
+        if owns_engine:
+            engine.dispose()
+
+
+def load_frame_to_sql(
+    df: "pd.DataFrame",
+    table_name: str = "subscriptions",
+    db_uri: Optional[str] = None,
+    if_exists: str = "append",
+    engine=None,
+    source: Optional[Path] = None,
+    batch_rows: Optional[int] = None,
+    replace_extracts: bool = False
+) -> int:
+    """
+    Load an in-memory DataFrame into SQL database
+    
+    The rows are inserted in one transaction, so a failed load adds nothing.
+    
+    Args:
+        df: Cleaned rows (cleaned_data.csv layout)
+        table_name: Name of the database table
+        db_uri: Database URI (None = use default SQLite)
+        if_exists: How to behave if table exists ('fail', 'replace', 'append')
+        engine: Existing engine to reuse (e.g. from a long-running process)
+        source: File the rows came from (date formats are remembered per file)
+        batch_rows: Rows per INSERT batch (None = all at once); bounds the
+                    memory taken by the parameter tuples
+        replace_extracts: Delete rows of the frame's extract dates first (in
+                          the same transaction), so loading an extract again
+                          replaces it instead of duplicating it
+    
+    Returns:
+        Number of rows loaded
+    """
+    import pandas as pd
+    from sqlalchemy import DateTime, bindparam, create_engine, inspect, text
+    
+    # Convert date columns to proper datetime (each distinct value is parsed once)
+    df = df.copy()
+    dates.parse_date_columns(df, ['date_of_extract', 'LastStartDate', 'OriginalStartDate'], source=source)
+    
+    owns_engine = engine is None
+    if owns_engine:
+        if db_uri is None:
+            db_uri = default_db_uri()
+        engine = create_engine(db_uri)
+    
+    try:
+        with engine.begin() as conn:
+            if replace_extracts and if_exists == 'append' and inspect(conn).has_table(table_name):
+                extracts = [pd.Timestamp(value).to_pydatetime() for value in df['date_of_extract'].dropna().unique()]
+                if extracts:
+                    quote = engine.dialect.identifier_preparer.quote
+                    delete = text(f"DELETE FROM {quote(table_name)} WHERE {quote('date_of_extract')} IN :extracts")
+                    delete = delete.bindparams(bindparam('extracts', type_=DateTime(), expanding=True))
+                    removed = conn.execute(delete, {'extracts': extracts}).rowcount
+                    if removed:
+                        logging.info(f"Replacing {removed:,} rows already loaded for these extract dates")
+            if engine.dialect.name == 'sqlite':
+                # executemany on one prepared statement is far faster than huge multi-row VALUES in SQLite
+                df.to_sql(table_name, con=conn, if_exists=if_exists, index=False, chunksize=batch_rows)
+            else:
+                # Load to SQL, batching rows so each INSERT stays under the parameter limit
+                chunksize = max(1, MAX_SQL_PARAMETERS // max(1, len(df.columns)))
+                if batch_rows:
+                    chunksize = min(chunksize, batch_rows)
+                df.to_sql(table_name, con=conn, if_exists=if_exists, index=False,
+                          method='multi', chunksize=chunksize)
+        logging.info(f"Successfully loaded {len(df):,} rows to table '{table_name}'")
         return len(df)
     
     except Exception as e:
         logging.error(f"Failed to load data to SQL: {e}")
         raise
     finally:
-        engine.dispose()
+        if owns_engine:
+            engine.dispose()
 
 
 def query_data(
     query: str,
     db_uri: Optional[str] = None,
     params: Optional[dict] = None
-) -> pd.DataFrame:
+) -> "pd.DataFrame":
     """
     Execute SQL query and return results as DataFrame
     
@@ -154,8 +352,11 @@ def query_data(
     Returns:
         Query results as pandas DataFrame
     """
+    import pandas as pd
+    from sqlalchemy import create_engine
+    
     if db_uri is None:
-        db_uri = f"sqlite:///{DEFAULT_DB_PATH}"
+        db_uri = default_db_uri()
     
     engine = create_engine(db_uri)
     
@@ -181,20 +382,21 @@ def get_table_info(table_name: str = "subscriptions", db_uri: Optional[str] = No
     Returns:
         Dictionary with table information
     """
+    from sqlalchemy import create_engine, inspect, text
+    
     if db_uri is None:
-        db_uri = f"sqlite:///{DEFAULT_DB_PATH}"
+        db_uri = default_db_uri()
     
     engine = create_engine(db_uri)
     
     try:
         with engine.connect() as conn:
             # Get row count
-            result = conn.execute(f"SELECT COUNT(*) FROM {table_name}")
+            result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
             row_count = result.fetchone()[0]
             
-            # Get column info
-            df_sample = pd.read_sql(f"SELECT * FROM {table_name} LIMIT 1", con=conn)
-            columns = list(df_sample.columns)
+            # Get column info from the catalog (no pandas needed)
+            columns = [col['name'] for col in inspect(conn).get_columns(table_name)]
             
             info = {
                 'table_name': table_name,
@@ -282,6 +484,9 @@ def quick_setup(clean_data_path: Optional[Path] = None) -> dict:
 
 
 if __name__ == "__main__":
+    from .logs import configure_logging
+    configure_logging()
+    
     # Run quick setup when module is executed directly
     result = quick_setup()
     
@@ -0,0 +1,237 @@
+"""
+Stage timing and memory instrumentation for the MTLN pipeline
+Records wall time, CPU time, peak RSS and rows processed per stage and writes
+one machine-readable JSON trace per run
+
+The operating system only reports the peak RSS of the whole process so far,
+so each record holds that value (peak_rss_mb) and how much the stage raised
+it over its value at stage entry (peak_rss_increase_mb). A stage that stays
+under an earlier stage's peak shows an increase of 0.
+
+Tracing is off by default. Enable it with the METLN_TRACE=1 environment
+variable (trace written at interpreter exit) or programmatically with
+enable_tracing()/write_trace(). Set METLN_PROFILE_STAGE to a stage name to
+also dump a cProfile file for that stage.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+TRACE_DIR = PROJECT_ROOT / "outputs" / "traces"
+
+# Active tracer, or None when tracing is disabled. Wrapped functions only
+# check this global, which keeps the disabled overhead to one lookup.
+_tracer = None
+
+
+def _peak_rss_mb():
+    """Peak resident set size of the process so far in MB (None if unavailable)"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return peak / divisor
+    try:
+        # Only needed where resource is unavailable, so imported on demand
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+
+def _count_rows(result):
+    """Best-effort row count of a stage result"""
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if hasattr(result, 'shape') and len(getattr(result, 'shape', ())) >= 1:
+        return int(result.shape[0])
+    return None
+
+
+class Tracer:
+    """
+    Collects stage records for a single pipeline run
+    """
+
+    def __init__(self, trace_dir=None, profile_stage=None):
+        """
+        Initialize the tracer
+
+        Args:
+            trace_dir: Directory for the JSON trace and cProfile output
+            profile_stage: Stage name to run under cProfile (optional)
+        """
+        self.trace_dir = Path(trace_dir) if trace_dir else TRACE_DIR
+        self.profile_stage = profile_stage
+        self.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.records = []
+        self._stack = []
+        self._profile_count = 0
+
+    def run_stage(self, name, func, args, kwargs):
+        """Execute ``func`` as stage ``name`` and record its cost"""
+        record = {
+            'stage': name,
+            'parent': self._stack[-1]['stage'] if self._stack else None,
+            'depth': len(self._stack),
+            'rows': None,
+        }
+        self._stack.append(record)
+
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        peak_start = _peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            if profiler is not None:
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            record['status'] = 'ok'
+        except BaseException as e:
+            record['status'] = f'error: {type(e).__name__}'
+            raise
+        finally:
+            record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_s'] = round(time.process_time() - cpu_start, 6)
+            record['peak_rss_mb'] = _peak_rss_mb()
+            record['peak_rss_increase_mb'] = (
+                max(0.0, record['peak_rss_mb'] - peak_start) if peak_start is not None else None)
+            self._stack.pop()
+            self.records.append(record)
+            if profiler is not None:
+                self._dump_profile(name, profiler)
+
+        if record['rows'] is None:
+            record['rows'] = _count_rows(result)
+        return result
+
+    def add_rows(self, rows):
+        """Attribute processed rows to the innermost running stage"""
+        if self._stack:
+            current = self._stack[-1]
+            current['rows'] = (current['rows'] or 0) + int(rows)
+
+    def _dump_profile(self, name, profiler):
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        self._profile_count += 1
+        safe_name = name.replace('.', '_')
+        prof_path = self.trace_dir / f"profile_{self.run_id}_{safe_name}_{self._profile_count}.prof"
+        profiler.dump_stats(prof_path)
+        logging.info(f"cProfile output for stage '{name}' saved to {prof_path}")
+
+    def to_dict(self):
+        """Trace contents as a JSON-serializable dictionary"""
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'profile_stage': self.profile_stage,
+            'stages': self.records,
+        }
+
+    def write(self, path=None):
+        """
+        Write the trace as JSON
+
+        Args:
+            path: Output file (default: trace_dir/trace_<run_id>.json)
+
+        Returns:
+            Path of the written trace
+        """
+        path = Path(path) if path else self.trace_dir / f"trace_{self.run_id}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logging.info(f"Stage trace ({len(self.records)} stages) saved to {path}")
+        return path
+
+
+def enable_tracing(trace_dir=None, profile_stage=None):
+    """
+    Start recording stages for this process
+
+    Args:
+        trace_dir: Directory for trace output (default: outputs/traces)
+        profile_stage: Stage name to profile with cProfile (optional)
+
+    Returns:
+        The active Tracer
+    """
+    global _tracer
+    _tracer = Tracer(trace_dir=trace_dir, profile_stage=profile_stage)
+    return _tracer
+
+
+def disable_tracing():
+    """Stop recording and return the tracer that was active (if any)"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer():
+    """Active Tracer, or None when tracing is disabled"""
+    return _tracer
+
+
+def write_trace(path=None):
+    """Write the active trace to JSON; returns the path or None if disabled"""
+    if _tracer is None:
+        return None
+    return _tracer.write(path)
+
+
+def add_rows(rows):
+    """Report rows processed by the current stage (no-op when disabled)"""
+    if _tracer is not None:
+        _tracer.add_rows(rows)
+
+
+def traced(stage=None):
+    """
+    Decorator recording a function call as a pipeline stage
+
+    Args:
+        stage: Stage name (default: the function's qualified name)
+
+    Rows are taken from add_rows() calls inside the stage, otherwise from
+    the length of a returned DataFrame/array or a returned integer.
+    """
+    def decorator(func):
+        name = stage or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            return _tracer.run_stage(name, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+if os.environ.get('METLN_TRACE', '').lower() not in ('', '0', 'false', 'no'):
+    enable_tracing(
+        trace_dir=os.environ.get('METLN_TRACE_DIR') or None,
+        profile_stage=os.environ.get('METLN_PROFILE_STAGE') or None,
+    )
+    atexit.register(write_trace)
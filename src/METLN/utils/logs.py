@@ -0,0 +1,13 @@
+"""
+Logging setup for MTLN entry points
+Library modules only emit records; scripts and CLIs call configure_logging()
+once so importing the package never reconfigures the caller's logging
+"""
+import logging
+
+LOG_FORMAT = '[%(asctime)s] : %(message)s:'
+
+
+def configure_logging(level=logging.INFO):
+    """Install the project's console log format on the root logger"""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
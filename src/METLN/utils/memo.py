@@ -0,0 +1,143 @@
+"""
+Dependency-tracked memoization for analysis classes
+Each cached result declares the inputs it depends on and is recomputed only
+when one of those inputs (or a call argument) changes
+"""
+import functools
+import logging
+
+
+class MemoCache:
+    """
+    Per-instance result cache keyed on dependency versions
+
+    Dependencies are plain names (e.g. 'df', 'ts_data', 'distinct_mode').
+    Whoever owns a dependency calls ``bump(name)`` when it changes; every
+    cached result that declared that name is then treated as stale.
+
+    Dependencies are transitive: a result computed from other cached results
+    also depends on everything they depend on, so it can not miss one that
+    it did not declare itself.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._entries = {}
+        self._computing = []  # dependency sets of the computations in progress, innermost last
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, name):
+        """Current version counter of a dependency"""
+        return self._versions.get(name, 0)
+
+    def bump(self, name):
+        """Mark a dependency as changed and drop results that used it"""
+        self._versions[name] = self.version(name) + 1
+        stale = [key for key, (deps, _, _) in self._entries.items() if name in deps]
+        for key in stale:
+            del self._entries[key]
+
+    def _inherit(self, depends_on):
+        """Add dependencies of a result to the computation that is using it"""
+        if self._computing:
+            self._computing[-1].update(depends_on)
+
+    def get_or_compute(self, key, depends_on, compute):
+        """
+        Return the cached value for ``key`` or compute and store it
+
+        Args:
+            key: Hashable identifier of the result (method name + arguments)
+            depends_on: Names of the dependencies the result was built from
+                        (those of cached results used while computing it
+                        are added)
+            compute: Zero-argument callable producing the value
+
+        Returns:
+            The cached or freshly computed value
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] == tuple(self.version(name) for name in entry[0]):
+            self.hits += 1
+            self._inherit(entry[0])
+            return entry[2]
+
+        self.misses += 1
+        self._computing.append(set(depends_on))
+        try:
+            value = compute()
+        finally:
+            used = self._computing.pop()
+        depends_on = tuple(depends_on) + tuple(sorted(used - set(depends_on)))
+        # Computing may itself populate a dependency (e.g. lazily building
+        # ts_data), so record the versions the result actually saw
+        versions = tuple(self.version(name) for name in depends_on)
+        self._entries[key] = (depends_on, versions, value)
+        self._inherit(depends_on)
+        return value
+
+    def put(self, key, depends_on, value):
+        """
+        Store a value computed elsewhere (e.g. updated incrementally)
+
+        The entry is recorded against the current dependency versions, so
+        bump dependencies first and put afterwards.
+        """
+        versions = tuple(self.version(name) for name in depends_on)
+        self._entries[key] = (tuple(depends_on), versions, value)
+
+    def clear(self):
+        """Drop every cached result (version counters are kept)"""
+        self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for reporting"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'hit_rate': self.hits / total * 100 if total else 0.0,
+        }
+
+
+def cache_key(name, args=(), kwargs=None):
+    """Cache key used by ``memoized`` for a method call"""
+    return (name, tuple(args), tuple(sorted((kwargs or {}).items())))
+
+
+def memoized(*depends_on):
+    """
+    Decorator caching a method's result on ``self._memo``
+
+    Call arguments are part of the cache key, so analysis parameters such as
+    an anomaly threshold are tracked automatically. Instance-level inputs are
+    listed in ``depends_on`` and must be bumped by their owner on change.
+
+    Args:
+        *depends_on: Dependency names the result is derived from
+
+    Usage:
+        @memoized('df')
+        def analyze_by_status(self): ...
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = cache_key(method.__name__, args, kwargs)
+            return self._memo.get_or_compute(
+                key, depends_on, lambda: method(self, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+def log_cache_stats(cache, label="Analysis cache"):
+    """Log hit/miss counters of a MemoCache"""
+    stats = cache.stats()
+    logging.info(
+        f"{label}: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate']:.1f}% hit rate, {stats['entries']} entries)"
+    )
+    return stats
@@ -0,0 +1,232 @@
+"""
+Data-quality validation module for MTLN project
+Applies declarative row rules to each raw file before it reaches the
+processed data, and moves failing rows to a quarantine file with reason codes
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import normalize
+from .data_cleaner import COLUMN_MAPPING
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = PROJECT_ROOT / "data"
+QUARANTINE_DIR = DATA_DIR / "quarantine"
+QUARANTINE_FILE = QUARANTINE_DIR / "quarantined_rows.csv"
+SUMMARY_FILE = QUARANTINE_DIR / "validation_summary.csv"
+
+# 50 states, DC, territories and military mail codes
+US_STATE_CODES = frozenset("""
+    AL AK AZ AR CA CO CT DE FL GA HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO
+    MT NE NV NH NJ NM NY NC ND OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY
+    DC PR VI GU AS MP AA AE AP
+""".split())
+
+# Each rule fails a row when its check fails on the row's value.
+#   check: 'integer' - numeric with no fractional part
+#          'pattern' - full regex match on the text form (whole floats as ints)
+#          'in_set'  - value (stripped, upper-cased) in 'values'
+#          'date'    - parseable date between 'min' and 'max'
+#   allow_null: whether missing/blank values pass (default True)
+#   normalize: check the label cleaning will store (normalize.py rules and
+#              aliases), so 'Maine' and 'M.E.' pass as ME
+RULES = [
+    {'code': 'ACCOUNT_ID_NOT_NUMERIC', 'column': 'AccoutID', 'check': 'integer', 'allow_null': False},
+    # Excel drops the leading zero of Maine zips (04101 -> 4101)
+    {'code': 'ZIP_MALFORMED', 'column': 'Zip', 'check': 'pattern', 'pattern': r'\d{3,5}(-\d{4})?'},
+    {'code': 'STATE_UNKNOWN', 'column': 'State', 'check': 'in_set', 'values': US_STATE_CODES, 'normalize': True},
+    {'code': 'LAST_START_DATE_INVALID', 'column': 'LastStartDate', 'check': 'date',
+     'min': '1900-01-01', 'max': '2100-01-01'},
+    {'code': 'ORIGINAL_START_DATE_INVALID', 'column': 'OriginalStartDate', 'check': 'date',
+     'min': '1900-01-01', 'max': '2100-01-01'},
+]
+
+# Named header -> numbered header, for files that use 0..14 headers
+_NUMBERED = {name: num for num, name in COLUMN_MAPPING.items()}
+
+
+def _resolve_column(df, name):
+    """Values of a named column, taken from its numbered twin where present"""
+    num = _NUMBERED.get(name)
+    numbered = None
+    for key in (num, int(num)) if num is not None else ():
+        if key in df.columns:
+            numbered = df[key]
+            break
+    named = df[name] if name in df.columns else None
+    if numbered is None:
+        return named
+    if named is None:
+        return numbered
+    return named.where(numbered.isna(), numbered)
+
+
+def _as_text(values):
+    """Text form of unique values: whole floats lose their '.0', strings are stripped"""
+    out = []
+    for value in values:
+        if isinstance(value, (float, np.floating)) and float(value).is_integer():
+            value = int(value)
+        out.append(str(value).strip())
+    return np.array(out, dtype=object)
+
+
+def _check_pattern(values, text, rule):
+    return ~pd.Series(text).str.fullmatch(rule['pattern']).fillna(False).to_numpy(dtype=bool)
+
+
+def _check_in_set(values, text, rule):
+    allowed = {str(v).upper() for v in rule['values']}
+    return ~np.array([t.upper() in allowed for t in text], dtype=bool)
+
+
+def _check_date(values, text, rule):
+    if len(values) and all(isinstance(v, (pd.Timestamp, np.datetime64)) for v in values):
+        parsed = pd.DatetimeIndex(values)
+    else:
+        parsed = pd.to_datetime(pd.Series(text), errors='coerce', format='mixed')
+    parsed = pd.Series(parsed)
+    in_range = parsed.between(pd.Timestamp(rule.get('min', '1900-01-01')), pd.Timestamp(rule.get('max', '2100-01-01')))
+    return ~in_range.to_numpy(dtype=bool)
+
+
+# Checks evaluated on unique values ('integer' is handled in rule_failures)
+CHECKS = {
+    'pattern': _check_pattern,
+    'in_set': _check_in_set,
+    'date': _check_date,
+}
+
+
+def rule_failures(series, rule):
+    """
+    Boolean mask of rows failing one rule
+
+    The check runs on the column's unique values only and is broadcast back
+    through the factorized codes, so cost scales with cardinality (a few
+    thousand zips, states or dates) rather than row count.
+
+    Args:
+        series: Column values
+        rule: Rule dictionary from RULES
+
+    Returns:
+        numpy bool array, True where the row fails
+    """
+    allow_null = rule.get('allow_null', True)
+
+    # Account IDs are nearly unique, so factorizing would not pay off: parse
+    # the column directly and only look at the few rows that did not parse
+    if rule['check'] == 'integer':
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            missing = np.isnan(values)
+        else:
+            values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            missing = np.isnan(values)
+            unparsed = series[missing]
+            missing[missing] = (unparsed.isna() | (unparsed.astype(str).str.strip() == '')).to_numpy()
+        failed = np.isnan(values) & ~missing
+        failed |= ~np.isnan(values) & (values % 1 != 0)
+        return failed | missing if not allow_null else failed
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    if rule.get('normalize'):
+        text = np.array([form or '' for form in normalize.canonical_forms(uniques, rule['column'])], dtype=object)
+    else:
+        text = _as_text(uniques)
+    blank = text == ''
+    unique_failed = CHECKS[rule['check']](uniques, text, rule) & ~blank
+    if not allow_null:
+        unique_failed |= blank
+
+    present = codes >= 0
+    failed = np.zeros(len(series), dtype=bool)
+    failed[present] = unique_failed[codes[present]]
+    if not allow_null:
+        failed |= ~present
+    return failed
+
+
+def validate(df, rules=None):
+    """
+    Apply every rule to a frame in one vectorized pass
+
+    Args:
+        df: Raw rows of one file (named or numbered headers)
+        rules: Rule list (default RULES); rules whose column is absent are skipped
+
+    Returns:
+        (valid, quarantined, counts): passing rows, failing rows with a
+        'reasons' column of '|'-joined rule codes, and a dictionary of
+        failing-row counts per rule code
+    """
+    rules = RULES if rules is None else rules
+    if len(rules) > 63:
+        raise ValueError("At most 63 rules are supported")
+
+    bits = np.zeros(len(df), dtype=np.uint64)
+    counts = {}
+    for i, rule in enumerate(rules):
+        series = _resolve_column(df, rule['column'])
+        if series is None:
+            logging.debug(f"Validation rule {rule['code']} skipped: no {rule['column']} column")
+            counts[rule['code']] = 0
+            continue
+        failed = rule_failures(series, rule)
+        counts[rule['code']] = int(failed.sum())
+        bits[failed] |= np.uint64(1 << i)
+
+    bad = bits != 0
+    if not bad.any():
+        return df, df.iloc[0:0].assign(reasons=pd.Series(dtype=object)), counts
+
+    valid = df[~bad]
+    quarantined = df[bad].copy()
+    # Few distinct failure combinations: build each reason string once
+    combos, inverse = np.unique(bits[bad], return_inverse=True)
+    labels = np.array([
+        '|'.join(rule['code'] for i, rule in enumerate(rules) if int(combo) >> i & 1)
+        for combo in combos
+    ], dtype=object)
+    quarantined['reasons'] = labels[inverse]
+    return valid, quarantined, counts
+
+
+def write_quarantine(quarantined, counts, source, rows, extract_date=None):
+    """
+    Append failing rows and the per-rule summary for one source file
+
+    Args:
+        quarantined: Failing rows from validate() (standardized or raw headers)
+        counts: Per-rule counts from validate()
+        source: Source file name
+        rows: Total rows checked
+        extract_date: Extract date of the file, if known
+    """
+    from .data_cleaner import standardize_frame
+
+    QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
+    if len(quarantined):
+        # Labels as received, so reviewers see the original values
+        out = standardize_frame(quarantined.drop(columns='reasons'), normalize_labels=False)
+        out.insert(0, 'source_file', source)
+        out['reasons'] = quarantined['reasons'].to_numpy()
+        out.to_csv(QUARANTINE_FILE, mode='a', header=not QUARANTINE_FILE.exists(), index=False)
+
+    summary = pd.DataFrame([{
+        'source_file': source,
+        'date_of_extract': extract_date,
+        'rows': rows,
+        'quarantined': len(quarantined),
+        **{rule['code']: counts.get(rule['code'], 0) for rule in RULES},
+    }])
+    summary.to_csv(SUMMARY_FILE, mode='a', header=not SUMMARY_FILE.exists(), index=False)
+
+    if len(quarantined):
+        failing = ', '.join(f"{code}={n:,}" for code, n in counts.items() if n)
+        logging.warning(f"Quarantined {len(quarantined):,} of {rows:,} rows from {source} ({failing})")
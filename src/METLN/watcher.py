@@ -0,0 +1,277 @@
+"""
+Watch mode for MTLN project
+Keeps one warm process that picks up new sublist files as they land in
+data/raw and runs ingest -> clean -> incremental DB load -> incremental
+analysis for just the new extract
+"""
+import contextlib
+import fnmatch
+import io
+import logging
+import os
+import time
+from pathlib import Path
+
+from . import etl_pipeline, data_cleaner
+from .timeseries import TimeSeriesAnalyzer
+from .utils import db
+from .utils.instrument import traced
+
+# How often the raw directory is scanned
+POLL_INTERVAL = 1.0
+# A file is ingested once its size and mtime have not changed for this long
+SETTLE_SECONDS = 2.0
+
+
+class RawDirectoryWatcher:
+    """
+    Polls a directory and reports files that have finished being written
+
+    Polling (rather than inotify) keeps this portable and also works on
+    network shares, where change notifications are unreliable.
+    """
+
+    def __init__(self, directory, pattern='*.xlsx', settle_seconds=SETTLE_SECONDS):
+        """
+        Initialize the watcher
+
+        Args:
+            directory: Folder to watch
+            pattern: Glob pattern of files to pick up
+            settle_seconds: How long a file must stay unchanged before it is ready
+        """
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.settle_seconds = settle_seconds
+        self._observed = {}  # path -> ((size, mtime_ns), time the signature was first seen)
+        self.done = set()
+        self._failed = {}  # path -> signature that failed; retried once the file changes
+
+    def mark_failed(self, path):
+        """Hold a file back until it is modified again"""
+        observed = self._observed.pop(Path(path), None)
+        if observed is not None:
+            self._failed[Path(path)] = observed[0]
+
+    def mark_done(self, path):
+        """Never report this file again (processed or deliberately skipped)"""
+        self.done.add(Path(path))
+        self._observed.pop(Path(path), None)
+
+    def poll(self):
+        """
+        Scan the directory once
+
+        Returns:
+            List of (path, settled_at) for files that are ready, oldest first;
+            settled_at is the monotonic time the file stopped changing
+        """
+        now = time.monotonic()
+        ready = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                # Skip Excel lock files (~$name.xlsx) and anything not matching
+                if entry.name.startswith('~$') or not fnmatch.fnmatch(entry.name, self.pattern):
+                    continue
+                path = Path(entry.path)
+                if path in self.done:
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                signature = (st.st_size, st.st_mtime_ns)
+                if self._failed.get(path) == signature:
+                    continue
+                previous = self._observed.get(path)
+                if previous is None or previous[0] != signature:
+                    self._observed[path] = (signature, now)
+                    continue
+                if st.st_size > 0 and now - previous[1] >= self.settle_seconds:
+                    ready.append((path, previous[1]))
+        return sorted(ready, key=lambda item: item[1])
+
+
+class IngestDaemon:
+    """
+    Long-running ingest loop with the analyzer kept warm in memory
+    """
+
+    def __init__(self, raw_dir=None, db_uri=None, table_name='subscriptions',
+                 poll_interval=POLL_INTERVAL, settle_seconds=SETTLE_SECONDS, plots=False):
+        """
+        Initialize the daemon
+
+        Args:
+            raw_dir: Folder receiving sublist files (default: data/raw)
+            db_uri: Database URI (None = default SQLite database)
+            table_name: Table new rows are appended to
+            poll_interval: Seconds between directory scans
+            settle_seconds: Quiet period before a file counts as complete
+            plots: Also regenerate the charts after each update
+        """
+        self.raw_dir = Path(raw_dir or etl_pipeline.RAW_DATA_DIR)
+        self.db_uri = db_uri
+        self.table_name = table_name
+        self.poll_interval = poll_interval
+        self.plots = plots
+        self.watcher = RawDirectoryWatcher(self.raw_dir, settle_seconds=settle_seconds)
+        self.analyzer = TimeSeriesAnalyzer()
+        self.processed_dates = set()
+        self.engine = None
+
+    def start(self):
+        """Load existing state once so each new file only costs its own rows"""
+        if not self.raw_dir.exists():
+            raise FileNotFoundError(f"Raw directory not found {self.raw_dir}")
+
+        self.processed_dates = etl_pipeline.load_processed_dates()
+        for path in self.raw_dir.glob('*.xlsx'):
+            try:
+                if etl_pipeline.extract_date(path.name) in self.processed_dates:
+                    self.watcher.mark_done(path)
+            except ValueError:
+                self.watcher.mark_done(path)
+
+        # One engine for the life of the process instead of one per load
+        from sqlalchemy import create_engine
+        if self.db_uri is None:
+            self.db_uri = db.default_db_uri()
+        self.engine = create_engine(self.db_uri)
+
+        if self.analyzer.data_path.exists():
+            self.analyzer.load_data()
+            self.refresh_report()
+        logging.info(f"Watching {self.raw_dir} ({len(self.watcher.done)} files already processed)")
+
+    @traced()
+    def refresh_report(self):
+        """Recompute the analysis outputs from the warm analyzer"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.analyzer.create_daily_aggregations()
+            self.analyzer.calculate_growth_metrics()
+            self.analyzer.detect_anomalies()
+            self.analyzer.generate_summary_report()
+            if self.plots:
+                import matplotlib.pyplot as plt
+                self.analyzer.plot_overall_trends()
+                self.analyzer.plot_status_analysis()
+                self.analyzer.plot_publication_trends()
+                self.analyzer.plot_geographic_distribution()
+                plt.close('all')
+
+    @traced()
+    def process_file(self, path, settled_at=None):
+        """
+        Run one new file through every stage
+
+        A file whose extract date is recorded in processed_data.csv is never
+        ingested again, so the date is recorded only once the database load
+        and the cleaned rows are in place; a failure before that leaves no
+        rows behind that a retry would add a second time.
+
+        Args:
+            path: Settled raw file
+            settled_at: Monotonic time the file stopped changing (for latency)
+
+        Returns:
+            Dictionary of stage timings in seconds, or None when skipped
+        """
+        extract_date = etl_pipeline.extract_date(path.name)
+        if extract_date in self.processed_dates:
+            logging.info(f"Skipping {path.name}: {extract_date} was already processed")
+            return None
+
+        timings = {}
+        start = time.perf_counter()
+
+        raw = etl_pipeline.read_raw_file(path)
+        raw.insert(0, "date_of_extract", extract_date)
+        raw = etl_pipeline.validate_rows(raw, path.name)
+        timings['ingest'] = time.perf_counter() - start
+
+        mark = time.perf_counter()
+        clean = data_cleaner.standardize_frame(raw)
+        timings['clean'] = time.perf_counter() - mark
+
+        # The database goes first: it is loaded in one transaction that replaces
+        # whatever an earlier failed attempt left for this extract, so it never
+        # holds rows the CSV files lack and a retry cannot duplicate them
+        mark = time.perf_counter()
+        db.load_frame_to_sql(clean, table_name=self.table_name, engine=self.engine, replace_extracts=True)
+        timings['db_load'] = time.perf_counter() - mark
+
+        # processed_data.csv is the record of which extracts are done, so it is
+        # committed last; the cleaned rows are taken back out if that fails
+        mark = time.perf_counter()
+        clean_size = data_cleaner.append_clean_rows(clean)
+        try:
+            etl_pipeline.append_processed(raw)
+        except BaseException:
+            data_cleaner.discard_clean_rows(clean_size)
+            raise
+        self.processed_dates.add(extract_date)
+        timings['commit'] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        self.analyzer.append_data(clean)
+        self.refresh_report()
+        timings['analysis'] = time.perf_counter() - mark
+
+        timings['total'] = time.perf_counter() - start
+        if settled_at is not None:
+            # From the last write to the file (as observed by polling) to the updated report
+            timings['file_to_report'] = time.monotonic() - settled_at
+
+        logging.info(
+            f"{path.name}: {len(clean):,} rows ready in {timings['total']:.2f}s "
+            f"(ingest {timings['ingest']:.2f}s, clean {timings['clean']:.2f}s, "
+            f"db {timings['db_load']:.2f}s, commit {timings['commit']:.2f}s, "
+            f"analysis {timings['analysis']:.2f}s)"
+            + (f"; {timings['file_to_report']:.2f}s after the file settled" if settled_at is not None else "")
+        )
+        return timings
+
+    def run_once(self):
+        """Process every file that is ready now; returns how many were processed"""
+        processed = 0
+        for path, settled_at in self.watcher.poll():
+            try:
+                if self.process_file(path, settled_at) is not None:
+                    processed += 1
+            except Exception as e:
+                logging.error(f"Error processing file {path.name} : {e}")
+                self.watcher.mark_failed(path)
+                continue
+            self.watcher.mark_done(path)
+        return processed
+
+    def run(self, max_idle=None):
+        """
+        Watch until interrupted
+
+        Args:
+            max_idle: Stop after this many seconds without new files (None = forever)
+        """
+        self.start()
+        last_activity = time.monotonic()
+        try:
+            while True:
+                if self.run_once():
+                    last_activity = time.monotonic()
+                elif max_idle is not None and time.monotonic() - last_activity >= max_idle:
+                    break
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            logging.info("Watch mode stopped")
+        finally:
+            if self.engine is not None:
+                self.engine.dispose()
+
+
+def watch(raw_dir=None, db_uri=None, table_name='subscriptions', poll_interval=POLL_INTERVAL,
+          settle_seconds=SETTLE_SECONDS, plots=False, max_idle=None):
+    """Start watch mode (blocks until interrupted or idle for ``max_idle`` seconds)"""
+    daemon = IngestDaemon(raw_dir, db_uri, table_name, poll_interval, settle_seconds, plots)
+    daemon.run(max_idle=max_idle)
+    return daemon
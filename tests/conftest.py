@@ -0,0 +1,143 @@
+"""
+Shared fixtures for the MTLN test suite
+Small synthetic extracts in the cleaned_data.csv layout, written to a
+temporary folder so tests never touch data/ or outputs/
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN import data_cleaner, etl_pipeline, validation
+from src.METLN.data_cleaner import FINAL_COLUMNS
+from src.METLN.timeseries import TimeSeriesAnalyzer
+from src.METLN.utils import db
+
+CITIES = {
+    'Portland': ('ME', 4101),
+    'Lewiston': ('ME', 4240),
+    'South Portland': ('ME', 4106),
+    'Bangor': ('ME', 4401),
+    'Boston': ('MA', 2108),
+    'Nashua': ('NH', 3060),
+}
+PUBLICATIONS = ['MTM_PT', 'SMG_SJ', 'MTM_KJ']
+STATUSES = ['A', 'A', 'A', 'V', 'S']
+
+
+def cleaned_frame(rows_per_snapshot=400, snapshots=6, seed=0):
+    """
+    Monthly extracts with overlapping accounts, in the cleaned_data.csv layout
+
+    Returns:
+        DataFrame with FINAL_COLUMNS; extract dates as 'YYYY-MM-DD' text
+    """
+    rng = np.random.default_rng(seed)
+    cities = np.array(list(CITIES))
+    frames = []
+    for i in range(snapshots):
+        accounts = np.arange(1000 + i * 20, 1000 + i * 20 + rows_per_snapshot)
+        city = rng.choice(cities, rows_per_snapshot)
+        frames.append(pd.DataFrame({
+            'date_of_extract': (pd.Timestamp('2024-01-01') + pd.DateOffset(months=i)).strftime('%Y-%m-%d'),
+            'Publication': rng.choice(PUBLICATIONS, rows_per_snapshot),
+            'AccoutID': accounts,
+            'Status': rng.choice(STATUSES, rows_per_snapshot),
+            'Bill Method': 'CC',
+            'Dist ID': 'D001',
+            'Route ID': [f"R{a % 37:03d}" for a in accounts],
+            'Day pattern': 'DLY',
+            'City': city,
+            'State': [CITIES[c][0] for c in city],
+            'Zip': [CITIES[c][1] + a % 3 for c, a in zip(city, accounts)],
+            'Rate Code': 'RC01',
+            'LastStartDate': '01/15/2020',
+            'OriginalStartDate': '03/01/2019',
+            'OccupantID': accounts * 10,
+            'RouteType ID': 'C',
+        }))
+    return pd.concat(frames, ignore_index=True)[FINAL_COLUMNS]
+
+
+def write_raw(path, seed=0, rows=20):
+    """One raw workbook (an extract without the date column) of cleaned_frame() rows"""
+    cleaned_frame(rows_per_snapshot=rows, snapshots=1, seed=seed).drop(columns='date_of_extract').to_excel(
+        path, index=False)
+
+
+@pytest.fixture
+def data_dirs(tmp_path, monkeypatch):
+    """
+    The pipeline's raw, processed (with staging) and quarantine folders moved
+    under tmp_path; raw/ is created empty
+    """
+    processed = tmp_path / "processed"
+    quarantine = tmp_path / "quarantine"
+    monkeypatch.setattr(etl_pipeline, 'RAW_DATA_DIR', tmp_path / "raw")
+    monkeypatch.setattr(etl_pipeline, 'PROCESSED_DATA_DIR', processed)
+    monkeypatch.setattr(etl_pipeline, 'PROCESSED_FILE', processed / "processed_data.csv")
+    monkeypatch.setattr(etl_pipeline, 'STAGING_DIR', processed / "staging")
+    monkeypatch.setattr(data_cleaner, 'PROCESSED_DATA_DIR', processed)
+    monkeypatch.setattr(data_cleaner, 'PROCESSED_FILE', processed / "processed_data.csv")
+    monkeypatch.setattr(data_cleaner, 'CLEAN_FILE', processed / "cleaned_data.csv")
+    monkeypatch.setattr(validation, 'QUARANTINE_DIR', quarantine)
+    monkeypatch.setattr(validation, 'QUARANTINE_FILE', quarantine / "quarantined_rows.csv")
+    monkeypatch.setattr(validation, 'SUMMARY_FILE', quarantine / "validation_summary.csv")
+    (tmp_path / "raw").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def clean_csv(tmp_path):
+    """cleaned_data.csv with six monthly extracts"""
+    path = tmp_path / "cleaned_data.csv"
+    cleaned_frame().to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def db_uri(clean_csv, tmp_path):
+    """SQLite database with clean_csv loaded as the subscriptions table"""
+    uri = f"sqlite:///{tmp_path / 'mtln.db'}"
+    db.load_csv_to_sql(clean_csv, db_uri=uri)
+    return uri
+
+
+@pytest.fixture
+def memory_results(clean_csv):
+    """analysis_results() of memory mode, the reference for the other execution modes"""
+    return analysis_results(TimeSeriesAnalyzer(data_path=clean_csv))
+
+
+def analysis_results(analyzer):
+    """Every result an execution mode must reproduce, from a freshly loaded analyzer"""
+    analyzer.load_data()
+    geo = analyzer.geography_index()
+    state_ts, city_ts = analyzer.analyze_by_geography()
+    return {
+        'daily': analyzer.create_daily_aggregations(),
+        'growth': analyzer.calculate_growth_metrics(),
+        'status': analyzer.analyze_by_status()[0],
+        'publication': analyzer.analyze_by_publication(),
+        'states': state_ts,
+        'cities': city_ts,
+        'publication_counts': analyzer._value_counts('publication'),
+        'totals': analyzer._row_totals(),
+        'distinct': {column: analyzer.distinct_count(column, '2024-02-01', '2024-04-01')
+                     for column in ('publication', 'city', 'state', 'route_id')},
+        'zips': geo.zip_counts('041'),
+        'top_cities': geo.top_cities(3, state='ME'),
+    }
+
+
+def assert_same_results(actual, expected):
+    """Compare analysis_results() of two execution modes"""
+    assert actual.keys() == expected.keys()
+    for name, value in expected.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(actual[name], value, check_dtype=False, check_index_type=False,
+                                          check_column_type=False, check_freq=False, obj=name)
+        elif isinstance(value, pd.Series):
+            pd.testing.assert_series_equal(actual[name], value, check_dtype=False, check_index_type=False,
+                                           check_names=False, obj=name)
+        else:
+            assert actual[name] == value, name
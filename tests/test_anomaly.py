@@ -0,0 +1,80 @@
+"""
+Tests for batched segment anomaly detection: the matrix scores equal a
+per-series computation, and injected spikes and drops are flagged
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN import anomaly
+from src.METLN.timeseries import TimeSeriesAnalyzer
+
+from .conftest import cleaned_frame
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(3)
+    return rng.poisson(200, (18, 8)).astype(float)
+
+
+def test_mad_scores_match_per_series_median_and_mad(values):
+    scores, expected = anomaly.robust_scores(values, method='mad')
+    for j in range(values.shape[1]):
+        series = values[:, j]
+        median = np.median(series)
+        mad = np.median(np.abs(series - median)) * anomaly.MAD_SCALE
+        np.testing.assert_allclose(expected[:, j], median)
+        np.testing.assert_allclose(scores[:, j], (series - median) / mad)
+
+
+def test_rolling_expectation_is_the_median_of_the_preceding_window(values):
+    _, expected = anomaly.robust_scores(values, method='rolling', window=4)
+    assert np.isnan(expected[:4]).all()
+    for t in range(4, len(values)):
+        np.testing.assert_allclose(expected[t], np.median(values[t - 4:t], axis=0))
+
+
+def test_flat_series_use_the_fallback_scale_or_are_not_scored():
+    mostly_flat = [10.0] * 9 + [30.0]
+    constant = [10.0] * 10
+    scores, _ = anomaly.robust_scores(np.column_stack([mostly_flat, constant]), method='mad')
+    # MAD is 0 when most points equal the median; the mean absolute deviation scales instead
+    assert scores[-1, 0] == pytest.approx(20 / (2 * anomaly.MEAN_AD_SCALE))
+    assert np.isnan(scores[:, 1]).all()
+    with pytest.raises(ValueError):
+        anomaly.robust_scores(np.ones((3, 1)), method='iqr')
+
+
+def test_injected_spike_and_drop_are_flagged_and_ranked(values):
+    values[10, 2] = 2_000
+    values[14, 5] = 20
+    matrix = pd.DataFrame(values, index=pd.date_range('2024-01-01', periods=len(values), freq='MS'),
+                          columns=pd.Index([f"S{j}" for j in range(values.shape[1])], name='state'))
+    flags = anomaly.detect_segment_anomalies(matrix, threshold=6)
+    assert flags[['state', 'date', 'direction']].values.tolist() == [
+        ['S2', pd.Timestamp('2024-11-01'), 'spike'],
+        ['S5', pd.Timestamp('2025-03-01'), 'drop'],
+    ]
+    assert (flags['score'].abs().diff().dropna() <= 0).all()
+    assert flags.loc[0, 'deviation'] == flags.loc[0, 'count'] - flags.loc[0, 'expected']
+    # Series below min_volume are not reported
+    assert anomaly.detect_segment_anomalies(matrix, threshold=6, min_volume=1_000).empty
+
+
+def test_analyzer_flags_a_spiking_segment(tmp_path):
+    frame = cleaned_frame(rows_per_snapshot=300, snapshots=8)
+    # Twice the usual Portland rows of MTM_PT in May
+    spike = frame[(frame['date_of_extract'] == '2024-05-01') & (frame['Publication'] == 'MTM_PT')
+                  & (frame['City'] == 'Portland')]
+    path = tmp_path / "cleaned_data.csv"
+    pd.concat([frame, spike], ignore_index=True).to_csv(path, index=False)
+
+    analyzer = TimeSeriesAnalyzer(data_path=path)
+    analyzer.load_data()
+    flags = analyzer.detect_segment_anomalies(by=('publication', 'city'), threshold=3.5)
+    top = flags.iloc[0]
+    assert (top['publication'], top['city'], top['date'], top['direction']) == \
+        ('MTM_PT', 'Portland', pd.Timestamp('2024-05-01'), 'spike')
+    assert analyzer._segment_matrix(('publication', 'city')).to_numpy().sum() == len(frame) + len(spike)
+    assert analyzer.detect_segment_anomalies(by=('publication', 'city'), threshold=3.5) is flags
@@ -0,0 +1,74 @@
+"""
+Tests for the columnar cache (utils/columnar.py): loads through the cache
+equal the CSV, and a changed or unreadable cache falls back to the CSV
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from src.METLN.utils import columnar
+
+from .conftest import cleaned_frame
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "cleaned_data.csv"
+    cleaned_frame(rows_per_snapshot=50, snapshots=3).to_csv(path, index=False)
+    return path
+
+
+def refuse_csv(monkeypatch):
+    def read_csv(*args, **kwargs):
+        raise AssertionError("the CSV was parsed")
+
+    monkeypatch.setattr(pd, 'read_csv', read_csv)
+
+
+def test_second_load_reads_the_cache(csv_path, monkeypatch):
+    parsed = columnar.load_frame(csv_path)
+    assert columnar.is_fresh(csv_path)
+    with monkeypatch.context() as m:
+        refuse_csv(m)
+        cached = columnar.load_frame(csv_path)
+        subset = columnar.load_frame(csv_path, columns=['AccoutID', 'City'])
+        mapped = columnar.load_frame(csv_path, zero_copy=True)
+    pd.testing.assert_frame_equal(cached, parsed)
+    assert list(subset.columns) == ['AccoutID', 'City']
+    assert isinstance(mapped['AccoutID'].dtype, pd.ArrowDtype)
+    assert mapped['AccoutID'].tolist() == parsed['AccoutID'].tolist()
+
+
+def test_changed_csv_makes_the_cache_stale(csv_path):
+    columnar.load_frame(csv_path)
+    df = cleaned_frame(rows_per_snapshot=50, snapshots=4)
+    df.to_csv(csv_path, index=False)
+    assert not columnar.is_fresh(csv_path)
+    assert len(columnar.load_frame(csv_path)) == 200
+    assert columnar.is_fresh(csv_path)
+
+    # Same size, new modification time
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert not columnar.is_fresh(csv_path)
+
+
+def test_mixed_type_columns_are_cached_as_text(tmp_path):
+    path = tmp_path / "mixed.csv"
+    df = pd.DataFrame({'Zip': pd.Series([4101, '04101-1234', None], dtype=object), 'n': [1, 2, 3]})
+    df.to_csv(path, index=False)
+    assert columnar.write_cache(df, path) == columnar.cache_path(path)
+    assert columnar.read_cache(path)['Zip'].tolist()[:2] == ['4101', '04101-1234']
+
+
+def test_unusable_cache_falls_back_to_the_csv(csv_path, monkeypatch):
+    parsed = columnar.load_frame(csv_path)
+    columnar.cache_path(csv_path).write_bytes(b"not an arrow file")
+    assert not columnar.is_fresh(csv_path)
+    pd.testing.assert_frame_equal(columnar.load_frame(csv_path), parsed)
+
+    columnar.cache_path(csv_path).unlink()
+    monkeypatch.setattr(columnar, '_pyarrow', lambda: None)
+    pd.testing.assert_frame_equal(columnar.load_frame(csv_path), parsed)
+    assert not columnar.cache_path(csv_path).exists()
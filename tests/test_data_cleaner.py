@@ -0,0 +1,44 @@
+"""
+Tests for column standardization: the in-memory and chunked paths write the
+same clean file, and standardize_columns returns the cleaned frame
+"""
+import pandas as pd
+import pytest
+
+from src.METLN import data_cleaner, planner
+
+from .conftest import cleaned_frame
+
+
+@pytest.fixture
+def processed(data_dirs):
+    """processed_data.csv mixing named-header and numbered-header extracts"""
+    data_cleaner.PROCESSED_DATA_DIR.mkdir()
+    df = cleaned_frame(rows_per_snapshot=100, snapshots=4)
+    numbered = df['date_of_extract'] >= '2024-03-01'
+    named = df[~numbered]
+    renamed = df[numbered].rename(columns={name: num for num, name in data_cleaner.COLUMN_MAPPING.items()})
+    pd.concat([named, renamed], ignore_index=True).to_csv(data_cleaner.PROCESSED_FILE, index=False)
+    return df
+
+
+def standardize(monkeypatch, chunk_rows):
+    monkeypatch.setattr(planner, 'csv_chunk_rows', lambda *args, **kwargs: chunk_rows)
+    rows = data_cleaner.clean_processed_file()
+    return rows, pd.read_csv(data_cleaner.CLEAN_FILE, dtype=str)
+
+
+def test_standardize_columns_returns_the_frame(processed):
+    df_clean = data_cleaner.standardize_columns()
+    assert list(df_clean.columns) == data_cleaner.FINAL_COLUMNS
+    assert len(df_clean) == len(pd.read_csv(data_cleaner.CLEAN_FILE))
+
+
+def test_both_paths_write_the_same_file(processed, monkeypatch):
+    in_memory_rows, in_memory = standardize(monkeypatch, None)
+    chunked_rows, chunked = standardize(monkeypatch, 70)
+
+    assert in_memory_rows == chunked_rows == len(processed)
+    assert list(chunked.columns) == data_cleaner.FINAL_COLUMNS
+    pd.testing.assert_frame_equal(chunked, in_memory)
+    assert chunked['Publication'].notna().all()
@@ -0,0 +1,51 @@
+"""Tests for the shared memoized date parser (utils/dates.py)"""
+import pandas as pd
+import pytest
+
+from src.METLN.utils import dates
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    dates.clear_cache()
+    yield
+    dates.clear_cache()
+
+
+def test_detects_the_column_format():
+    parsed = dates.parse_dates(pd.Series(['01/02/2024', '12/31/2023', None]))
+    assert list(parsed[:2]) == [pd.Timestamp('2024-01-02'), pd.Timestamp('2023-12-31')]
+    assert pd.isna(parsed[2])
+
+
+def test_values_that_strip_to_the_same_text():
+    values = pd.Series(['01/02/2024', ' 01/02/2024', '01/03/2024 '])
+    parsed = dates.parse_dates(values)
+    assert list(parsed) == [pd.Timestamp('2024-01-02')] * 2 + [pd.Timestamp('2024-01-03')]
+    assert dates._parsed['%m/%d/%Y'].index.is_unique
+
+
+def test_cache_stays_usable_after_padded_values():
+    dates.parse_dates(pd.Series(['01/02/2024', ' 01/02/2024']))
+    parsed = dates.parse_dates(pd.Series(['01/05/2024', '01/06/2024', '01/02/2024']))
+    assert list(parsed) == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-01-06'), pd.Timestamp('2024-01-02')]
+
+
+def test_raise_lists_unparseable_values():
+    with pytest.raises(ValueError, match='not a date'):
+        dates.parse_dates(pd.Series(['2024-01-01', 'not a date']), errors='raise')
+
+
+def test_format_is_remembered_per_source_and_column(tmp_path):
+    source = tmp_path / "extract.csv"
+    source.write_text("x\n")
+    dates.parse_dates(pd.Series(['2024-01-31']), source=source, column='d')
+    # Ambiguous on its own, read with the format detected for this file and column
+    parsed = dates.parse_dates(pd.Series(['2024-02-03']), source=source, column='d')
+    assert parsed[0] == pd.Timestamp('2024-02-03')
+    assert dates._formats[(dates._source_key(source), 'd')] == '%Y-%m-%d'
+
+
+def test_datetime_input_is_returned_unchanged():
+    values = pd.Series(pd.to_datetime(['2024-01-01', None]))
+    pd.testing.assert_series_equal(dates.parse_dates(values), values)
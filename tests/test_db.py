@@ -0,0 +1,81 @@
+"""
+Tests for loading cleaned_data.csv into SQL: chunked loads replace or append
+to the table only once every chunk is in
+"""
+import pytest
+
+from src.METLN import planner
+from src.METLN.utils import db
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from sqlalchemy import create_engine
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'mtln.db'}")
+    yield engine
+    engine.dispose()
+
+
+def row_count(engine, table="subscriptions"):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def table_names(engine):
+    from sqlalchemy import inspect
+
+    return set(inspect(engine).get_table_names())
+
+
+def load(clean_csv, engine, if_exists='replace'):
+    return db.load_csv_to_sql(clean_csv, db_uri=str(engine.url), if_exists=if_exists)
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    """Load in chunks of 500 rows (six chunks for clean_csv)"""
+    monkeypatch.setattr(planner, 'csv_chunk_rows', lambda *args, **kwargs: 500)
+
+
+def fail_on_chunk(monkeypatch, n):
+    load_frame = db.load_frame_to_sql
+    calls = []
+
+    def loader(df, **kwargs):
+        calls.append(len(df))
+        if len(calls) == n:
+            raise OSError("simulated failure")
+        return load_frame(df, **kwargs)
+
+    monkeypatch.setattr(db, 'load_frame_to_sql', loader)
+
+
+def test_chunked_loads(clean_csv, engine, chunked):
+    assert load(clean_csv, engine) == 2400
+    assert load(clean_csv, engine) == 2400
+    assert row_count(engine) == 2400
+    assert load(clean_csv, engine, if_exists='append') == 2400
+    assert row_count(engine) == 4800
+    assert table_names(engine) == {"subscriptions"}
+    with pytest.raises(ValueError):
+        load(clean_csv, engine, if_exists='fail')
+
+
+@pytest.mark.parametrize('if_exists', ['replace', 'append'])
+def test_failed_chunked_load_leaves_the_table(clean_csv, engine, chunked, monkeypatch, if_exists):
+    load(clean_csv, engine)
+    fail_on_chunk(monkeypatch, 3)
+    with pytest.raises(OSError):
+        load(clean_csv, engine, if_exists=if_exists)
+    assert row_count(engine) == 2400
+    assert table_names(engine) == {"subscriptions"}
+
+
+def test_failed_first_load_creates_no_table(clean_csv, engine, monkeypatch):
+    fail_on_chunk(monkeypatch, 1)
+    with pytest.raises(OSError):
+        load(clean_csv, engine)
+    assert table_names(engine) == set()
@@ -0,0 +1,52 @@
+"""Tests for etl.py's persistent row-hash dedup index (Dataset/Script/dedup_index.py)"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Dataset" / "Script"))
+
+from dedup_index import RowHashIndex, hash_rows  # noqa: E402
+
+
+def test_equal_rows_hash_equally_across_dtypes():
+    left = pd.DataFrame({'a': [1.0, 2.0], 'b': ['x', 'y']})
+    right = pd.DataFrame({'b': ['x', 'y'], 'a': [1, 2]})
+    assert (hash_rows(left) == hash_rows(right)).all()
+
+
+def test_filter_new_drops_indexed_and_repeated_rows():
+    index = RowHashIndex(None)
+    first, hashes = index.filter_new(pd.DataFrame({'a': [1, 2, 2]}))
+    assert list(first['a']) == [1, 2]
+    index.add(hashes)
+    second, _ = index.filter_new(pd.DataFrame({'a': [2, 3]}))
+    assert list(second['a']) == [3]
+
+
+def test_runs_stay_few_and_searchable():
+    index = RowHashIndex(None)
+    rng = np.random.default_rng(0)
+    added = [rng.integers(0, 2**63, 1_000, dtype=np.uint64) for _ in range(64)]
+    for run in added:
+        index.add(run)
+    assert len(index._runs) <= 7
+    assert index.contains(np.concatenate(added)).all()
+    assert len(index) == 64_000
+
+
+def test_journal_survives_a_crash_before_save(tmp_path):
+    path = str(tmp_path / "dedup.npy")
+    index = RowHashIndex(path)
+    index.add(np.array([5, 1], dtype=np.uint64))
+    index.save()
+    index.add(np.array([9], dtype=np.uint64))
+    index.checkpoint()
+    # No save(): a new process recovers the journaled hash
+    recovered = RowHashIndex(path)
+    assert recovered.contains(np.array([1, 5, 9], dtype=np.uint64)).all()
+    recovered.save()
+    assert not os.path.exists(recovered.log_path)
+    assert list(RowHashIndex(path).hashes) == [1, 5, 9]
@@ -0,0 +1,162 @@
+"""
+Tests for ingest staging: parsed files are staged one by one, appended to
+processed_data.csv as one commit that is rolled back on failure, and reused
+after a failed run
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from src.METLN import etl_pipeline
+
+from .conftest import cleaned_frame, write_raw
+
+FILES = {
+    "sublist1.1.24.xlsx": 0,
+    "sublist2.1.24.xlsx": 1,
+    "sublist3.1.24.xlsx": 2,
+}
+
+
+@pytest.fixture
+def raw_dir(data_dirs):
+    """Three raw workbooks in data_dirs/raw"""
+    raw = data_dirs / "raw"
+    for name, seed in FILES.items():
+        write_raw(raw / name, seed)
+    return raw
+
+
+def processed_rows():
+    return pd.read_csv(etl_pipeline.PROCESSED_FILE)
+
+
+def count_reads(monkeypatch, fail_on=None):
+    """Record which raw files are parsed; optionally fail on one of them"""
+    reads = []
+    read = etl_pipeline.read_raw_file
+
+    def reader(file, workers=None):
+        reads.append(file.name)
+        if file.name == fail_on:
+            raise RuntimeError("simulated read failure")
+        return read(file, workers=workers)
+
+    monkeypatch.setattr(etl_pipeline, 'read_raw_file', reader)
+    return reads
+
+
+def test_all_files_committed_and_staging_cleared(raw_dir):
+    etl_pipeline.combine_data_files()
+    df = processed_rows()
+    assert len(df) == 60
+    assert sorted(df['date_of_extract'].unique()) == ['2024-01-01', '2024-02-01', '2024-03-01']
+    assert not list(etl_pipeline.STAGING_DIR.glob("*"))
+    assert not list(etl_pipeline.PROCESSED_DATA_DIR.glob("*.tmp"))
+
+
+def test_failed_commit_keeps_processed_file_and_staged_files(raw_dir, monkeypatch):
+    etl_pipeline.append_processed(cleaned_frame(rows_per_snapshot=1, snapshots=1).assign(date_of_extract='2023-12-01'))
+    before = etl_pipeline.PROCESSED_FILE.read_bytes()
+
+    read_pickle, loads = pd.read_pickle, []
+
+    def failing_read(path, *args, **kwargs):
+        loads.append(path)
+        # The first two staged frames are appended before the third fails to load
+        if len(loads) == len(FILES):
+            raise OSError("disk full")
+        return read_pickle(path, *args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(pd, 'read_pickle', failing_read)
+        with pytest.raises(OSError):
+            etl_pipeline.combine_data_files()
+    assert etl_pipeline.PROCESSED_FILE.read_bytes() == before
+    assert not list(etl_pipeline.PROCESSED_DATA_DIR.glob("*.tmp"))
+    assert not list(etl_pipeline.PROCESSED_DATA_DIR.glob("*.pending"))
+    assert len(list(etl_pipeline.STAGING_DIR.glob("*.pkl"))) == 3
+
+    reads = count_reads(monkeypatch)
+    etl_pipeline.combine_data_files()
+    assert reads == []
+    assert len(processed_rows()) == 61
+    assert not list(etl_pipeline.STAGING_DIR.glob("*.pkl"))
+
+
+def test_processed_dates_are_skipped(raw_dir, monkeypatch):
+    with monkeypatch.context() as m:
+        count_reads(m, fail_on="sublist3.1.24.xlsx")
+        etl_pipeline.combine_data_files()
+    # The unreadable file is logged and left out; the others are committed
+    assert len(processed_rows()) == 40
+    assert etl_pipeline.load_processed_dates() == {pd.Timestamp(d).date() for d in ('2024-01-01', '2024-02-01')}
+
+    reads = count_reads(monkeypatch)
+    etl_pipeline.combine_data_files()
+    assert reads == ["sublist3.1.24.xlsx"]
+    assert len(processed_rows()) == 60
+
+
+def test_staging_follows_raw_file_changes(raw_dir):
+    path = raw_dir / "sublist3.1.24.xlsx"
+    first = etl_pipeline.stage_file(path)
+    assert etl_pipeline.stage_file(path) == first
+
+    write_raw(path, seed=9, rows=30)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    second = etl_pipeline.stage_file(path)
+    assert second != first and not first.exists()
+    assert len(pd.read_pickle(second)) == 30
+
+
+def test_new_columns_extend_the_header(raw_dir):
+    etl_pipeline.append_processed(pd.DataFrame({'date_of_extract': ['2024-01-01'], 'Publication': ['MTM_PT']}))
+    etl_pipeline.append_processed(pd.DataFrame({'date_of_extract': ['2024-02-01'], 'source_sheet': ['North']}))
+    df = processed_rows()
+    assert list(df.columns) == ['date_of_extract', 'Publication', 'source_sheet']
+    assert df['Publication'].tolist()[:1] == ['MTM_PT'] and df['source_sheet'].tolist()[1:] == ['North']
+
+
+def test_commit_appends_in_place(raw_dir, tmp_path):
+    later = raw_dir / "sublist3.1.24.xlsx"
+    later.rename(tmp_path / later.name)
+    etl_pipeline.combine_data_files()
+    before = etl_pipeline.PROCESSED_FILE.read_bytes()
+    inode = etl_pipeline.PROCESSED_FILE.stat().st_ino
+
+    (tmp_path / later.name).rename(later)
+    etl_pipeline.combine_data_files()
+    # Same columns: the rows are appended to the file rather than to a rewritten copy
+    assert etl_pipeline.PROCESSED_FILE.stat().st_ino == inode
+    assert etl_pipeline.PROCESSED_FILE.read_bytes().startswith(before)
+    assert len(processed_rows()) == 60
+
+
+def test_failed_commit_with_new_columns_keeps_processed_file(raw_dir):
+    etl_pipeline.append_processed(pd.DataFrame({'date_of_extract': ['2024-01-01'], 'Publication': ['MTM_PT']}))
+    before = etl_pipeline.PROCESSED_FILE.read_bytes()
+
+    def frames():
+        yield pd.DataFrame({'date_of_extract': ['2024-02-01'], 'source_sheet': ['North']})
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        etl_pipeline.append_frames(frames())
+    assert etl_pipeline.PROCESSED_FILE.read_bytes() == before
+    assert not list(etl_pipeline.PROCESSED_DATA_DIR.glob("*.tmp*"))
+
+
+def test_interrupted_commit_is_rolled_back(raw_dir):
+    etl_pipeline.append_processed(pd.DataFrame({'date_of_extract': ['2024-01-01'], 'Publication': ['MTM_PT']}))
+    before = etl_pipeline.PROCESSED_FILE.read_bytes()
+    # A crash part way through an append: the recorded size and a torn last row are left behind
+    etl_pipeline.PROCESSED_FILE.with_name("processed_data.csv.pending").write_text(str(len(before)))
+    with open(etl_pipeline.PROCESSED_FILE, 'a') as f:
+        f.write("2024-02-01,SMG")
+
+    assert etl_pipeline.load_processed_dates() == {pd.Timestamp('2024-01-01').date()}
+    assert etl_pipeline.PROCESSED_FILE.read_bytes() == before
+    assert not etl_pipeline.recover_processed()
@@ -0,0 +1,107 @@
+"""
+Tests for etl.py (Dataset/Script): streaming writes the same rows as the
+combined run, and checkpointed chunks let a failed run resume without
+duplicates
+"""
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Dataset" / "Script"))
+
+import etl  # noqa: E402
+
+from .conftest import write_raw  # noqa: E402
+
+BATCH = 7
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """Three raw workbooks of 20 rows; etl_output.csv is written to tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    for seed in range(3):
+        write_raw(tmp_path / f"sublist{seed + 1}.1.24.xlsx", seed)
+    return etl.list_sources(str(tmp_path), "sublist*.xlsx")
+
+
+def combined_run(sources, db_uri=None, resume=False):
+    df = etl.clean_df(pd.concat([etl.read_file(f) for f in sources], ignore_index=True))
+    return etl.write_target(df, db_uri, "subscriptions", False, batch_size=BATCH, resume=resume,
+                            fingerprint=etl.source_fingerprint(sources, BATCH))
+
+
+def stream_run(sources, db_uri=None, workers=1, resume=False):
+    return etl.stream_etl(sources, db_uri, "subscriptions", False, workers, batch_size=BATCH, resume=resume)
+
+
+def output_rows():
+    return pd.read_csv("etl_output.csv")
+
+
+def fail_on_chunk(monkeypatch, n):
+    """Make the n-th chunk write of the next run fail"""
+    write_chunk = etl.TargetWriter._write_chunk
+    calls = []
+
+    def writer(self, *args):
+        calls.append(args)
+        if len(calls) == n:
+            raise OSError("simulated failure")
+        return write_chunk(self, *args)
+
+    monkeypatch.setattr(etl.TargetWriter, '_write_chunk', writer)
+    return monkeypatch
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_stream_writes_the_combined_rows_in_file_order(sources, workers):
+    # Two rows repeat across files: the combined run drops them, streaming
+    # only drops duplicates within a file
+    combined_run(sources)
+    combined = output_rows()
+    assert len(combined) == 58
+    assert stream_run(sources, workers=workers) == 60
+    streamed = output_rows()
+    pd.testing.assert_frame_equal(streamed.drop_duplicates().reset_index(drop=True), combined)
+    assert [os.path.basename(f) for f, _ in etl.iter_sources(sources, workers)] == \
+        ["sublist1.1.24.xlsx", "sublist2.1.24.xlsx", "sublist3.1.24.xlsx"]
+
+
+@pytest.mark.parametrize('run', [combined_run, stream_run])
+def test_csv_resume_skips_committed_chunks(sources, monkeypatch, run):
+    run(sources)
+    expected = output_rows()
+
+    with monkeypatch.context() as m:
+        fail_on_chunk(m, 5)
+        with pytest.raises(OSError):
+            run(sources, resume=True)
+    # A torn write after the last checkpoint is cut off on resume
+    with open("etl_output.csv", "a") as fh:
+        fh.write("2024-03-01,partial")
+    run(sources, resume=True)
+    pd.testing.assert_frame_equal(output_rows(), expected)
+
+
+def test_db_resume_commits_each_chunk_once(sources, tmp_path, monkeypatch):
+    from sqlalchemy import create_engine, text
+
+    db_uri = f"sqlite:///{tmp_path / 'etl.db'}"
+    with monkeypatch.context() as m:
+        fail_on_chunk(m, 6)
+        with pytest.raises(OSError):
+            stream_run(sources, db_uri=db_uri, resume=True)
+    # Chunks of 7, 7 and 6 rows per file: the first file and two chunks of the second were committed
+    assert stream_run(sources, db_uri=db_uri, resume=True) == 60 - 20 - 2 * BATCH
+
+    engine = create_engine(db_uri)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM subscriptions")).scalar() == 60
+        # Three chunks per 20-row file, each recorded once with the rows it committed
+        assert conn.execute(text(f"SELECT SUM(row_count), COUNT(*), COUNT(DISTINCT source || chunk) "
+                                 f"FROM {etl.CHECKPOINT_TABLE}")).one() == (60, 9, 9)
+    engine.dispose()
@@ -0,0 +1,119 @@
+"""
+Tests for the XML repair reader: it reads what openpyxl reads, keeps working
+when the workbook part is missing, and merges multi-sheet workbooks
+"""
+import sys
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from src.METLN import excel_repair
+
+# The benchmark generator writes shared-string workbooks (openpyxl writes inline strings)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+import synthetic_data  # noqa: E402
+
+
+def write_workbook(path, sheets):
+    """Write {sheet name: rows (header first)} with openpyxl"""
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+    return path
+
+
+def drop_workbook_part(path):
+    """Copy of a workbook without xl/workbook.xml, which openpyxl cannot open"""
+    broken = path.with_name("broken_" + path.name)
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(broken, 'w') as dst:
+        for item in src.infolist():
+            if item.filename != 'xl/workbook.xml':
+                dst.writestr(item, src.read(item.filename))
+    return broken
+
+
+ROWS = [
+    ['Publication', 'AccoutID', 'City', 'Zip', 'LastStartDate', 'Note'],
+    ['MTM_PT', 101, 'Portland', 4101, datetime(2020, 1, 15), 'x'],
+    ['SMG_SJ', 102, 'Lewiston', 4240, datetime(2021, 6, 1, 12, 30), None],
+    ['MTM_PT', 103, None, 4101, datetime(2019, 3, 1), 7],
+    ['MTM_KJ', 104, 'Portland', None, None, 'y'],
+]
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    return write_workbook(tmp_path / "sublist1.1.24.xlsx", {'Sheet1': ROWS})
+
+
+def test_matches_openpyxl(workbook):
+    expected = pd.read_excel(workbook, engine='openpyxl')
+    df = excel_repair.extract_data_from_corrupted_xlsx(workbook)
+
+    assert list(df.columns) == list(expected.columns)
+    for col in expected.columns:
+        assert df[col].astype(object).where(df[col].notna(), None).tolist() == \
+            expected[col].astype(object).where(expected[col].notna(), None).tolist(), col
+
+
+def test_column_types(workbook):
+    df = excel_repair.extract_data_from_corrupted_xlsx(workbook)
+    assert df['AccoutID'].dtype == np.int64
+    assert df['Zip'].dtype == np.float64
+    assert df['LastStartDate'].dtype.kind == 'M'
+    assert df['LastStartDate'].iloc[1] == pd.Timestamp('2021-06-01 12:30')
+    # Mixed text and numbers stay objects
+    assert df['Note'].tolist()[:1] == ['x'] and df['Note'].iloc[2] == 7
+
+
+def test_missing_workbook_part(workbook):
+    broken = drop_workbook_part(workbook)
+    with pytest.raises(Exception):
+        pd.read_excel(broken, engine='openpyxl')
+    pd.testing.assert_frame_equal(excel_repair.extract_data_from_corrupted_xlsx(broken),
+                                  excel_repair.extract_data_from_corrupted_xlsx(workbook))
+
+
+def test_multi_sheet_workbook(tmp_path):
+    path = write_workbook(tmp_path / "sublist2.1.24.xlsx", {
+        'North': ROWS[:3],
+        'Empty': [],
+        'South': [ROWS[0]] + ROWS[3:],
+    })
+    df = excel_repair.extract_data_from_corrupted_xlsx(path, workers=1)
+
+    assert df[excel_repair.SHEET_COLUMN].tolist() == ['North', 'North', 'South', 'South']
+    assert df['AccoutID'].tolist() == [101, 102, 103, 104]
+    assert [name for name, _ in excel_repair.workbook_sheets(path)] == ['North', 'Empty', 'South']
+
+
+def test_fallback_orders_worksheet_parts_numerically(tmp_path):
+    sheets = {f"S{i}": [['a'], [i]] for i in range(1, 12)}
+    broken = drop_workbook_part(write_workbook(tmp_path / "many.xlsx", sheets))
+    paths = [path for _, path in excel_repair.workbook_sheets(broken)]
+    assert paths == [f"xl/worksheets/sheet{i}.xml" for i in range(1, 12)]
+
+
+def test_shared_strings_become_categoricals(tmp_path):
+    vocab = synthetic_data.Vocabulary()
+    columns = synthetic_data.snapshot_frame(vocab, 500, 0)
+    path = tmp_path / "sublist2.1.24.xlsx"
+    synthetic_data.write_workbook(path, vocab, columns, 500, variant='corrupted')
+    df = excel_repair.extract_data_from_corrupted_xlsx(path)
+
+    assert len(df) == 500 and list(df.columns) == synthetic_data.COLUMNS
+    # Categories are limited to the strings each column uses
+    assert isinstance(df['State'].dtype, pd.CategoricalDtype)
+    assert set(df['State'].cat.categories) == set(df['State'].astype(str))
+    assert not set(df['State'].cat.categories) & set(vocab.cities)
+    assert df['City'].astype(str).tolist() == vocab.cities[columns['City'] - vocab.offset('city')].tolist()
+    assert df['AccoutID'].tolist() == columns['AccoutID'].tolist()
@@ -0,0 +1,90 @@
+"""
+Tests for batched segment forecasting: the vectorized models equal a
+per-series recursion, and the backtest and date handling behave at the edges
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN import forecast
+from src.METLN.timeseries import TimeSeriesAnalyzer
+
+
+def holt_reference(series, alpha, beta, horizon):
+    """Holt's method for one series, written as the textbook recursion"""
+    level, slope = series[0], series[1] - series[0]
+    for value in series[1:]:
+        previous = level
+        level = alpha * value + (1 - alpha) * (level + slope)
+        slope = beta * (level - previous) + (1 - beta) * slope
+    return np.maximum([level + h * slope for h in range(1, horizon + 1)], 0)
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    t = np.arange(24)[:, None]
+    return 500 + t * rng.uniform(-8, 8, 12) + rng.normal(0, 15, (24, 12))
+
+
+def test_exact_trends_are_continued():
+    line = np.arange(10, dtype=float)[:, None] * [3.0, -2.0] + [5.0, 40.0]
+    for method in ('linear', 'holt'):
+        predicted, _ = forecast.forecast_values(line, horizon=3, method=method)
+        np.testing.assert_allclose(predicted, np.arange(10, 13)[:, None] * [3.0, -2.0] + [5.0, 40.0], atol=1e-9)
+    flat, params = forecast.forecast_values(np.full((6, 2), 7.0), horizon=2, method='ses')
+    np.testing.assert_allclose(flat, 7.0)
+    assert set(params) == {'alpha'}
+
+
+def test_batched_holt_matches_per_series_recursion(series):
+    predicted, params = forecast.forecast_values(series, horizon=4, method='holt')
+    for j in range(series.shape[1]):
+        expected = holt_reference(series[:, j], params['alpha'][j], params['beta'][j], 4)
+        np.testing.assert_allclose(predicted[:, j], expected, rtol=1e-10)
+        # Each series is fitted on its own: the batch gives the same answer as a single column
+        alone, _ = forecast.forecast_values(series[:, [j]], horizon=4, method='holt')
+        np.testing.assert_allclose(alone[:, 0], predicted[:, j])
+
+
+def test_forecasts_are_clipped_and_methods_checked():
+    falling = np.array([[50.0], [30.0], [10.0]])
+    predicted, _ = forecast.forecast_values(falling, horizon=3, method='linear')
+    assert predicted.min() == 0
+    with pytest.raises(ValueError):
+        forecast.forecast_values(falling, method='arima')
+    with pytest.raises(ValueError):
+        forecast.forecast_values(np.empty((0, 2)))
+
+
+def test_backtest(series):
+    line = np.arange(12, dtype=float)[:, None] * 4 + 100
+    metrics = forecast.backtest(line, holdout=3, method='linear')
+    assert metrics['mae'][0] == pytest.approx(0)
+    assert metrics['skill'][0] == pytest.approx(1)
+
+    short = forecast.backtest(series[:5], holdout=3)
+    assert all(np.isnan(values).all() for values in short.values())
+    scored = forecast.backtest(series, holdout=3)
+    assert np.isfinite(scored['mape']).all() and (scored['rmse'] >= scored['mae']).all()
+
+
+def test_future_dates():
+    monthly = pd.date_range('2024-01-01', periods=6, freq='MS')
+    assert forecast.future_dates(monthly, 2).tolist() == [pd.Timestamp('2024-07-01'), pd.Timestamp('2024-08-01')]
+    irregular = pd.DatetimeIndex(['2024-01-01', '2024-01-31', '2024-03-02', '2024-04-05'])
+    # Gaps of 30, 31 and 34 days: the median gap is used
+    assert forecast.future_dates(irregular, 1).tolist() == [pd.Timestamp('2024-05-06')]
+
+
+def test_segment_forecast(clean_csv):
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv)
+    analyzer.load_data()
+    forecasts, metrics = analyzer.forecast_segments(by=('publication',), horizon=2, holdout=2)
+    assert forecasts.shape == (2, 3) and list(forecasts.columns) == list(metrics.index)
+    assert forecasts.index[0] == pd.Timestamp('2024-07-01')
+    assert {'mae', 'rmse', 'mape', 'naive_mae', 'skill', 'alpha', 'beta'} <= set(metrics.columns)
+
+    # Series below the volume threshold are left out
+    forecasts, metrics = analyzer.forecast_segments(by=('publication',), min_volume=10_000)
+    assert forecasts.empty and metrics.empty
@@ -0,0 +1,93 @@
+"""
+Tests for the geography index: every level and query matches a groupby over
+the rows, and merged or pre-grouped builds equal a build over all rows
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN.geo_index import GeoIndex, normalize_zips
+
+from .conftest import cleaned_frame
+
+
+@pytest.fixture(scope='module')
+def rows():
+    df = cleaned_frame(rows_per_snapshot=300, snapshots=4, seed=3)
+    df = df.rename(columns=str.lower)[['date_of_extract', 'state', 'city', 'zip']]
+    df['date_of_extract'] = pd.to_datetime(df['date_of_extract'])
+    df = df.astype({'state': object, 'city': object, 'zip': object})
+    # Missing and malformed keys are dropped per level, zips in every stored form
+    df.loc[::17, 'state'] = None
+    df.loc[::23, 'city'] = None
+    forms = [lambda z: z, lambda z: 'n/a', lambda z: f"{z}.0", lambda z: f"0{z}-1234", lambda z: str(z)]
+    df['zip'] = [forms[i % len(forms)](z) for i, z in enumerate(df['zip'])]
+    return df
+
+
+@pytest.fixture(scope='module')
+def index(rows):
+    return GeoIndex.build(rows)
+
+
+def expected_counts(df, keys, date=None):
+    if date is not None:
+        df = df[df['date_of_extract'] == pd.Timestamp(date)]
+    return df.dropna(subset=keys).groupby(keys).size()
+
+
+def test_normalize_zips():
+    assert normalize_zips([4101, 4101.0, '04101-1234', ' 4101 ', 'abc', None, 12]).tolist() == \
+        ['04101', '04101', '04101', '04101', None, None, None]
+
+
+def test_levels_match_groupby(rows, index):
+    zip5 = rows.assign(zip5=normalize_zips(rows['zip']))
+    # Label dtypes follow the input (object here, str from groupby), so only values are compared
+    same = dict(check_names=False, check_index_type=False)
+    pd.testing.assert_series_equal(index.state_counts(), expected_counts(rows, ['state']), **same)
+    date = '2024-02-01'
+    pd.testing.assert_series_equal(index.state_counts(date), expected_counts(rows, ['state'], date), **same)
+    assert index.city_counts('ME').to_dict() == expected_counts(rows[rows['state'] == 'ME'], ['city']).to_dict()
+    assert index.zip_counts().to_dict() == expected_counts(zip5, ['zip5']).to_dict()
+    assert index.city_zip_counts('ME', 'Portland').to_dict() == \
+        expected_counts(zip5[(zip5['state'] == 'ME') & (zip5['city'] == 'Portland')], ['zip5']).to_dict()
+    assert index.dates.tolist() == sorted(rows['date_of_extract'].unique())
+
+
+def test_queries(rows, index):
+    by_name = rows['city'].value_counts()
+    pd.testing.assert_series_equal(index.top_cities(3), by_name.head(3), check_names=False, check_index_type=False)
+    me = rows[rows['state'] == 'ME']['city'].value_counts()
+    assert index.top_cities(2, state='ME').tolist() == me.head(2).tolist()
+    assert index.top_cities(5, state='ZZ').empty
+
+    zips = index.zip_counts('041')
+    assert len(zips) and all(z.startswith('041') for z in zips.index)
+    assert zips.sum() == index.zip3_counts('041').sum()
+    assert index.zip_counts('999').empty
+    assert index.state_counts('1999-01-01').sum() == 0
+
+    series = index.city_series(['Portland', 'Nowhere'])
+    assert series['Nowhere'].sum() == 0
+    assert series['Portland'].sum() == by_name['Portland']
+
+
+def test_merge_and_grouped_build_equal_full_build(rows, index):
+    half = len(rows) // 2
+    merged = GeoIndex.merge([GeoIndex.build(rows.iloc[:half]), GeoIndex.build(rows.iloc[half:])])
+    leaves = rows.assign(zip=normalize_zips(rows['zip'])).groupby(
+        ['date_of_extract', 'state', 'city', 'zip'], dropna=False).size().rename('n').reset_index()
+    grouped = GeoIndex.build(leaves, count='n')
+
+    for other in (merged, grouped):
+        for level in ('states', 'cities', 'city_names', 'zips', 'zip3', 'zip5'):
+            pd.testing.assert_frame_equal(getattr(other, level), getattr(index, level),
+                                          check_freq=False, check_index_type=False)
+        pd.testing.assert_series_equal(other.top_cities(4), index.top_cities(4), check_index_type=False)
+
+
+def test_empty_zip_column(rows):
+    geo = GeoIndex.build(rows.drop(columns='zip'))
+    assert geo.zip_counts().empty
+    assert np.array_equal(geo.state_counts().to_numpy(), GeoIndex.build(rows).state_counts().to_numpy())
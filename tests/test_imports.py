@@ -0,0 +1,55 @@
+"""
+Tests for import hygiene: each METLN module imports only the heavy
+dependencies its import budget allows and changes no global state
+(benchmarks/import_budget.py times the same imports)
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+import import_budget  # noqa: E402
+
+
+def run_probe(code, tmp_path):
+    """Run code in a fresh interpreter with METLN importable; returns its last line as JSON"""
+    env = dict(os.environ, PYTHONPATH=str(import_budget.SRC_DIR), METLN_TRACE='')
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, cwd=tmp_path)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('label, module, budget, allowed', import_budget.IMPORT_CHECKS,
+                         ids=[check[0] for check in import_budget.IMPORT_CHECKS])
+def test_heavy_dependencies_are_deferred(tmp_path, label, module, budget, allowed):
+    heavy = run_probe(
+        f"import {module}, sys, json; "
+        f"print(json.dumps([m for m in {import_budget.HEAVY_MODULES!r} if m in sys.modules]))",
+        tmp_path,
+    )
+    if 'pandas' in allowed:
+        allowed = allowed + import_budget.PANDAS_IMPORTS
+    assert set(heavy) <= set(allowed)
+
+
+def test_imports_leave_logging_warnings_and_files_alone(tmp_path):
+    state = run_probe(
+        "import json, logging, sys, warnings\n"
+        "import numpy, pandas\n"
+        "filters = list(warnings.filters)\n"
+        "import METLN.timeseries, METLN.watcher, METLN.service\n"
+        "import METLN.utils.db as db\n"
+        "lazy = 'sqlalchemy' not in sys.modules and db._Base is None\n"
+        "db.Base\n"
+        "print(json.dumps({'handlers': len(logging.getLogger().handlers),\n"
+        "                  'filters': len([f for f in warnings.filters if f not in filters]),\n"
+        "                  'lazy_base': lazy, 'base': db._Base is not None}))",
+        tmp_path,
+    )
+    assert state == {'handlers': 0, 'filters': 0, 'lazy_base': True, 'base': True}
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,45 @@
+"""
+Tests for stage instrumentation: peak memory is reported per stage as the
+increase over the process peak at stage entry
+"""
+import numpy as np
+import pytest
+
+from src.METLN.utils import instrument
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    previous = instrument.disable_tracing()
+    yield instrument.enable_tracing(trace_dir=tmp_path)
+    instrument.disable_tracing()
+    if previous is not None:
+        instrument._tracer = previous
+
+
+def allocate(mb):
+    data = np.ones(mb * 1024 * 1024 // 8)
+    return int(data.sum() > 0)
+
+
+def test_peak_increase_is_relative_to_stage_entry(tracer):
+    peak = instrument._peak_rss_mb()
+    if peak is None:
+        pytest.skip("peak RSS is not available on this platform")
+    # Larger than the peak so far, so the stage must raise it
+    instrument.traced('big')(allocate)(int(peak) + 100)
+    instrument.traced('small')(allocate)(1)
+    big, small = tracer.records
+
+    assert big['peak_rss_increase_mb'] > 50
+    # The process peak still includes the earlier stage, the increase does not
+    assert small['peak_rss_mb'] >= big['peak_rss_mb']
+    assert small['peak_rss_increase_mb'] < 50
+
+
+def test_records_are_written(tracer, tmp_path):
+    instrument.traced('stage')(allocate)(1)
+    path = instrument.write_trace(tmp_path / "trace.json")
+    assert path.exists()
+    assert tracer.records[0]['rows'] == 1
+    assert set(tracer.records[0]) >= {'wall_s', 'cpu_s', 'peak_rss_mb', 'peak_rss_increase_mb'}
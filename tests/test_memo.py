@@ -0,0 +1,67 @@
+"""Tests for the dependency-tracked memoization (utils/memo.py)"""
+from src.METLN.utils.memo import MemoCache, memoized
+
+
+class Owner:
+    def __init__(self):
+        self._memo = MemoCache()
+        self.value = 1
+        self.factor = 10
+        self.calls = 0
+
+    @memoized('value')
+    def base(self):
+        self.calls += 1
+        return self.value
+
+    @memoized('factor')
+    def derived(self):
+        # Declares only 'factor' but is built from base(), which needs 'value'
+        return self.base() * self.factor
+
+    @memoized()
+    def scaled(self, times):
+        return self.value * times
+
+
+def test_result_is_cached_until_its_dependency_changes():
+    owner = Owner()
+    assert owner.base() == 1
+    assert owner.base() == 1
+    assert owner.calls == 1
+    owner.value = 2
+    owner._memo.bump('value')
+    assert owner.base() == 2
+    assert owner.calls == 2
+
+
+def test_arguments_are_part_of_the_key():
+    owner = Owner()
+    assert owner.scaled(2) == 2
+    assert owner.scaled(3) == 3
+    assert owner._memo.stats()['misses'] == 2
+
+
+def test_dependencies_of_used_results_are_inherited():
+    owner = Owner()
+    assert owner.derived() == 10
+    owner.value = 5
+    owner._memo.bump('value')
+    assert owner.derived() == 50
+
+
+def test_inherited_dependencies_on_a_cache_hit():
+    owner = Owner()
+    owner.base()  # cached first, so derived() sees it as a hit
+    assert owner.derived() == 10
+    owner.value = 3
+    owner._memo.bump('value')
+    assert owner.derived() == 30
+
+
+def test_stats_count_hits_and_misses():
+    owner = Owner()
+    owner.base()
+    owner.base()
+    stats = owner._memo.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
@@ -0,0 +1,59 @@
+"""
+Tests for label normalization: rules, aliases and the distinct-value mapping
+back to rows
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN import normalize
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('PORTLAND', 'Portland'),
+    ('  south   portland ', 'South Portland'),
+    ('ST. GEORGE', 'St George'),
+    ('St. Agatha', 'St Agatha'),
+    ('E MILLINOCKET', 'E Millinocket'),
+    ('Ft Kent', 'Ft Kent'),
+    ('DOVER-FOXCROFT', 'Dover-Foxcroft'),
+    ('dover-foxcroft', 'Dover-Foxcroft'),
+    ('Wilkes-Barre', 'Wilkes-Barre'),
+    ('McAdam', 'McAdam'),
+    ('DeWitt', 'DeWitt'),
+])
+def test_city_rules(raw, expected):
+    assert normalize.canonical_forms([raw], 'City', aliases={})[0] == expected
+
+
+def test_shipped_aliases():
+    aliases = normalize.load_aliases()
+    forms = normalize.canonical_forms(['S. PORTLAND', 'so portland', 'St. George', 'E Millinocket'], 'City', aliases)
+    assert list(forms) == ['South Portland', 'South Portland', 'St George', 'E Millinocket']
+    assert list(normalize.canonical_forms(['Maine', 'M.E.', ' me'], 'State', aliases)) == ['ME', 'ME', 'ME']
+
+
+def test_alias_file(tmp_path):
+    path = tmp_path / "aliases.csv"
+    path.write_text("# comment\ncolumn,alias,canonical\nCity,So Portland,South Portland\nState,Maine,ME\n")
+    aliases = normalize.load_aliases(path)
+    assert normalize.canonical_forms(['SO PORTLAND'], 'City', aliases)[0] == 'South Portland'
+    assert normalize.canonical_forms(['maine', 'm.e.'], 'State', aliases).tolist() == ['ME', 'ME']
+    assert normalize.load_aliases(tmp_path / "missing.csv") == {}
+
+
+def test_frame_matches_row_by_row():
+    cities = pd.Series(['PORTLAND', 'portland', None, 'S Portland', 'DOVER-FOXCROFT', 'Portland', np.nan] * 50,
+                       dtype='str')
+    df = pd.DataFrame({'City': cities, 'State': ['me', 'ME', 'M.E.', None, 'me', 'ME', 'ME'] * 50,
+                       'Zip': np.arange(350)})
+    out = normalize.normalize_frame(df, aliases={})
+
+    expected = [normalize.canonical_forms([v], 'City', {})[0] if isinstance(v, str) else None for v in cities]
+    assert out['City'].fillna('<blank>').tolist() == [v or '<blank>' for v in expected]
+    assert out['City'].isna().sum() == 100
+    assert out['City'].dtype == cities.dtype
+    assert set(out['State'].dropna()) == {'ME'}
+    pd.testing.assert_series_equal(out['Zip'], df['Zip'])
+    # The input frame is left alone
+    assert df['City'].iloc[0] == 'PORTLAND'
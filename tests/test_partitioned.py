@@ -0,0 +1,59 @@
+"""
+Tests for partitioned execution: the merged partial aggregates give the same
+results as memory mode, from the CSV and from the columnar cache
+"""
+import pytest
+
+from src.METLN import partitioned, planner
+from src.METLN.timeseries import ANALYSIS_COLUMNS, TimeSeriesAnalyzer
+from src.METLN.utils import columnar
+
+from .conftest import analysis_results, assert_same_results
+
+
+@pytest.mark.parametrize('source', ['csv', 'arrow'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_matches_memory_mode(clean_csv, memory_results, monkeypatch, source, workers):
+    # Slices much smaller than the data, so partials of one extract date are merged
+    monkeypatch.setattr(planner, 'analysis_plan', lambda path: {'workers': workers, 'rows_per_task': 350})
+    if source == 'csv':
+        columnar.cache_path(clean_csv).unlink(missing_ok=True)
+    assert columnar.is_fresh(clean_csv) == (source == 'arrow')
+
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, execution='partitioned')
+    assert_same_results(analysis_results(analyzer), memory_results)
+    assert analyzer.df is None
+
+
+def test_row_level_analyses_are_refused(clean_csv):
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, execution='partitioned', workers=1)
+    analyzer.load_data()
+    with pytest.raises(RuntimeError):
+        analyzer.analyze_new_vs_existing()
+
+
+def test_partials_are_merged_as_they_arrive(clean_csv, monkeypatch):
+    merged = []
+    fold = partitioned._fold
+
+    def counting_fold(running, partial):
+        merged.append(partial['rows'])
+        return fold(running, partial)
+
+    monkeypatch.setattr(partitioned, '_fold', counting_fold)
+    columns = {**ANALYSIS_COLUMNS, partitioned.DATE_COLUMN: partitioned.DATE_COLUMN}
+    partials = partitioned._map_csv(clean_csv, columns, 1, 500)
+    # A generator: nothing is read until the merge asks for the next partial
+    assert not hasattr(partials, '__len__')
+    aggregates = partitioned.merge_partials(partials)
+    assert merged == [500] * 3 + [400]
+    assert aggregates.rows == 2400
+    assert aggregates.distinct_count('accoutid') == 500
+
+
+def test_account_ranges_are_refused(clean_csv):
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, execution='partitioned', workers=1)
+    analyzer.load_data()
+    assert analyzer.distinct_count('city', '2024-02-01', '2024-03-01') == 6
+    with pytest.raises(ValueError):
+        analyzer.distinct_count('accoutid', '2024-02-01', '2024-03-01')
@@ -0,0 +1,98 @@
+"""
+Tests for the memory planner: the budget follows env / config / available
+memory, the pre-scans estimate input sizes, and stages stream or split work
+only when their input does not fit
+"""
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+
+from src.METLN import planner
+
+from .conftest import cleaned_frame
+
+MB = 2**20
+
+
+def test_budget_sources(monkeypatch):
+    monkeypatch.setattr(planner, 'available_memory', lambda: 4_000 * MB)
+    monkeypatch.delenv(planner.BUDGET_ENV, raising=False)
+    assert planner.memory_budget({}) == 2_400 * MB
+    assert planner.memory_budget({'memory': {'budget_mb': 'auto', 'auto_fraction': 0.25}}) == 1_000 * MB
+    assert planner.memory_budget({'memory': {'budget_mb': 1500}}) == 1_500 * MB
+    assert planner.memory_budget({'memory': {'budget_mb': 10}}) == planner.MIN_BUDGET_MB * MB
+    monkeypatch.setenv(planner.BUDGET_ENV, "800")
+    assert planner.memory_budget({'memory': {'budget_mb': 1500}}) == 800 * MB
+
+
+def write_workbook(path, rows):
+    with pd.ExcelWriter(path) as writer:
+        for i, n in enumerate(rows):
+            cleaned_frame(rows_per_snapshot=n, snapshots=1).to_excel(writer, sheet_name=f"S{i}", index=False)
+
+
+def strip_dimensions(path):
+    """Rewrite a workbook without the <dimension> element of its sheets"""
+    with zipfile.ZipFile(path) as src:
+        parts = {info.filename: src.read(info) for info in src.infolist()}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as dst:
+        for name, data in parts.items():
+            if name.startswith('xl/worksheets/'):
+                data = re.sub(rb'<dimension[^>]*/>', b'', data)
+            dst.writestr(name, data)
+
+
+def test_workbook_scan(tmp_path):
+    path = tmp_path / "sublist1.1.24.xlsx"
+    write_workbook(path, [300, 120])
+    sheets = planner.scan_workbook(path)
+    assert [(s['sheet'], s['rows'], s['columns']) for s in sheets] == [('S0', 300, 16), ('S1', 120, 16)]
+
+    strip_dimensions(path)
+    estimated = planner.scan_workbook(path)
+    assert [s['sheet'] for s in estimated] == ['S0', 'S1']
+    assert estimated[0]['rows'] > estimated[1]['rows'] > 0
+
+
+def test_csv_scan(clean_csv, tmp_path):
+    scan = planner.scan_csv(clean_csv)
+    assert scan['rows'] == pytest.approx(2400, rel=0.05)
+    assert scan['columns'] == 16
+    assert planner.scan_csv(tmp_path / "missing.csv")['rows'] == 0
+
+
+def test_csv_is_streamed_only_when_it_does_not_fit(clean_csv, monkeypatch):
+    monkeypatch.setattr(planner, 'MIN_CHUNK_ROWS', 100)
+    parsed = planner.scan_csv(clean_csv)['bytes_per_row'] * planner.CSV_PARSE_FACTOR
+    assert planner.csv_chunk_rows(clean_csv, budget=100 * MB, config={}) is None
+    chunk = planner.csv_chunk_rows(clean_csv, budget=400_000, config={})
+    assert chunk == int(200_000 / parsed)
+    assert 100 <= chunk < 2400
+    assert planner.csv_chunk_rows(clean_csv, budget=400_000, config={'cleaning': {'chunk_rows': 0}}) is None
+    assert planner.csv_chunk_rows(clean_csv, budget=100 * MB, config={'database': {'chunk_rows': 500}},
+                                  section='database') == 500
+
+
+def test_analysis_plan(clean_csv, monkeypatch):
+    monkeypatch.setattr(planner, '_cpus', lambda: 4)
+    assert planner.analysis_plan(clean_csv, budget=100 * MB, config={})['execution'] == 'memory'
+
+    assert planner.analysis_plan(clean_csv, budget=2 * MB, config={}) == \
+        {'execution': 'partitioned', 'workers': 1, 'rows_per_task': planner.MIN_CHUNK_ROWS}
+    # Minimum-size tasks of 3 MB each: two of the four CPUs fit in the budget
+    assert planner.analysis_plan(clean_csv, budget=7 * MB, config={})['workers'] == 2
+    assert planner.analysis_plan(clean_csv, budget=100 * MB,
+                                 config={'analysis': {'execution': 'sql'}})['execution'] == 'sql'
+
+
+def test_ingest_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(planner, '_cpus', lambda: 8)
+    path = tmp_path / "sublist1.1.24.xlsx"
+    write_workbook(path, [200, 200, 200])
+    cells = 200 * 16 * planner.EXCEL_CELL_BYTES
+    assert planner.ingest_workers(path, budget=100 * MB, config={}) == 3
+    assert planner.ingest_workers(path, budget=2 * cells, config={}) == 2
+    assert planner.ingest_workers(path, budget=1, config={}) == 1
+    assert planner.ingest_workers(path, budget=1, config={'ingest': {'workers': 4}}) == 4
@@ -0,0 +1,110 @@
+"""Tests for the account presence bitmaps (presence.py)"""
+import pandas as pd
+import pytest
+
+from src.METLN.presence import PresenceIndex
+from src.METLN.timeseries import TimeSeriesAnalyzer
+
+from .conftest import cleaned_frame
+
+
+def _rows(statuses=('A', 'A', 'V', 'A')):
+    return pd.DataFrame({
+        'date_of_extract': pd.to_datetime(['2024-01-01', '2024-01-01', '2024-02-01', '2024-02-01']),
+        'accoutid': [1, 2, 1, 3],
+        'publication': ['PPH', 'PPH', 'PPH', 'KJ'],
+        'status': list(statuses),
+    })
+
+
+def _sync(directory, df):
+    """Sync a freshly loaded index with df; returns the index and the dates whose rows were read"""
+    reads = []
+
+    def load_rows(dates):
+        reads.extend(dates.strftime('%Y-%m-%d'))
+        return df[df['date_of_extract'].isin(dates)]
+
+    index = PresenceIndex(directory).load()
+    index.sync(df.groupby('date_of_extract')['accoutid'].count(), load_rows)
+    return index, reads
+
+
+def test_bitmap_queries_match_the_rows():
+    index = PresenceIndex()
+    index.update(_rows())
+    assert sorted(index.accounts_in('2024-01-01').account_ids()) == [1, 2]
+    assert sorted(index.accounts_in('2024-02-01', 'PPH', status='V').account_ids()) == [1]
+    retained = index.accounts_in('2024-01-01') & index.accounts_in('2024-02-01')
+    assert sorted(retained.account_ids()) == [1]
+    churned = index.accounts_in('2024-01-01') - index.accounts_in('2024-02-01')
+    assert sorted(churned.account_ids()) == [2]
+
+
+def test_stored_index_is_used_without_reading_rows(tmp_path):
+    PresenceIndex(tmp_path).update(_rows())
+    index, reads = _sync(tmp_path, _rows())
+    assert reads == []
+    assert sorted(index.accounts_in('2024-02-01', 'KJ').account_ids()) == [3]
+
+
+def test_new_and_changed_extracts_are_rebuilt(tmp_path):
+    PresenceIndex(tmp_path).update(_rows())
+    # February gains an account, March is new
+    df = pd.concat([_rows(), pd.DataFrame({
+        'date_of_extract': pd.to_datetime(['2024-02-01', '2024-03-01']),
+        'accoutid': [4, 2],
+        'publication': ['PPH', 'PPH'],
+        'status': ['A', 'A'],
+    })], ignore_index=True)
+    index, reads = _sync(tmp_path, df)
+    assert reads == ['2024-02-01', '2024-03-01']
+    assert sorted(index.accounts_in('2024-02-01', 'PPH').account_ids()) == [1, 4]
+    # Dense IDs of accounts seen before are kept
+    assert list(index.accounts) == [1, 2, 3, 4]
+    assert _sync(tmp_path, df)[1] == []
+
+
+def test_extracts_no_longer_in_the_data_are_dropped(tmp_path):
+    PresenceIndex(tmp_path).update(_rows())
+    index, reads = _sync(tmp_path, _rows().iloc[:2])
+    assert reads == []
+    assert list(index.partitions) == ['2024-01-01']
+    assert list(PresenceIndex(tmp_path).load().partitions) == ['2024-01-01']
+
+
+@pytest.mark.parametrize('execution', ['memory', 'partitioned', 'sql'])
+def test_presence_works_in_every_execution_mode(clean_csv, db_uri, tmp_path, execution):
+    presence_dir = tmp_path / "presence"
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, presence_dir=presence_dir, execution=execution,
+                                  workers=1, db_uri=db_uri)
+    analyzer.load_data()
+    index = analyzer.presence_index()
+
+    frame = cleaned_frame()
+    june = frame[(frame['date_of_extract'] == '2024-06-01') & (frame['Publication'] == 'MTM_PT')]
+    assert sorted(index.accounts_in('2024-06-01', 'MTM_PT').account_ids()) == sorted(june['AccoutID'])
+    assert len(list(presence_dir.glob('presence_*.npz'))) == 6
+
+    again = TimeSeriesAnalyzer(data_path=clean_csv, presence_dir=presence_dir, execution=execution,
+                               workers=1, db_uri=db_uri)
+    again.load_data()
+    again._extract_frames = None  # the stored index is current: no rows are read
+    assert len(again.presence_index().accounts_in('2024-06-01', 'MTM_PT')) == len(june)
+
+
+def test_append_data_indexes_only_the_new_extract(tmp_path):
+    frame = cleaned_frame()
+    path = tmp_path / "cleaned_data.csv"
+    frame[frame['date_of_extract'] < '2024-06-01'].to_csv(path, index=False)
+    analyzer = TimeSeriesAnalyzer(data_path=path, presence_dir=tmp_path / "presence")
+    analyzer.load_data()
+    may = analyzer.presence_index().accounts_in('2024-05-01')
+
+    analyzer.append_data(frame[frame['date_of_extract'] == '2024-06-01'])
+    assert len(list((tmp_path / "presence").glob('presence_*.npz'))) == 6
+    analyzer._extract_frames = None  # the reloaded index is current
+    index = analyzer.presence_index()
+    june = frame.loc[frame['date_of_extract'] == '2024-06-01', 'AccoutID']
+    assert sorted(index.accounts_in('2024-06-01').account_ids()) == sorted(june)
+    assert len(index.accounts_in('2024-05-01')) == len(may)
@@ -0,0 +1,33 @@
+"""
+Tests for sql execution: the GROUP BY queries give the same results as
+memory mode on the table loaded by utils/db
+"""
+import pytest
+
+from src.METLN import pushdown
+from src.METLN.timeseries import ANALYSIS_COLUMNS, TimeSeriesAnalyzer
+from src.METLN.utils import db
+
+from .conftest import analysis_results, assert_same_results
+
+
+def test_matches_memory_mode(clean_csv, db_uri, memory_results):
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, execution='sql', db_uri=db_uri)
+    assert_same_results(analysis_results(analyzer), memory_results)
+    assert analyzer.df is None
+
+
+def test_indexes_cover_the_aggregate_queries(db_uri):
+    from sqlalchemy import create_engine, inspect
+
+    engine = create_engine(db_uri)
+    try:
+        names = {index['name'] for index in inspect(engine).get_indexes('subscriptions')}
+    finally:
+        engine.dispose()
+    assert names >= {f"ix_subscriptions_{name}" for name in db.AGGREGATE_INDEXES}
+
+
+def test_missing_table(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        pushdown.aggregate(ANALYSIS_COLUMNS, db_uri=f"sqlite:///{tmp_path / 'empty.db'}")
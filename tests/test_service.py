@@ -0,0 +1,83 @@
+"""
+Tests for the rollup service: responses carry an ETag, If-None-Match
+revalidates with 304 and no body, and a new data version changes the tags
+"""
+import http.client
+import json
+import threading
+
+import pytest
+
+from src.METLN import service
+
+from .conftest import cleaned_frame
+
+
+@pytest.fixture
+def server(clean_csv):
+    """Service on a free local port; the data file is checked on every request"""
+    store = service.RollupStore(clean_csv, check_interval=0)
+    server = service.make_server(port=0, store=store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, path, method="GET", **headers):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        conn.request(method, path, headers=headers)
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_revalidation_answers_304_without_a_body(server):
+    status, headers, body = request(server, "/api/daily")
+    assert status == 200
+    assert headers["Cache-Control"] == "no-cache"
+    assert len(json.loads(body)["dates"]) == 6
+    etag = headers["ETag"]
+
+    status, headers, body = request(server, "/api/daily", **{"If-None-Match": etag})
+    assert (status, headers["ETag"], headers["Content-Length"], body) == (304, etag, "0", b"")
+    assert request(server, "/api/daily", **{"If-None-Match": f'"stale", W/{etag}'})[0] == 304
+    # Tags differ per endpoint
+    assert request(server, "/api/status", **{"If-None-Match": etag})[0] == 200
+
+    status, headers, body = request(server, "/api/daily", method="HEAD")
+    assert (status, headers["ETag"], body) == (200, etag, b"")
+    assert request(server, "/api/unknown")[0] == 404
+
+
+def test_new_data_version_changes_the_etag(server, clean_csv):
+    _, headers, body = request(server, "/api/version")
+    etag, version = headers["ETag"], json.loads(body)
+    assert version["rows"] == 2400
+
+    cleaned_frame(snapshots=7).to_csv(clean_csv, index=False)
+    status, headers, body = request(server, "/api/version", **{"If-None-Match": etag})
+    assert status == 200
+    assert headers["ETag"] != etag
+    assert json.loads(body)["rows"] == 2800
+    assert json.loads(body)["last_extract"] == "2024-07-01"
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ("*", True),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('"abcd"', False),
+])
+def test_etag_matches(header, matches):
+    assert service.etag_matches(header, '"abc"') is matches
+
+
+def test_missing_data_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        service.make_server(port=0, data_path=tmp_path / "cleaned_data.csv")
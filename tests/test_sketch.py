@@ -0,0 +1,124 @@
+"""Tests for HyperLogLog sketches and the per-extract sketch store (sketch.py)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN.sketch import HyperLogLog, SketchStore, hash_values
+from src.METLN.timeseries import TimeSeriesAnalyzer
+
+from .conftest import cleaned_frame
+
+
+def test_estimate_is_close_to_the_exact_count():
+    hll = HyperLogLog(14).add_values(np.arange(50_000))
+    assert hll.count() == pytest.approx(50_000, rel=0.03)
+
+
+def test_merge_counts_the_union():
+    left = HyperLogLog(12).add_values(np.arange(0, 3_000))
+    right = HyperLogLog(12).add_values(np.arange(2_000, 5_000))
+    assert left.merge(right).count() == pytest.approx(5_000, rel=0.05)
+
+
+def test_whole_floats_hash_like_integers():
+    assert (hash_values(pd.Series([1.0, 2.0])) == hash_values(pd.Series([1, 2]))).all()
+
+
+def _extracts(cities):
+    return pd.DataFrame({
+        'date_of_extract': pd.to_datetime(['2024-01-01'] * 3 + ['2024-02-01'] * 3),
+        'accoutid': [1, 2, 3, 1, 2, 3],
+        'city': cities,
+    })
+
+
+def _counts(df):
+    return df.groupby('date_of_extract')['accoutid'].count()
+
+
+def _sync(directory, df):
+    """Sync a freshly loaded store with df; returns the store and the dates whose rows were read"""
+    reads = []
+
+    def load_rows(dates):
+        reads.extend(dates.strftime('%Y-%m-%d'))
+        return df[df['date_of_extract'].isin(dates)]
+
+    store = SketchStore(directory).load()
+    store.sync(_counts(df), load_rows, ['city'])
+    return store, reads
+
+
+def test_current_partitions_are_used_without_reading_rows(tmp_path):
+    df = _extracts(['A', 'B', 'C', 'A', 'B', 'C'])
+    assert SketchStore(tmp_path).update(df, ['city']) == ['2024-01-01', '2024-02-01']
+    store, reads = _sync(tmp_path, df)
+    assert reads == []
+    assert store.distinct_count('city') == 3
+
+
+def test_new_and_changed_extracts_are_rebuilt(tmp_path):
+    SketchStore(tmp_path).update(_extracts(['A', 'B', 'C', 'A', 'B', 'C']), ['city'])
+    # February gains a row, March is new
+    df = pd.concat([_extracts(['A', 'B', 'C', 'A', 'B', 'C']), pd.DataFrame({
+        'date_of_extract': pd.to_datetime(['2024-02-01', '2024-03-01']),
+        'accoutid': [4, 1],
+        'city': ['D', 'E'],
+    })], ignore_index=True)
+    store, reads = _sync(tmp_path, df)
+    assert reads == ['2024-02-01', '2024-03-01']
+    assert store.distinct_count('city', start='2024-02-01') == 5
+    assert _sync(tmp_path, df)[1] == []
+
+
+def test_extracts_no_longer_in_the_data_are_dropped(tmp_path):
+    df = _extracts(['A', 'B', 'C', 'D', 'E', 'F'])
+    SketchStore(tmp_path).update(df, ['city'])
+    store, reads = _sync(tmp_path, df.iloc[:3])
+    assert reads == []
+    assert list(store.partitions) == ['2024-01-01']
+    assert store.distinct_count('city') == 3
+    assert list(SketchStore(tmp_path).load().partitions) == ['2024-01-01']
+
+
+@pytest.mark.parametrize('execution', ['partitioned', 'sql'])
+def test_sketches_work_in_every_execution_mode(clean_csv, db_uri, tmp_path, execution):
+    def counts(analyzer):
+        analyzer.load_data()
+        return {column: analyzer.distinct_count(column, '2024-02-01', '2024-04-01')
+                for column in ('accoutid', 'city', 'route_id')}
+
+    memory = counts(TimeSeriesAnalyzer(data_path=clean_csv, distinct_mode='sketch',
+                                       sketch_dir=tmp_path / "memory"))
+    sketch_dir = tmp_path / execution
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, distinct_mode='sketch', sketch_dir=sketch_dir,
+                                  execution=execution, workers=1, db_uri=db_uri)
+    # Rows are read back from the source to build them, and hash as in memory mode
+    assert counts(analyzer) == memory
+    assert len(list(sketch_dir.glob('sketch_*.npz'))) == 6
+
+    again = TimeSeriesAnalyzer(data_path=clean_csv, distinct_mode='sketch', sketch_dir=sketch_dir,
+                               execution=execution, workers=1, db_uri=db_uri)
+    again.load_data()
+    again._aggregates.extract_rows = None  # stored sketches are current: no rows are read
+    assert {column: again.distinct_count(column, '2024-02-01', '2024-04-01') for column in memory} == memory
+
+
+def test_append_data_sketches_only_the_new_extract(tmp_path, monkeypatch):
+    frame = cleaned_frame()
+    path = tmp_path / "cleaned_data.csv"
+    frame[frame['date_of_extract'] < '2024-06-01'].to_csv(path, index=False)
+    analyzer = TimeSeriesAnalyzer(data_path=path, distinct_mode='sketch', sketch_dir=tmp_path / "sketches")
+    analyzer.load_data()
+    analyzer.distinct_count('city')
+
+    built = []
+    update = SketchStore.update
+    monkeypatch.setattr(SketchStore, 'update', lambda self, df, *args, **kwargs:
+                        built.append(sorted(df['date_of_extract'].dt.strftime('%Y-%m-%d').unique()))
+                        or update(self, df, *args, **kwargs))
+    analyzer.append_data(frame[frame['date_of_extract'] == '2024-06-01'])
+    assert built == [['2024-06-01']]
+    analyzer.distinct_count('city')
+    assert built == [['2024-06-01']]  # the reloaded store is current
+    assert len(list((tmp_path / "sketches").glob('sketch_*.npz'))) == 6
@@ -0,0 +1,50 @@
+"""Tests for TimeSeriesAnalyzer caching across inputs and distinct-count modes"""
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src.METLN.timeseries import TimeSeriesAnalyzer
+
+from .conftest import cleaned_frame
+
+
+def test_growth_metrics_follow_the_distinct_mode(clean_csv, tmp_path):
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv, sketch_dir=tmp_path / "sketches")
+    analyzer.load_data()
+    cached = analyzer.calculate_growth_metrics()
+    exact = cached.copy()
+
+    analyzer.distinct_mode = 'sketch'
+    assert analyzer.ts_data is None
+    growth = analyzer.calculate_growth_metrics()
+    assert growth is not cached  # rebuilt from the sketch counts, not served from cache
+    daily = analyzer.create_daily_aggregations()
+    assert (growth['unique_cities'] == daily['unique_cities']).all()
+
+    analyzer.distinct_mode = 'exact'
+    assert_frame_equal(analyzer.calculate_growth_metrics(), exact)
+
+
+def test_new_data_invalidates_cached_results(clean_csv):
+    analyzer = TimeSeriesAnalyzer(data_path=clean_csv)
+    analyzer.load_data()
+    before = analyzer.create_daily_aggregations()
+    analyzer.df = analyzer.df[analyzer.df['date_of_extract'] < pd.Timestamp('2024-04-01')]
+    assert len(analyzer.create_daily_aggregations()) == 3
+    assert len(before) == 6
+
+
+def test_detect_anomalies_leaves_cached_metrics_unchanged(tmp_path):
+    df = cleaned_frame()
+    spike = df[df['date_of_extract'] == '2024-04-01']
+    path = tmp_path / "cleaned_data.csv"
+    pd.concat([df] + [spike] * 3).to_csv(path, index=False)
+    analyzer = TimeSeriesAnalyzer(data_path=path)
+    analyzer.load_data()
+    growth = analyzer.calculate_growth_metrics()
+    columns = list(growth.columns)
+
+    anomalies = analyzer.detect_anomalies(threshold=1.5)
+    assert anomalies.index.tolist() == [pd.Timestamp('2024-04-01')]
+    assert anomalies['is_anomaly'].all() and anomalies['z_score'].iloc[0] > 1.5
+    assert list(analyzer.ts_data.columns) == columns
+    assert analyzer.calculate_growth_metrics() is growth
@@ -0,0 +1,91 @@
+"""
+Tests for the validation stage: rule checks on unique values, numbered
+headers and the quarantine files
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.METLN import validation
+from src.METLN.data_cleaner import COLUMN_MAPPING
+
+from .conftest import cleaned_frame
+
+
+def raw_rows():
+    """Ten valid rows with the raw (named) headers"""
+    return cleaned_frame(rows_per_snapshot=10, snapshots=1).drop(columns='date_of_extract')
+
+
+@pytest.mark.parametrize('column, value, code', [
+    ('AccoutID', 'ABC', 'ACCOUNT_ID_NOT_NUMERIC'),
+    ('AccoutID', 12.5, 'ACCOUNT_ID_NOT_NUMERIC'),
+    ('AccoutID', None, 'ACCOUNT_ID_NOT_NUMERIC'),
+    ('Zip', '04101-12', 'ZIP_MALFORMED'),
+    ('Zip', '41', 'ZIP_MALFORMED'),
+    ('State', 'XX', 'STATE_UNKNOWN'),
+    ('LastStartDate', 'not a date', 'LAST_START_DATE_INVALID'),
+    ('OriginalStartDate', '01/01/1850', 'ORIGINAL_START_DATE_INVALID'),
+])
+def test_each_rule_quarantines_its_row(column, value, code):
+    df = raw_rows().astype({column: object})
+    df.loc[3, column] = value
+    valid, quarantined, counts = validation.validate(df)
+
+    assert len(valid) == 9
+    assert quarantined.index.tolist() == [3]
+    assert quarantined['reasons'].tolist() == [code]
+    assert counts[code] == 1
+    assert sum(counts.values()) == 1
+
+
+@pytest.mark.parametrize('column, value', [
+    ('Zip', 4101.0),
+    ('Zip', '04101-1234'),
+    ('State', ' me '),
+    ('State', 'M.E.'),
+    ('State', 'Maine'),
+    ('State', None),
+    ('Zip', ''),
+])
+def test_accepted_values(column, value):
+    df = raw_rows().astype({column: object})
+    df.loc[0, column] = value
+    valid, quarantined, _ = validation.validate(df)
+    assert len(valid) == 10 and len(quarantined) == 0
+
+
+def test_reasons_are_combined_and_numbered_headers_are_read():
+    df = raw_rows().rename(columns={name: int(num) for num, name in COLUMN_MAPPING.items()})
+    df = df.astype({int(num): object for num in COLUMN_MAPPING})
+    state, zip_ = int(validation._NUMBERED['State']), int(validation._NUMBERED['Zip'])
+    df.loc[[1, 2], state] = 'XX'
+    df.loc[2, zip_] = 'bad'
+    _, quarantined, counts = validation.validate(df)
+
+    assert quarantined['reasons'].tolist() == ['STATE_UNKNOWN', 'ZIP_MALFORMED|STATE_UNKNOWN']
+    assert counts['STATE_UNKNOWN'] == 2 and counts['ZIP_MALFORMED'] == 1
+
+
+def test_rule_failures_matches_row_by_row():
+    rng = np.random.default_rng(1)
+    values = pd.Series(rng.choice(['ME', 'ma', 'XX', None, ' NH', ''], 1000), dtype=object)
+    rule = next(r for r in validation.RULES if r['code'] == 'STATE_UNKNOWN')
+    expected = [v is not None and v.strip() != '' and v.strip().upper() not in validation.US_STATE_CODES
+                for v in values]
+    assert validation.rule_failures(values, rule).tolist() == expected
+
+
+def test_write_quarantine(data_dirs):
+    df = raw_rows().astype({'State': object})
+    df.loc[4, 'State'] = 'xx'
+    _, quarantined, counts = validation.validate(df)
+
+    validation.write_quarantine(quarantined, counts, 'sublist1.1.24.xlsx', len(df), '2024-01-01')
+    validation.write_quarantine(quarantined.iloc[0:0], dict.fromkeys(counts, 0), 'sublist2.1.24.xlsx', 10)
+
+    rows = pd.read_csv(validation.QUARANTINE_FILE)
+    assert rows[['source_file', 'State', 'reasons']].values.tolist() == [['sublist1.1.24.xlsx', 'xx', 'STATE_UNKNOWN']]
+    summary = pd.read_csv(validation.SUMMARY_FILE)
+    assert summary['quarantined'].tolist() == [1, 0]
+    assert summary['STATE_UNKNOWN'].tolist() == [1, 0]
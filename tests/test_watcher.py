@@ -0,0 +1,119 @@
+"""
+Tests for watch mode: a file is committed to the database and the CSV files
+all together or not at all, so a retry never duplicates rows
+"""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.METLN import data_cleaner, etl_pipeline, validation, watcher
+from src.METLN.timeseries import TimeSeriesAnalyzer
+from src.METLN.utils import db
+
+from .conftest import cleaned_frame, write_raw
+
+ROWS = 50
+RAW_NAME = "sublist1.15.24.xlsx"
+
+
+@pytest.fixture
+def paths(data_dirs):
+    """One raw workbook in data_dirs/raw"""
+    write_raw(data_dirs / "raw" / RAW_NAME, rows=ROWS)
+    return data_dirs
+
+
+def make_daemon(paths, monkeypatch):
+    daemon = watcher.IngestDaemon(raw_dir=paths / "raw", db_uri=f"sqlite:///{paths / 'mtln.db'}")
+    daemon.analyzer = TimeSeriesAnalyzer(data_path=data_cleaner.CLEAN_FILE)
+    # The report files are not under test and would be written to outputs/
+    monkeypatch.setattr(daemon, 'refresh_report', lambda: None)
+    daemon.start()
+    return daemon
+
+
+def db_rows(paths):
+    engine = create_engine(f"sqlite:///{paths / 'mtln.db'}")
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM subscriptions")).scalar()
+    except Exception:
+        return 0
+    finally:
+        engine.dispose()
+
+
+def csv_rows(path):
+    return len(pd.read_csv(path)) if path.exists() else 0
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("simulated failure")
+
+
+def test_file_is_loaded_once(paths, monkeypatch):
+    daemon = make_daemon(paths, monkeypatch)
+    timings = daemon.process_file(paths / "raw" / RAW_NAME)
+    assert {'ingest', 'clean', 'db_load', 'commit', 'analysis', 'total'} <= set(timings)
+    assert db_rows(paths) == csv_rows(data_cleaner.CLEAN_FILE) == csv_rows(etl_pipeline.PROCESSED_FILE) == ROWS
+    assert len(daemon.analyzer.df) == ROWS
+
+    assert daemon.process_file(paths / "raw" / RAW_NAME) is None
+    assert etl_pipeline.load_processed_dates() == {pd.Timestamp('2024-01-15').date()}
+
+
+def test_failed_db_load_leaves_nothing_behind(paths, monkeypatch):
+    daemon = make_daemon(paths, monkeypatch)
+    with monkeypatch.context() as m:
+        m.setattr(db, 'load_frame_to_sql', fail)
+        with pytest.raises(RuntimeError):
+            daemon.process_file(paths / "raw" / RAW_NAME)
+    assert not data_cleaner.CLEAN_FILE.exists()
+    assert not etl_pipeline.PROCESSED_FILE.exists()
+    assert daemon.processed_dates == set()
+
+    # After a restart the file is picked up again and loaded exactly once
+    daemon = make_daemon(paths, monkeypatch)
+    assert paths / "raw" / RAW_NAME not in daemon.watcher.done
+    daemon.process_file(paths / "raw" / RAW_NAME)
+    assert db_rows(paths) == csv_rows(data_cleaner.CLEAN_FILE) == csv_rows(etl_pipeline.PROCESSED_FILE) == ROWS
+
+
+def test_failed_commit_is_retried_without_duplicates(paths, monkeypatch):
+    daemon = make_daemon(paths, monkeypatch)
+    with monkeypatch.context() as m:
+        m.setattr(etl_pipeline, 'append_processed', fail)
+        with pytest.raises(RuntimeError):
+            daemon.process_file(paths / "raw" / RAW_NAME)
+    # The database load went through but the cleaned rows were taken back out
+    assert db_rows(paths) == ROWS
+    assert not data_cleaner.CLEAN_FILE.exists()
+    assert daemon.processed_dates == set()
+
+    daemon.process_file(paths / "raw" / RAW_NAME)
+    assert db_rows(paths) == csv_rows(data_cleaner.CLEAN_FILE) == csv_rows(etl_pipeline.PROCESSED_FILE) == ROWS
+
+
+def test_failed_append_keeps_existing_clean_rows(paths, monkeypatch):
+    existing = cleaned_frame(rows_per_snapshot=10, snapshots=1)
+    size = data_cleaner.append_clean_rows(existing)
+    assert size is None
+    before = data_cleaner.CLEAN_FILE.read_bytes()
+
+    size = data_cleaner.append_clean_rows(existing)
+    data_cleaner.discard_clean_rows(size)
+    assert data_cleaner.CLEAN_FILE.read_bytes() == before
+
+
+def test_state_names_are_normalized_not_quarantined(paths, monkeypatch):
+    raw = cleaned_frame(rows_per_snapshot=ROWS, snapshots=1).drop(columns='date_of_extract').astype({'State': object})
+    maine = raw.index[raw['State'] == 'ME']
+    raw.loc[maine, 'State'] = ['Maine' if i % 2 else 'M.E.' for i in range(len(maine))]
+    raw.to_excel(paths / "raw" / RAW_NAME, index=False)
+
+    daemon = make_daemon(paths, monkeypatch)
+    daemon.process_file(paths / "raw" / RAW_NAME)
+    assert db_rows(paths) == ROWS
+    assert csv_rows(validation.QUARANTINE_FILE) == 0
+    states = pd.read_csv(data_cleaner.CLEAN_FILE)['State']
+    assert (states == 'ME').sum() == len(maine) and set(states) <= {'ME', 'MA', 'NH'}